@@ -0,0 +1,132 @@
+"""Cold start of translation_lambda: import time and first-invocation latency.
+
+Every run starts a fresh interpreter, so the numbers include loading pandas,
+numpy and boto3 when the measured path needs them:
+
+    python benchmarks/bench_cold_start.py --runs 10
+
+"invalid" invokes the handler with a record that fails in extract_path,
+"translate" translates a small local Parquet file with the fake client.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), "translation-lambda", "src")
+# FakeTranslateClient lives with the tests, outside the shipped src/.
+TESTS_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), "translation-lambda", "tests")
+
+SOURCE_BUCKET = "benchmark-data-lake"
+SOURCE_KEY = "parquet/reviews.parquet.gzip"
+
+
+def invalid_event(root):
+    return [{"key": SOURCE_KEY}]
+
+
+def translate_event(root):
+    return [{"bucket": SOURCE_BUCKET, "key": SOURCE_KEY}]
+
+
+SCENARIOS = {"invalid": invalid_event, "translate": translate_event}
+
+
+def measure(scenario, root):
+    """Runs in the child interpreter and returns its timings."""
+    start = time.perf_counter()
+    import translation_lambda
+    imported = time.perf_counter()
+
+    from unittest import mock
+
+    from fake_translate_client import FakeTranslateClient
+    from storage import LocalStorage
+
+    event = SCENARIOS[scenario](root)
+    with mock.patch.object(translation_lambda, "boto_translation_client", FakeTranslateClient()), \
+            mock.patch.object(translation_lambda, "storage", LocalStorage(root)):
+        invoked = time.perf_counter()
+        result = translation_lambda.lambda_handler(event, None)
+    finished = time.perf_counter()
+
+    return {
+        "import_seconds": imported - start,
+        "first_invocation_seconds": finished - invoked,
+        "pandas_loaded": "pandas" in sys.modules,
+        "boto3_loaded": "boto3" in sys.modules,
+        "statuses": [sorted(record) for record in result],
+    }
+
+
+def write_source(root, rows):
+    import pandas as pd
+
+    path = os.path.join(root, SOURCE_BUCKET, SOURCE_KEY)
+    os.makedirs(os.path.dirname(path))
+    pd.DataFrame(
+        {"ID": range(rows), "review": [f"opinia numer {i}" for i in range(rows)]}
+    ).to_parquet(path, compression="gzip")
+
+
+def run_child(scenario, root):
+    environment = dict(os.environ)
+    environment.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+    environment["PYTHONPATH"] = os.pathsep.join(
+        [SOURCE_DIR, TESTS_DIR, BENCHMARKS_DIR, environment.get("PYTHONPATH", "")]
+    )
+    output = subprocess.check_output(
+        [sys.executable, __file__, "--child", scenario, "--root", root],
+        env=environment,
+        text=True,
+    )
+    return json.loads(output.splitlines()[-1])
+
+
+def summary(values):
+    return {
+        "min": round(min(values), 4),
+        "median": round(statistics.median(values), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS),
+                        default=sorted(SCENARIOS))
+    parser.add_argument("--child", choices=sorted(SCENARIOS), help=argparse.SUPPRESS)
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.root)))
+        return
+
+    with tempfile.TemporaryDirectory() as root:
+        write_source(root, args.rows)
+        for scenario in args.scenarios:
+            runs = [run_child(scenario, root) for _ in range(args.runs)]
+            print(json.dumps({
+                "scenario": scenario,
+                "runs": args.runs,
+                "import_seconds": summary([run["import_seconds"] for run in runs]),
+                "first_invocation_seconds": summary(
+                    [run["first_invocation_seconds"] for run in runs]
+                ),
+                "pandas_loaded": runs[0]["pandas_loaded"],
+                "boto3_loaded": runs[0]["boto3_loaded"],
+                "result_keys": runs[0]["statuses"],
+            }))
+
+
+if __name__ == "__main__":
+    main()
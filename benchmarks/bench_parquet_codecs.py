@@ -0,0 +1,63 @@
+"""Write time, read time and size of review data per Parquet codec.
+
+    python benchmarks/bench_parquet_codecs.py --rows 200000
+"""
+import argparse
+import io
+import time
+
+import pandas as pd
+
+from synthetic import synthetic_reviews
+
+CODECS = [
+    ("gzip", None),
+    ("gzip", 1),
+    ("snappy", None),
+    ("lz4", None),
+    ("zstd", 1),
+    ("zstd", 3),
+    ("zstd", 9),
+    ("none", None),
+]
+
+
+def run(df, codec, level, use_dictionary):
+    options = {"compression": codec, "use_dictionary": use_dictionary}
+    if level is not None:
+        options["compression_level"] = level
+
+    buffer = io.BytesIO()
+    start = time.perf_counter()
+    df.to_parquet(buffer, **options)
+    write_seconds = time.perf_counter() - start
+
+    buffer.seek(0)
+    start = time.perf_counter()
+    pd.read_parquet(buffer)
+    read_seconds = time.perf_counter() - start
+
+    return {
+        "codec": codec,
+        "level": level,
+        "dictionary": use_dictionary,
+        "write_seconds": round(write_seconds, 3),
+        "read_seconds": round(read_seconds, 3),
+        "megabytes": round(buffer.getbuffer().nbytes / 2 ** 20, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--duplicates", type=float, default=0.3)
+    args = parser.parse_args()
+
+    df = synthetic_reviews(args.rows, args.duplicates)
+    for codec, level in CODECS:
+        for use_dictionary in (True, False):
+            print(run(df, codec, level, use_dictionary))
+
+
+if __name__ == "__main__":
+    main()
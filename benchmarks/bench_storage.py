@@ -0,0 +1,84 @@
+"""Parquet write and read throughput per storage backend.
+
+Runs offline against the local and memory backends; pass --s3-url to also
+measure S3 with the transfer tunables of storage.S3Storage:
+
+    python benchmarks/bench_storage.py --rows 200000
+    python benchmarks/bench_storage.py --s3-url s3://bucket/bench \\
+        --block-size 16777216 --max-pool-connections 32
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "translation-lambda", "src"))
+
+import pandas as pd  # noqa: E402
+
+from storage import LocalStorage, MemoryStorage, S3Storage  # noqa: E402
+from synthetic import synthetic_reviews  # noqa: E402
+
+
+def run(name, storage, base_url, df, repeats):
+    path = f"{base_url.rstrip('/')}/{uuid.uuid4()}/reviews.parquet.gzip"
+    write_seconds = []
+    read_seconds = []
+    for _ in range(repeats):
+        url = storage.url_for_write(path)
+        start = time.perf_counter()
+        df.to_parquet(url, compression="gzip", **storage.pandas_options(url))
+        write_seconds.append(time.perf_counter() - start)
+
+        url = storage.url(path)
+        start = time.perf_counter()
+        pd.read_parquet(url, **storage.pandas_options(url))
+        read_seconds.append(time.perf_counter() - start)
+
+    megabytes = storage.info(path)["size"] / 2 ** 20
+    storage.remove(path)
+
+    return {
+        "storage": name,
+        "megabytes": round(megabytes, 2),
+        "write_mb_per_second": round(megabytes / min(write_seconds), 1),
+        "read_mb_per_second": round(megabytes / min(read_seconds), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--s3-url", help="s3://bucket/prefix to benchmark S3 as well")
+    parser.add_argument("--block-size", type=int, default=0)
+    parser.add_argument("--cache-type")
+    parser.add_argument("--max-pool-connections", type=int, default=0)
+    args = parser.parse_args()
+
+    df = synthetic_reviews(args.rows)
+    with tempfile.TemporaryDirectory() as root:
+        backends = [
+            ("local", LocalStorage(root), "s3://bench"),
+            ("memory", MemoryStorage(), "s3://bench"),
+        ]
+        if args.s3_url:
+            backends.append((
+                "s3",
+                S3Storage(
+                    block_size=args.block_size,
+                    cache_type=args.cache_type,
+                    max_pool_connections=args.max_pool_connections,
+                ),
+                args.s3_url,
+            ))
+        for name, storage, base_url in backends:
+            print(run(name, storage, base_url, df, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
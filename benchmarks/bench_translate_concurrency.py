@@ -0,0 +1,55 @@
+"""Throughput of translate_dataframe against the fake translate client.
+
+    python benchmarks/bench_translate_concurrency.py --rows 500 --latency 0.05
+"""
+import argparse
+import os
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "translation-lambda", "src"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "translation-lambda", "tests"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+
+import pandas as pd  # noqa: E402
+
+import translation_lambda  # noqa: E402
+from fake_translate_client import FakeTranslateClient  # noqa: E402
+
+
+def run(df, latency, workers, throttle_ratio):
+    client = FakeTranslateClient(latency=latency, throttle_ratio=throttle_ratio)
+    with mock.patch.object(translation_lambda, "boto_translation_client", client), \
+            mock.patch.object(translation_lambda, "TRANSLATION_MAX_WORKERS", workers):
+        start = time.perf_counter()
+        translated, errors = translation_lambda.translate_dataframe(df)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(len(df) / elapsed, 1),
+        "calls": client.calls,
+        "throttles": client.throttles,
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--throttle-ratio", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16, 32])
+    args = parser.parse_args()
+
+    df = pd.DataFrame(
+        {"ID": range(args.rows), "review": [f"opinia numer {i}" for i in range(args.rows)]}
+    )
+    for workers in args.workers:
+        print(run(df, args.latency, workers, args.throttle_ratio))
+
+
+if __name__ == "__main__":
+    main()
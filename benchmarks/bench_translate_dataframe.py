@@ -0,0 +1,70 @@
+"""Cost of translate_dataframe itself, with a zero-latency fake client.
+
+Compares the per-row iterrows implementation, the row-dict engine and the
+columnar path, including building the output frames that translate() writes.
+
+    python benchmarks/bench_translate_dataframe.py --rows 100000 --duplicates 0.3
+"""
+import argparse
+import os
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "translation-lambda", "src"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "translation-lambda", "tests"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+
+import pandas as pd  # noqa: E402
+
+import translation_lambda  # noqa: E402
+from fake_translate_client import FakeTranslateClient  # noqa: E402
+from synthetic import synthetic_reviews  # noqa: E402
+
+MODES = {
+    "iterrows": {},
+    "engine": {"TRANSLATION_MAX_WORKERS": 2},
+    "columnar": {"TRANSLATION_COLUMNAR": True},
+}
+
+
+def run(df, mode):
+    client = FakeTranslateClient()
+    patches = [mock.patch.object(translation_lambda, "boto_translation_client", client)]
+    patches += [
+        mock.patch.object(translation_lambda, name, value)
+        for name, value in MODES[mode].items()
+    ]
+    for patch in patches:
+        patch.start()
+    try:
+        start = time.perf_counter()
+        translated, errors = translation_lambda.translate_dataframe(df)
+        pd.DataFrame(translated), pd.DataFrame(errors)
+        elapsed = time.perf_counter() - start
+    finally:
+        for patch in reversed(patches):
+            patch.stop()
+
+    return {
+        "mode": mode,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(len(df) / elapsed),
+        "calls": client.calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--duplicates", type=float, default=0.3)
+    parser.add_argument("--modes", nargs="+", default=list(MODES))
+    args = parser.parse_args()
+
+    df = synthetic_reviews(args.rows, args.duplicates)
+    for mode in args.modes:
+        print(run(df, mode))
+
+
+if __name__ == "__main__":
+    main()
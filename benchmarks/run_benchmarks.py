@@ -0,0 +1,223 @@
+"""End-to-end offline benchmark of the ingestion and translation lambdas.
+
+Generates a synthetic review CSV, runs ingestion_lambda.lambda_handler and
+translation_lambda.lambda_handler with a LocalStorage standing in for S3 and
+a latency-injecting fake translate client, and saves the timings as JSON so
+runs on different commits can be compared. The run exits with status 1 when
+any record reports an error:
+
+    python benchmarks/run_benchmarks.py --rows 20000 --latency 0.005 \\
+        --set TRANSLATION_MAX_WORKERS=16 --output results.json
+    python benchmarks/run_benchmarks.py --rows 20000 --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from unittest import mock
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "ingestion-lambda"))
+sys.path.insert(0, os.path.join(REPO_DIR, "translation-lambda", "src"))
+sys.path.insert(0, os.path.join(REPO_DIR, "translation-lambda", "tests"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+
+import ingestion_lambda  # noqa: E402
+import translation_lambda  # noqa: E402
+from fake_translate_client import FakeTranslateClient  # noqa: E402
+from storage import LocalStorage  # noqa: E402
+from synthetic import synthetic_reviews  # noqa: E402
+
+INPUT_BUCKET = "benchmark-input"
+DATA_LAKE_BUCKET = "benchmark-data-lake"
+TRANSLATED_BUCKET = "benchmark-translated"
+ERROR_BUCKET = "benchmark-errors"
+
+
+def peak_rss_megabytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return round(peak / (2 ** 20 if platform.system() == "Darwin" else 2 ** 10), 1)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def parse_setting(module, assignment):
+    name, value = assignment.split("=", 1)
+    current = getattr(module, name)
+    if isinstance(current, bool):
+        return name, value.lower() == "true"
+    if isinstance(current, (int, float)):
+        return name, type(current)(value)
+    return name, value
+
+
+def stage_seconds(result):
+    """Per-stage timings summed over the metrics of every record."""
+    seconds = defaultdict(float)
+    for record in result:
+        for stage, value in ((record.get("metrics") or {}).get("timings") or {}).items():
+            seconds[stage] += value
+    return {stage: round(value, 3) for stage, value in seconds.items()}
+
+
+def stage_report(name, rows, seconds, result):
+    return {
+        "stage": name,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1) if seconds else None,
+        "stage_seconds": stage_seconds(result),
+        "peak_rss_mb": peak_rss_megabytes(),
+    }
+
+
+def failed_records(result):
+    """Records whose result reports an error or a status other than OK."""
+    return [
+        record
+        for record in result
+        if any(
+            "error" in key or (key.endswith("status") and value != "OK")
+            for key, value in record.items()
+        )
+    ]
+
+
+def run_ingestion(root, rows):
+    event = {
+        "Input": {
+            "Records": [
+                {
+                    "s3": {
+                        "bucket": {"name": INPUT_BUCKET},
+                        "object": {"key": "incoming/reviews.csv"},
+                    }
+                }
+            ]
+        }
+    }
+    environment = {"DATA_LAKE_NAME": DATA_LAKE_BUCKET, "KEY_OUT_PREFIX": "parquet"}
+    with mock.patch.dict(os.environ, environment), \
+            mock.patch.object(ingestion_lambda, "storage", LocalStorage(root)), \
+            mock.patch.object(ingestion_lambda, "METRICS_ENABLED", True), \
+            mock.patch("builtins.print"):
+        start = time.perf_counter()
+        result = ingestion_lambda.lambda_handler(event, None)
+        seconds = time.perf_counter() - start
+
+    return result, stage_report("ingestion", rows, seconds, result)
+
+
+def run_translation(root, rows, ingestion_result, latency, settings):
+    client = FakeTranslateClient(latency=latency)
+    event = [{"bucket": record["bucket"], "key": record["key"]} for record in ingestion_result]
+    with ExitStack() as stack:
+        stack.enter_context(
+            mock.patch.object(translation_lambda, "boto_translation_client", client)
+        )
+        for name, value in [
+            ("storage", LocalStorage(root)),
+            ("METRICS_ENABLED", True),
+            ("DESTINATION_BUCKET_NAME", TRANSLATED_BUCKET),
+            ("DESTINATION_LOCATION_PREFIX", "translated"),
+            ("ERROR_BUCKET_NAME", ERROR_BUCKET),
+            ("ERROR_LOCATION_PREFIX", "errors"),
+        ] + settings:
+            stack.enter_context(mock.patch.object(translation_lambda, name, value))
+
+        start = time.perf_counter()
+        result = translation_lambda.lambda_handler(event, None)
+        seconds = time.perf_counter() - start
+
+    report = stage_report("translation", rows, seconds, result)
+    report["translate_calls"] = client.calls
+    report["statuses"] = [
+        {key: value for key, value in record.items() if key.endswith("status")}
+        for record in result
+    ]
+    return result, report
+
+
+def compare(current, baseline):
+    baseline_stages = {stage["stage"]: stage for stage in baseline["stages"]}
+    for stage in current["stages"]:
+        previous = baseline_stages.get(stage["stage"])
+        if not previous or not previous["seconds"]:
+            continue
+        change = (stage["seconds"] - previous["seconds"]) / previous["seconds"] * 100
+        print(
+            f"{stage['stage']}: {previous['seconds']}s -> {stage['seconds']}s "
+            f"({change:+.1f}%), peak RSS {previous['peak_rss_mb']} -> {stage['peak_rss_mb']} MB"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--duplicates", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.005,
+                        help="seconds added to every fake TranslateText call")
+    parser.add_argument("--set", dest="settings", action="append", default=[],
+                        metavar="NAME=VALUE",
+                        help="override a translation_lambda setting, repeatable")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="print changes against a previous JSON file")
+    args = parser.parse_args()
+
+    settings = [parse_setting(translation_lambda, setting) for setting in args.settings]
+    with tempfile.TemporaryDirectory() as root:
+        source = os.path.join(root, INPUT_BUCKET, "incoming", "reviews.csv")
+        os.makedirs(os.path.dirname(source))
+        synthetic_reviews(args.rows, args.duplicates).to_csv(source, index=False)
+
+        ingestion_result, ingestion_report = run_ingestion(root, args.rows)
+        failures = failed_records(ingestion_result)
+        translation_report = None
+        if not failures:
+            translation_result, translation_report = run_translation(
+                root, args.rows, ingestion_result, args.latency, settings
+            )
+            failures = failed_records(translation_result)
+
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "parameters": {
+            "rows": args.rows,
+            "duplicates": args.duplicates,
+            "latency": args.latency,
+            "settings": dict(settings),
+        },
+        "stages": [report for report in (ingestion_report, translation_report) if report],
+    }
+    print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if failures:
+        sys.exit(f"{len(failures)} records failed: {json.dumps(failures, default=str)}")
+
+
+if __name__ == "__main__":
+    main()
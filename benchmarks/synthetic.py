@@ -0,0 +1,30 @@
+import random
+
+import pandas as pd
+
+WORDS = (
+    "produkt dobry zły szybka dostawa polecam nie polecam jakość cena świetny "
+    "słaby obsługa klienta zwrot opakowanie zgodny z opisem rozmiar kolor"
+).split()
+
+
+def synthetic_reviews(rows, duplicates=0.3, min_words=3, max_words=60, seed=0):
+    """Review frame shaped like the ingestion input.
+
+    ``duplicates`` is the share of rows repeating an earlier review text.
+    """
+    generator = random.Random(seed)
+    distinct = max(1, int(rows * (1 - duplicates)))
+    reviews = [
+        " ".join(generator.choice(WORDS) for _ in range(generator.randint(min_words, max_words)))
+        for _ in range(distinct)
+    ]
+    reviews += [generator.choice(reviews) for _ in range(rows - distinct)]
+    generator.shuffle(reviews)
+    return pd.DataFrame(
+        {
+            "ID": range(rows),
+            "review": reviews,
+            "rating": [generator.randint(1, 5) for _ in range(rows)],
+        }
+    )
@@ -1,26 +1,194 @@
+import hashlib
+import io
+import itertools
 import os
 import json
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 import pandas as pd
+from storage import create_storage
+
+# Rows per CSV chunk when streaming to Parquet, 0 converts the file in one go.
+# With INGESTION_ARROW the file is parsed block by block and the batches are
+# written once they add up to this many rows.
+INGESTION_CHUNK_SIZE = int(os.environ.get("INGESTION_CHUNK_SIZE") or '0')
+
+# Maximum rows per Parquet row group when streaming, 0 writes one per chunk.
+INGESTION_ROW_GROUP_SIZE = int(os.environ.get("INGESTION_ROW_GROUP_SIZE") or '0')
+
+# Parquet codec (gzip, snappy, zstd, lz4, brotli or none), also used as the
+# output file suffix, e.g. sample.parquet.zstd.
+PARQUET_COMPRESSION = os.environ.get("PARQUET_COMPRESSION") or 'gzip'
+
+PARQUET_COMPRESSION_LEVEL = os.environ.get("PARQUET_COMPRESSION_LEVEL")
+
+# "true"/"false" to force dictionary encoding on or off, unset keeps pyarrow's default.
+PARQUET_USE_DICTIONARY = os.environ.get("PARQUET_USE_DICTIONARY")
+
+PARQUET_ROW_GROUP_SIZE = int(os.environ.get("PARQUET_ROW_GROUP_SIZE") or '0')
+
+PARQUET_DATA_PAGE_SIZE = int(os.environ.get("PARQUET_DATA_PAGE_SIZE") or '0')
+
+# Parses CSVs straight into Arrow tables and writes them without building a
+# pandas DataFrame; empty fields become nulls as with pandas. Combined with
+# INGESTION_CHUNK_SIZE it streams the file instead of reading it whole.
+INGESTION_ARROW = os.environ.get("INGESTION_ARROW", "").lower() == 'true'
+
+# Records converted at the same time. A failing record fails the invocation
+# once the other records have finished, unless INGESTION_REPORT_FAILURES is set.
+INGESTION_MAX_WORKERS = int(os.environ.get("INGESTION_MAX_WORKERS") or '1')
+
+# Reports a failing record in its result entry, as {'record': ..., 'error': ...},
+# instead of failing the whole invocation.
+INGESTION_REPORT_FAILURES = os.environ.get("INGESTION_REPORT_FAILURES", "").lower() == 'true'
+
+# Processes parsing CSVs while threads move the bytes, 0 parses in threads.
+# Process pools need /dev/shm, which the managed Lambda runtime lacks, so this
+# is meant for container deployments that provide it. Whole files are sent to
+# the processes, so it is ignored when INGESTION_CHUNK_SIZE is set.
+INGESTION_PARSE_PROCESSES = int(os.environ.get("INGESTION_PARSE_PROCESSES") or '0')
+
+# Skips sources whose ETag and output settings match the last conversion and
+# returns that conversion's outputs marked as skipped.
+INGESTION_SKIP_UNCHANGED = os.environ.get("INGESTION_SKIP_UNCHANGED", "").lower() == 'true'
+
+# Directory of the processed index, by default _processed/ under the output
+# prefix; a local path such as /tmp/processed also works.
+INGESTION_PROCESSED_INDEX_URI = os.environ.get("INGESTION_PROCESSED_INDEX_URI")
+
+# Adds per-stage timings and counters to every record result and log line.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "").lower() == 'true'
+
+# Callables receiving every emitted metrics payload, e.g. to push to CloudWatch.
+metrics_sinks = []
+
+# Maps the s3:// URLs to S3, a local directory or memory, see storage.py.
+storage = create_storage()
 
 
 def lambda_handler(events, context):
     bucket_out_name = os.environ["DATA_LAKE_NAME"]
     key_out_prefix_name = os.environ.get("KEY_OUT_PREFIX")
-    result = []
-    print(events)
-    for record in events['Input']['Records']:
-        bucket_in_name, key_in_name = read_variables(record)
-
-        file_out_name = create_file_name(key_in_name)
-        input_data_df = pd.read_csv(f's3://{bucket_in_name}/{key_in_name}')
-        key_out_name = f'{key_out_prefix_name}/{file_out_name}.parquet.gzip'
-        input_data_df.to_parquet(f's3://{bucket_out_name}/{key_out_name}', compression='gzip')
-        outputs = {'bucket': bucket_out_name, 'key': key_out_name}
-        result.append(outputs)
+    records = events['Input']['Records']
+    print(f'Converting {len(records)} records')
+    parse_processes = INGESTION_PARSE_PROCESSES
+    if parse_processes and INGESTION_CHUNK_SIZE:
+        print('Ignoring INGESTION_PARSE_PROCESSES, INGESTION_CHUNK_SIZE streams the files in chunks instead')
+        parse_processes = 0
+    convert = convert_record_safely if INGESTION_REPORT_FAILURES else convert_record
+    if INGESTION_MAX_WORKERS <= 1 and not parse_processes:
+        return [convert(record, bucket_out_name, key_out_prefix_name) for record in records]
+
+    parse_pool = ProcessPoolExecutor(parse_processes) if parse_processes else None
+    try:
+        with ThreadPoolExecutor(max(1, INGESTION_MAX_WORKERS)) as executor:
+            result = list(executor.map(
+                lambda record: convert(record, bucket_out_name, key_out_prefix_name, parse_pool),
+                records))
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
 
     return result
 
 
+class RecordMetrics:
+    """Stage timings and counters of one record conversion.
+
+    Stages are whole reads and writes, so timing them unconditionally costs
+    nothing noticeable; they are only reported when METRICS_ENABLED is set.
+    """
+
+    def __init__(self):
+        self.timings = defaultdict(float)
+        self.counters = defaultdict(int)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - start
+
+    def increment(self, name, value=1):
+        self.counters[name] += value
+
+    def as_dict(self):
+        return {'timings': {name: round(seconds, 4) for name, seconds in self.timings.items()},
+                'counters': dict(self.counters)}
+
+
+def emit_metrics(record_metrics, **labels):
+    payload = dict(labels, **record_metrics.as_dict())
+    print(json.dumps(payload))
+    for sink in list(metrics_sinks):
+        sink(payload)
+
+
+def convert_record(record, bucket_out_name, key_out_prefix_name, parse_pool=None):
+    bucket_in_name, key_in_name = read_variables(record)
+
+    file_out_name = create_file_name(key_in_name)
+    key_out_name = f'{key_out_prefix_name}/{file_out_name}.parquet.{PARQUET_COMPRESSION}'
+    source = f's3://{bucket_in_name}/{key_in_name}'
+    destination = f's3://{bucket_out_name}/{key_out_name}'
+    record_metrics = RecordMetrics()
+    fingerprint = None
+    if INGESTION_SKIP_UNCHANGED:
+        index_path = processed_index_path(bucket_out_name, key_out_prefix_name, file_out_name)
+        try:
+            fingerprint = source_fingerprint(source, destination)
+            previous_outputs = read_processed(index_path, fingerprint)
+        except Exception as e:
+            print(f'Could not check whether {source} is unchanged: {e}')
+            fingerprint, previous_outputs = None, None
+        if previous_outputs is not None:
+            print(f'{source} is unchanged since it was last converted, skipping')
+            return dict(previous_outputs, skipped=True)
+
+    if parse_pool is not None:
+        convert_csv_in_process(source, destination, parse_pool, record_metrics)
+    elif INGESTION_ARROW and INGESTION_CHUNK_SIZE:
+        convert_csv_arrow_streaming(source, destination, INGESTION_CHUNK_SIZE, INGESTION_ROW_GROUP_SIZE,
+                                    record_metrics)
+    elif INGESTION_ARROW:
+        convert_csv_arrow(source, destination, record_metrics)
+    elif INGESTION_CHUNK_SIZE:
+        convert_csv_streaming(source, destination, INGESTION_CHUNK_SIZE, INGESTION_ROW_GROUP_SIZE, record_metrics)
+    else:
+        with record_metrics.stage('read'):
+            input_data_df = read_csv(source)
+        record_metrics.increment('rows', len(input_data_df))
+        with record_metrics.stage('write'):
+            destination_url = storage.url_for_write(destination)
+            input_data_df.to_parquet(destination_url, **storage.pandas_options(destination_url),
+                                     **parquet_write_options())
+
+    outputs = {'bucket': bucket_out_name, 'key': key_out_name}
+    if fingerprint is not None:
+        try:
+            write_processed(index_path, fingerprint, outputs)
+        except Exception as e:
+            print(f'Could not record {source} as processed: {e}')
+    if METRICS_ENABLED:
+        emit_metrics(record_metrics, event='ingestion_metrics', source=source)
+        outputs['metrics'] = record_metrics.as_dict()
+
+    return outputs
+
+
+def convert_record_safely(record, bucket_out_name, key_out_prefix_name, parse_pool=None):
+    try:
+        return convert_record(record, bucket_out_name, key_out_prefix_name, parse_pool)
+    except Exception as e:
+        print(f'Conversion failed: {e}')
+
+        return {'record': json.dumps(record), 'error': str(e)}
+
+
 def read_variables(record):
     try:
         bucket_in_name = record['s3']['bucket']['name']
@@ -38,3 +206,197 @@ def create_file_name(file_in_name):
     file_out_name = file_split_name.split('.')[0]
 
     return file_out_name
+
+
+def processed_index_path(bucket_out_name, key_out_prefix_name, file_out_name):
+    index_uri = INGESTION_PROCESSED_INDEX_URI or f's3://{bucket_out_name}/{key_out_prefix_name}/_processed'
+
+    return f'{index_uri.rstrip("/")}/{file_out_name}.json'
+
+
+def source_fingerprint(source, destination):
+    """Hash of the source object's ETag (or size and mtime) and the output settings."""
+    info = storage.info(source)
+    version = info.get('ETag') or f"{info.get('size')}-{info.get('mtime') or info.get('LastModified')}"
+    payload = {'source': source, 'version': str(version).strip('"'), 'destination': destination,
+               'parquet': parquet_write_options()}
+
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def read_processed(index_path, fingerprint):
+    try:
+        with storage.open(index_path, 'rb') as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    return entry['outputs'] if entry.get('fingerprint') == fingerprint else None
+
+
+def write_processed(index_path, fingerprint, outputs):
+    with storage.open(index_path, 'w') as f:
+        json.dump({'fingerprint': fingerprint, 'outputs': outputs}, f)
+
+
+def read_csv(path, **kwargs):
+    url = storage.url(path)
+
+    return pd.read_csv(url, **kwargs, **storage.pandas_options(url))
+
+
+def parquet_writer_options():
+    options = {'compression': PARQUET_COMPRESSION}
+    if PARQUET_COMPRESSION_LEVEL:
+        options['compression_level'] = int(PARQUET_COMPRESSION_LEVEL)
+    if PARQUET_USE_DICTIONARY:
+        options['use_dictionary'] = PARQUET_USE_DICTIONARY.lower() == 'true'
+    if PARQUET_DATA_PAGE_SIZE:
+        options['data_page_size'] = PARQUET_DATA_PAGE_SIZE
+
+    return options
+
+
+def parquet_write_options():
+    options = parquet_writer_options()
+    if PARQUET_ROW_GROUP_SIZE:
+        options['row_group_size'] = PARQUET_ROW_GROUP_SIZE
+
+    return options
+
+
+def lock_schema(schema):
+    import pyarrow as pa
+
+    # Columns that are empty in the first chunk have no type yet; later chunks
+    # can only be appended if they are stored as strings.
+    return pa.schema(
+        [field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema],
+        metadata=schema.metadata,
+    )
+
+
+def convert_csv_streaming(source, destination, chunk_size, row_group_size=0, record_metrics=None):
+    """Convert a CSV to a single Parquet file one chunk at a time.
+
+    The schema is inferred from the first chunk and every later chunk is cast
+    to it, so memory stays bounded by chunk_size rows instead of the file size.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    record_metrics = record_metrics or RecordMetrics()
+    schema = None
+    writer = None
+    # Chunks are written to a temporary key so that a failing chunk never
+    # leaves a partial file in place of the previous output.
+    with storage.staged(destination) as staging, storage.open(staging, 'wb') as output:
+        try:
+            chunks = iter(read_csv(source, chunksize=chunk_size))
+            for chunk_number in itertools.count():
+                with record_metrics.stage('read'):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                record_metrics.increment('rows', len(chunk))
+                record_metrics.increment('chunks')
+                if writer is None:
+                    schema = lock_schema(pa.Schema.from_pandas(chunk, preserve_index=False))
+                    writer = pq.ParquetWriter(output, schema, **parquet_writer_options())
+                try:
+                    table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                    raise ValueError(
+                        f'Chunk {chunk_number} of {source} does not match the schema inferred from the first '
+                        f'chunk, raise INGESTION_CHUNK_SIZE: {e}')
+                with record_metrics.stage('write'):
+                    writer.write_table(table, row_group_size=row_group_size or PARQUET_ROW_GROUP_SIZE or None)
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+def read_csv_arrow(source):
+    import pyarrow.csv as pacsv
+
+    return pacsv.read_csv(source, convert_options=pacsv.ConvertOptions(strings_can_be_null=True))
+
+
+def open_csv_arrow(source):
+    import pyarrow.csv as pacsv
+
+    return pacsv.open_csv(source, convert_options=pacsv.ConvertOptions(strings_can_be_null=True))
+
+
+def convert_csv_arrow(source, destination, record_metrics=None):
+    """Convert a CSV to Parquet through an Arrow table, skipping pandas."""
+    import pyarrow.parquet as pq
+
+    record_metrics = record_metrics or RecordMetrics()
+    with record_metrics.stage('read'), storage.open(source, 'rb') as f:
+        table = read_csv_arrow(f)
+    record_metrics.increment('rows', table.num_rows)
+    with record_metrics.stage('write'), storage.staged(destination) as staging, storage.open(staging, 'wb') as f:
+        pq.write_table(table, f, **parquet_write_options())
+
+
+def convert_csv_arrow_streaming(source, destination, chunk_size, row_group_size=0, record_metrics=None):
+    """Convert a CSV to a single Parquet file through Arrow record batches.
+
+    pyarrow infers the schema from the first block of the file and parses
+    the rest into it; batches are buffered until they add up to chunk_size
+    rows, so memory stays bounded as with convert_csv_streaming.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    record_metrics = record_metrics or RecordMetrics()
+    with storage.open(source, 'rb') as f, storage.staged(destination) as staging, \
+            storage.open(staging, 'wb') as output:
+        with record_metrics.stage('read'):
+            reader = open_csv_arrow(f)
+        writer = pq.ParquetWriter(output, reader.schema, **parquet_writer_options())
+        try:
+            batches = iter(reader)
+            pending = []
+            while True:
+                with record_metrics.stage('read'):
+                    batch = next(batches, None)
+                if batch is not None:
+                    record_metrics.increment('rows', batch.num_rows)
+                    pending.append(batch)
+                if pending and (batch is None or sum(b.num_rows for b in pending) >= chunk_size):
+                    record_metrics.increment('chunks')
+                    with record_metrics.stage('write'):
+                        writer.write_table(pa.Table.from_batches(pending, reader.schema),
+                                           row_group_size=row_group_size or PARQUET_ROW_GROUP_SIZE or None)
+                    pending = []
+                if batch is None:
+                    break
+        finally:
+            writer.close()
+
+
+def csv_bytes_to_parquet(data):
+    buffer = io.BytesIO()
+    if INGESTION_ARROW:
+        import pyarrow.parquet as pq
+
+        pq.write_table(read_csv_arrow(io.BytesIO(data)), buffer, **parquet_write_options())
+    else:
+        pd.read_csv(io.BytesIO(data)).to_parquet(buffer, **parquet_write_options())
+
+    return buffer.getvalue()
+
+
+def convert_csv_in_process(source, destination, parse_pool, record_metrics=None):
+    """Download and upload in the calling thread, parse in parse_pool."""
+    record_metrics = record_metrics or RecordMetrics()
+    with record_metrics.stage('read'), storage.open(source, 'rb') as f:
+        data = f.read()
+    with record_metrics.stage('parse'):
+        parquet_data = parse_pool.submit(csv_bytes_to_parquet, data).result()
+    with record_metrics.stage('write'), storage.open(destination, 'wb') as f:
+        f.write(parquet_data)
+    record_metrics.increment('bytes_read', len(data))
+    record_metrics.increment('bytes_written', len(parquet_data))
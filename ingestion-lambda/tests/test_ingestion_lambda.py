@@ -1,6 +1,13 @@
+import os
+import tempfile
 import unittest
 import json
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+import pandas as pd
+import pyarrow.parquet as pq
 import ingestion_lambda
+from storage import MemoryStorage
 from parameterized import parameterized
 
 
@@ -47,3 +54,247 @@ class TestLambdaFunction(unittest.TestCase):
         }
 
         self.assertRaises(KeyError, ingestion_lambda.read_variables, event['Records'][0])
+
+    def test_convert_csv_streaming(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'sample.csv')
+            destination = os.path.join(directory, 'sample.parquet.gzip')
+            with open(source, 'w') as f:
+                f.write('ID,review,rating\n0,dobre,5\n1,,\n2,złe,1\n3,ok,3\n4,super,5\n')
+
+            ingestion_lambda.convert_csv_streaming(source, destination, chunk_size=2, row_group_size=1)
+
+            self.assertEqual(pq.ParquetFile(destination).metadata.num_row_groups, 5)
+            pd.testing.assert_frame_equal(pd.read_parquet(destination), pd.read_csv(source))
+
+    def test_convert_csv_streaming_schema_mismatch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'sample.csv')
+            with open(source, 'w') as f:
+                f.write('ID,rating\n0,5\n1,not a number\n')
+
+            self.assertRaises(ValueError, ingestion_lambda.convert_csv_streaming,
+                              source, os.path.join(directory, 'sample.parquet.gzip'), 1)
+            self.assertListEqual(os.listdir(directory), ['sample.csv'])
+
+    def test_convert_csv_streaming_schema_mismatch_keeps_previous_output(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'sample.csv')
+            destination = os.path.join(directory, 'sample.parquet.gzip')
+            with open(source, 'w') as f:
+                f.write('ID,rating\n0,5\n1,not a number\n')
+            with open(destination, 'wb') as f:
+                f.write(b'previous output')
+
+            self.assertRaises(ValueError, ingestion_lambda.convert_csv_streaming, source, destination, 1)
+            with open(destination, 'rb') as f:
+                self.assertEqual(f.read(), b'previous output')
+            self.assertListEqual(sorted(os.listdir(directory)), ['sample.csv', 'sample.parquet.gzip'])
+
+    def test_convert_csv_arrow(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'sample.csv')
+            destination = os.path.join(directory, 'sample.parquet.gzip')
+            with open(source, 'w') as f:
+                f.write('ID,review,rating\n0,dobre,5\n1,,\n2,złe,1\n')
+
+            ingestion_lambda.convert_csv_arrow(source, destination)
+
+            pd.testing.assert_frame_equal(pd.read_parquet(destination), pd.read_csv(source))
+
+    def test_convert_csv_arrow_write_failure_keeps_previous_output(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'sample.csv')
+            destination = os.path.join(directory, 'sample.parquet.gzip')
+            with open(source, 'w') as f:
+                f.write('ID,review\n0,dobre\n')
+            with open(destination, 'wb') as f:
+                f.write(b'previous output')
+
+            with mock.patch('pyarrow.parquet.write_table', side_effect=OSError('disk full')):
+                self.assertRaises(OSError, ingestion_lambda.convert_csv_arrow, source, destination)
+            with open(destination, 'rb') as f:
+                self.assertEqual(f.read(), b'previous output')
+            self.assertListEqual(sorted(os.listdir(directory)), ['sample.csv', 'sample.parquet.gzip'])
+
+    def test_convert_csv_arrow_streaming(self):
+        import pyarrow.csv as pacsv
+
+        def open_csv_arrow(source):
+            return pacsv.open_csv(source, read_options=pacsv.ReadOptions(block_size=24),
+                                  convert_options=pacsv.ConvertOptions(strings_can_be_null=True))
+
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'sample.csv')
+            destination = os.path.join(directory, 'sample.parquet.gzip')
+            with open(source, 'w') as f:
+                f.write('ID,review,rating\n0,dobre,5\n1,,\n2,złe,1\n3,ok,3\n4,super,5\n')
+            record_metrics = ingestion_lambda.RecordMetrics()
+
+            with mock.patch('ingestion_lambda.open_csv_arrow', open_csv_arrow):
+                ingestion_lambda.convert_csv_arrow_streaming(source, destination, chunk_size=2,
+                                                             record_metrics=record_metrics)
+
+            self.assertEqual(record_metrics.counters['rows'], 5)
+            self.assertEqual(pq.ParquetFile(destination).metadata.num_row_groups,
+                             record_metrics.counters['chunks'])
+            self.assertGreater(record_metrics.counters['chunks'], 1)
+            pd.testing.assert_frame_equal(pd.read_parquet(destination), pd.read_csv(source))
+
+    @mock.patch.dict(os.environ, {'DATA_LAKE_NAME': 'data-lake', 'KEY_OUT_PREFIX': 'parquet'})
+    @mock.patch('ingestion_lambda.INGESTION_ARROW', True)
+    @mock.patch('ingestion_lambda.INGESTION_CHUNK_SIZE', 1000)
+    @mock.patch('ingestion_lambda.convert_csv_arrow')
+    @mock.patch('ingestion_lambda.convert_csv_arrow_streaming')
+    def test_lambda_handler_streams_arrow_chunks(self, convert_csv_arrow_streaming, convert_csv_arrow):
+        records = [{'s3': {'bucket': {'name': 'in'}, 'object': {'key': 'data/sample.csv'}}}]
+
+        ingestion_lambda.lambda_handler({'Input': {'Records': records}}, None)
+
+        convert_csv_arrow_streaming.assert_called_once()
+        self.assertEqual(convert_csv_arrow_streaming.call_args[0][2], 1000)
+        convert_csv_arrow.assert_not_called()
+
+    @mock.patch.dict(os.environ, {'DATA_LAKE_NAME': 'data-lake', 'KEY_OUT_PREFIX': 'parquet'})
+    @mock.patch('ingestion_lambda.INGESTION_MAX_WORKERS', 4)
+    @mock.patch('ingestion_lambda.INGESTION_REPORT_FAILURES', True)
+    @mock.patch('ingestion_lambda.pd.DataFrame.to_parquet')
+    def test_lambda_handler_parallel_reports_failures_in_order(self, to_parquet):
+        def read_csv(path):
+            if 'broken' in path:
+                raise FileNotFoundError(path)
+            return pd.DataFrame({'ID': [0], 'review': ['dobre']})
+
+        records = [{'s3': {'bucket': {'name': 'in'}, 'object': {'key': f'data/{name}.csv'}}}
+                   for name in ['first', 'broken', 'third']]
+        records.append({'s3': {'bucket': {'name': 'in'}, 'object': {}}})
+
+        with mock.patch('ingestion_lambda.pd.read_csv', side_effect=read_csv):
+            result = ingestion_lambda.lambda_handler({'Input': {'Records': records}}, None)
+
+        self.assertEqual(result[0], {'bucket': 'data-lake', 'key': 'parquet/first.parquet.gzip'})
+        self.assertIn('broken.csv', result[1]['error'])
+        self.assertEqual(result[2], {'bucket': 'data-lake', 'key': 'parquet/third.parquet.gzip'})
+        self.assertIn('error', result[3])
+        self.assertEqual(to_parquet.call_count, 2)
+
+    @mock.patch.dict(os.environ, {'DATA_LAKE_NAME': 'data-lake', 'KEY_OUT_PREFIX': 'parquet'})
+    @mock.patch('ingestion_lambda.pd.DataFrame.to_parquet')
+    def test_lambda_handler_serial_raises_failures(self, to_parquet):
+        records = [{'s3': {'bucket': {'name': 'in'}, 'object': {'key': 'data/broken.csv'}}},
+                   {'s3': {'bucket': {'name': 'in'}, 'object': {'key': 'data/second.csv'}}}]
+        read_csv = mock.Mock(side_effect=[FileNotFoundError('broken.csv'), pd.DataFrame({'ID': [0]})])
+
+        with mock.patch('ingestion_lambda.pd.read_csv', read_csv):
+            with self.assertRaises(FileNotFoundError):
+                ingestion_lambda.lambda_handler({'Input': {'Records': records}}, None)
+
+    @mock.patch.dict(os.environ, {'DATA_LAKE_NAME': 'data-lake', 'KEY_OUT_PREFIX': 'parquet'})
+    @mock.patch('ingestion_lambda.INGESTION_MAX_WORKERS', 4)
+    @mock.patch('ingestion_lambda.pd.DataFrame.to_parquet')
+    def test_lambda_handler_parallel_raises_after_other_records(self, to_parquet):
+        def read_csv(path):
+            if 'broken' in path:
+                raise FileNotFoundError(path)
+            return pd.DataFrame({'ID': [0], 'review': ['dobre']})
+
+        records = [{'s3': {'bucket': {'name': 'in'}, 'object': {'key': f'data/{name}.csv'}}}
+                   for name in ['broken', 'second', 'third']]
+
+        with mock.patch('ingestion_lambda.pd.read_csv', side_effect=read_csv):
+            with self.assertRaises(FileNotFoundError):
+                ingestion_lambda.lambda_handler({'Input': {'Records': records}}, None)
+
+        self.assertEqual(to_parquet.call_count, 2)
+
+    @mock.patch.dict(os.environ, {'DATA_LAKE_NAME': 'data-lake', 'KEY_OUT_PREFIX': 'parquet'})
+    @mock.patch('ingestion_lambda.INGESTION_REPORT_FAILURES', True)
+    @mock.patch('ingestion_lambda.pd.DataFrame.to_parquet')
+    def test_lambda_handler_serial_reports_failures_like_parallel(self, to_parquet):
+        records = [{'s3': {'bucket': {'name': 'in'}, 'object': {'key': 'data/broken.csv'}}},
+                   {'s3': {'bucket': {'name': 'in'}, 'object': {'key': 'data/second.csv'}}}]
+        read_csv = mock.Mock(side_effect=[FileNotFoundError('broken.csv'), pd.DataFrame({'ID': [0]})])
+
+        with mock.patch('ingestion_lambda.pd.read_csv', read_csv):
+            result = ingestion_lambda.lambda_handler({'Input': {'Records': records}}, None)
+
+        self.assertIn('broken.csv', result[0]['error'])
+        self.assertEqual(result[1], {'bucket': 'data-lake', 'key': 'parquet/second.parquet.gzip'})
+
+    @mock.patch.dict(os.environ, {'DATA_LAKE_NAME': 'data-lake', 'KEY_OUT_PREFIX': 'parquet'})
+    @mock.patch('ingestion_lambda.INGESTION_PARSE_PROCESSES', 2)
+    @mock.patch('ingestion_lambda.INGESTION_CHUNK_SIZE', 1)
+    @mock.patch('ingestion_lambda.ProcessPoolExecutor')
+    @mock.patch('ingestion_lambda.convert_csv_streaming')
+    def test_lambda_handler_streams_chunks_instead_of_parse_processes(self, convert_csv_streaming,
+                                                                       process_pool):
+        records = [{'s3': {'bucket': {'name': 'in'}, 'object': {'key': 'data/sample.csv'}}}]
+
+        result = ingestion_lambda.lambda_handler({'Input': {'Records': records}}, None)
+
+        self.assertEqual(result, [{'bucket': 'data-lake', 'key': 'parquet/sample.parquet.gzip'}])
+        process_pool.assert_not_called()
+        convert_csv_streaming.assert_called_once()
+
+    def test_convert_csv_in_process(self):
+        with tempfile.TemporaryDirectory() as directory, ProcessPoolExecutor(1) as parse_pool:
+            source = os.path.join(directory, 'sample.csv')
+            destination = os.path.join(directory, 'sample.parquet.gzip')
+            with open(source, 'w') as f:
+                f.write('ID,review\n0,dobre\n1,złe\n')
+
+            ingestion_lambda.convert_csv_in_process(source, destination, parse_pool)
+
+            pd.testing.assert_frame_equal(pd.read_parquet(destination), pd.read_csv(source))
+
+    @mock.patch.dict(os.environ, {'DATA_LAKE_NAME': 'data-lake', 'KEY_OUT_PREFIX': 'parquet'})
+    @mock.patch('ingestion_lambda.METRICS_ENABLED', True)
+    @mock.patch('ingestion_lambda.pd.DataFrame.to_parquet')
+    @mock.patch('ingestion_lambda.pd.read_csv', return_value=pd.DataFrame({'ID': [0, 1], 'review': ['a', 'b']}))
+    def test_lambda_handler_metrics(self, read_csv, to_parquet):
+        sink = mock.Mock()
+        records = [{'s3': {'bucket': {'name': 'in'}, 'object': {'key': 'data/sample.csv'}}}]
+
+        with mock.patch('ingestion_lambda.metrics_sinks', [sink]), mock.patch('builtins.print'):
+            result = ingestion_lambda.lambda_handler({'Input': {'Records': records}}, None)
+
+        self.assertEqual(result[0]['metrics']['counters'], {'rows': 2})
+        self.assertEqual(set(result[0]['metrics']['timings']), {'read', 'write'})
+        sink.assert_called_once()
+        self.assertEqual(sink.call_args[0][0]['source'], 's3://in/data/sample.csv')
+
+    @mock.patch.dict(os.environ, {'DATA_LAKE_NAME': 'data-lake', 'KEY_OUT_PREFIX': 'parquet'})
+    @mock.patch('ingestion_lambda.INGESTION_SKIP_UNCHANGED', True)
+    @mock.patch('ingestion_lambda.pd.DataFrame.to_parquet')
+    @mock.patch('ingestion_lambda.pd.read_csv', return_value=pd.DataFrame({'ID': [0], 'review': ['a']}))
+    def test_lambda_handler_skips_unchanged_source(self, read_csv, to_parquet):
+        records = [{'s3': {'bucket': {'name': 'in'}, 'object': {'key': 'data/sample.csv'}}}]
+        event = {'Input': {'Records': records}}
+
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch('ingestion_lambda.INGESTION_PROCESSED_INDEX_URI', directory), \
+                mock.patch('ingestion_lambda.source_fingerprint', return_value='etag-1') as source_fingerprint, \
+                mock.patch('builtins.print'):
+            first = ingestion_lambda.lambda_handler(event, None)
+            second = ingestion_lambda.lambda_handler(event, None)
+            source_fingerprint.return_value = 'etag-2'
+            third = ingestion_lambda.lambda_handler(event, None)
+
+        self.assertEqual(first, [{'bucket': 'data-lake', 'key': 'parquet/sample.parquet.gzip'}])
+        self.assertEqual(second, [dict(first[0], skipped=True)])
+        self.assertEqual(third, first)
+        self.assertEqual(read_csv.call_count, 2)
+
+    @mock.patch.dict(os.environ, {'DATA_LAKE_NAME': 'data-lake', 'KEY_OUT_PREFIX': 'parquet'})
+    def test_lambda_handler_with_memory_storage(self):
+        storage = MemoryStorage()
+        with storage.open('s3://in/memory-test/sample.csv', 'w') as f:
+            f.write('ID,review\n0,dobre\n1,złe\n')
+        records = [{'s3': {'bucket': {'name': 'in'}, 'object': {'key': 'memory-test/sample.csv'}}}]
+
+        with mock.patch('ingestion_lambda.storage', storage), mock.patch('builtins.print'):
+            result = ingestion_lambda.lambda_handler({'Input': {'Records': records}}, None)
+
+        self.assertEqual(result, [{'bucket': 'data-lake', 'key': 'parquet/sample.parquet.gzip'}])
+        with storage.open('s3://data-lake/parquet/sample.parquet.gzip') as f:
+            self.assertEqual(pd.read_parquet(f)['review'].tolist(), ['dobre', 'złe'])
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The lambda code lives in src/, which is what the Docker image ships.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
@@ -0,0 +1,356 @@
+import asyncio
+import json
+import os
+from contextlib import AsyncExitStack
+from typing import Protocol
+
+import metrics
+import translation_lambda
+from throttling import call_with_throttling_async
+from translation_lambda import logger
+
+# Translate requests in flight at once across all records of an event.
+TRANSLATION_ASYNC_CONCURRENCY = int(
+    os.environ.get("TRANSLATION_ASYNC_CONCURRENCY") or "32"
+)
+
+# "aiobotocore" talks to Amazon Translate, "stub" answers locally.
+TRANSLATION_ASYNC_CLIENT = os.environ.get("TRANSLATION_ASYNC_CLIENT") or "aiobotocore"
+
+
+class AsyncTranslateClient(Protocol):
+    """Interface of the async translate clients used by this module.
+
+    Clients are async context managers; ``translate_text`` takes and returns
+    the same fields as the boto3 ``translate_text`` call.
+    """
+
+    async def __aenter__(self):
+        ...
+
+    async def __aexit__(self, *exc_info):
+        ...
+
+    async def translate_text(self, Text, SourceLanguageCode, TargetLanguageCode):
+        ...
+
+
+class AioBotoTranslateClient:
+    """Amazon Translate through aiobotocore.
+
+    One client, and so one connection pool sized to the concurrency cap, is
+    shared by every request of the invocation.
+    """
+
+    def __init__(self, max_pool_connections=TRANSLATION_ASYNC_CONCURRENCY):
+        self.max_pool_connections = max_pool_connections
+        self._client = None
+        self._exit_stack = AsyncExitStack()
+
+    async def __aenter__(self):
+        from aiobotocore.config import AioConfig
+        from aiobotocore.session import get_session
+
+        config = AioConfig(
+            retries={
+                "max_attempts": translation_lambda.TRANSLATION_BOTO_CLIENT_MAX_ATTEMPTS,
+                "mode": "standard",
+            },
+            region_name=translation_lambda.REGION,
+            read_timeout=translation_lambda.TRANSLATION_BOTO_CLIENT_READ_TIMEOUT,
+            connect_timeout=translation_lambda.TRANSLATION_BOTO_CLIENT_CONNECT_TIMEOUT,
+            max_pool_connections=self.max_pool_connections,
+        )
+        self._client = await self._exit_stack.enter_async_context(
+            get_session().create_client("translate", config=config)
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._exit_stack.aclose()
+
+    async def translate_text(self, Text, SourceLanguageCode, TargetLanguageCode):
+        return await self._client.translate_text(
+            Text=Text,
+            SourceLanguageCode=SourceLanguageCode,
+            TargetLanguageCode=TargetLanguageCode,
+        )
+
+
+class StubAsyncTranslateClient:
+    """Local client that upper-cases the text after ``latency`` seconds."""
+
+    def __init__(self, latency=0.0, source_language="pl"):
+        self.latency = latency
+        self.source_language = source_language
+        self.calls = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+    async def translate_text(self, Text, SourceLanguageCode, TargetLanguageCode):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if SourceLanguageCode == "auto":
+            SourceLanguageCode = self.source_language
+        return {
+            "TranslatedText": Text.upper(),
+            "SourceLanguageCode": SourceLanguageCode,
+            "TargetLanguageCode": TargetLanguageCode,
+        }
+
+
+def create_client(name=None):
+    name = name or TRANSLATION_ASYNC_CLIENT
+    if name == "aiobotocore":
+        return AioBotoTranslateClient()
+    if name == "stub":
+        return StubAsyncTranslateClient()
+    raise ValueError(f"Unknown async translate client: {name}")
+
+
+async def request_translation(client, semaphore, **kwargs):
+    """Async translation_lambda.request_translation.
+
+    Requests share the semaphore capping those in flight and the rate
+    limiter of the sync path, and are counted in the same metrics.
+    """
+    record_metrics = metrics.current()
+    try:
+        async with semaphore:
+            response = await call_with_throttling_async(
+                client.translate_text,
+                translation_lambda.translation_rate_limiter,
+                translation_lambda.TRANSLATION_THROTTLE_RETRIES,
+                **kwargs,
+            )
+    except Exception as exception:
+        if record_metrics.enabled:
+            translation_lambda.count_request(
+                record_metrics, kwargs, getattr(exception, "response", None)
+            )
+            record_metrics.increment("failed_translate_calls")
+        raise
+
+    if record_metrics.enabled:
+        translation_lambda.count_request(record_metrics, kwargs, response)
+
+    return response
+
+
+async def translate_batch_or_rows(client, semaphore, batch):
+
+    if len(batch) > 1:
+        try:
+            response = await request_translation(
+                client, semaphore, **translation_lambda.batch_request(batch)
+            )
+            return translation_lambda.batch_outcomes(batch, response), []
+        except Exception as batch_exception:
+            logger.warning(
+                f"Batch of {len(batch)} rows failed, translating rows separately: {batch_exception}"
+            )
+
+    translated = []
+    translation_errors = []
+    for row in batch:
+        try:
+            translated.append(await translate_row(client, semaphore, row))
+        except Exception as translate_exception:
+            translation_errors.append(
+                translation_lambda.translation_error(row, translate_exception)
+            )
+
+    return translated, translation_errors
+
+
+async def translate_row(client, semaphore, row):
+
+    if translation_lambda.needs_segmentation(row["review"]):
+        language, translation = await translate_segmented(
+            client, semaphore, row["review"], row.get("source_language"),
+            row.get("target_language"),
+        )
+        return translation_lambda.translation_outcome(row, language, translation)
+
+    response = await request_translation(
+        client, semaphore, **translation_lambda.row_request(row)
+    )
+
+    return translation_lambda.row_outcome(row, response)
+
+
+async def translate_segmented(client, semaphore, text, source_language=None,
+                              target_language=None):
+    """Async translation_lambda.translate_segmented.
+
+    The segments after the one detecting the language are sent together,
+    bounded by the semaphore rather than TRANSLATION_SEGMENT_WORKERS.
+    """
+    segments = translation_lambda.text_segments(text)
+
+    async def translate_segment(segment, source_language):
+        if not segment.strip():
+            return segment, None
+        response = await request_translation(
+            client,
+            semaphore,
+            **translation_lambda.translation_request(segment, source_language, target_language),
+        )
+        return response.get("TranslatedText"), response.get("SourceLanguageCode")
+
+    language = source_language or translation_lambda.SOURCE_LANGUAGE_CODE
+    translations = []
+    remaining = segments
+    if language == "auto":
+        first = translation_lambda.first_segment(segments)
+        for segment, _ in segments[:first + 1]:
+            translation, detected = await translate_segment(segment, language)
+            translations.append(translation)
+        language = detected
+        remaining = segments[first + 1:]
+
+    translations.extend(
+        translation
+        for translation, _ in await asyncio.gather(
+            *(translate_segment(segment, language) for segment, _ in remaining)
+        )
+    )
+
+    return language, translation_lambda.join_segments(translations, segments)
+
+
+async def translate_distinct(unique_rows, client, semaphore):
+    """Async translation_lambda.translate_distinct.
+
+    A fixed number of worker tasks drain the units so that memory does not
+    grow with the number of rows.
+    """
+    outcomes, pending = translation_lambda.lookup_distinct(unique_rows)
+    units = translation_lambda.distinct_batches(pending)
+
+    async def worker():
+        for unit in units:
+            translated, errors = await translate_batch_or_rows(client, semaphore, unit)
+            translation_lambda.store_outcomes(unique_rows, outcomes, translated, errors)
+
+    await asyncio.gather(
+        *(worker() for _ in range(min(TRANSLATION_ASYNC_CONCURRENCY, len(pending))))
+    )
+    if translation_lambda.translation_cache is not None:
+        translation_lambda.translation_cache.flush()
+
+    return outcomes
+
+
+async def translate_dataframe(df, client, semaphore, target_languages=None):
+    """Async counterpart of translation_lambda.translate_dataframe_batched.
+
+    With target_languages it follows translate_dataframe_multi instead and
+    returns {language: (translated, errors)}.
+    """
+    rows = [
+        {"ID": row_id, "review": review}
+        for row_id, review in zip(df["ID"], df["review"])
+    ]
+    unique_rows, row_unique_index = translation_lambda.deduplicate_rows(rows)
+    distinct_rows = (
+        translation_lambda.target_rows(unique_rows, target_languages)
+        if target_languages
+        else unique_rows
+    )
+
+    outcomes = await translate_distinct(distinct_rows, client, semaphore)
+    if translation_lambda.translation_cache is not None:
+        translation_lambda.translation_cache.add_duplicates(
+            len(target_languages or [None]) * (len(rows) - len(unique_rows))
+        )
+
+    if target_languages:
+        return translation_lambda.fan_out_targets(
+            rows, row_unique_index, outcomes, df["review"], target_languages
+        )
+    return translation_lambda.fan_out(rows, row_unique_index, outcomes, df["review"])
+
+
+async def translate(record, client, semaphore):
+    """Async translation_lambda.translate, with per-record metrics."""
+    if not translation_lambda.METRICS_ENABLED:
+        return await translate_record(record, client, semaphore)
+
+    # Every record runs as its own task, so activating the metrics here only
+    # affects this record even while the others are awaited.
+    record_metrics = metrics.Metrics()
+    with metrics.activate(record_metrics):
+        result = await translate_record(record, client, semaphore)
+    metrics.emit(
+        logger,
+        record_metrics,
+        event="translation_metrics",
+        key=record.get("key") if isinstance(record, dict) else None,
+    )
+    result["metrics"] = record_metrics.as_dict()
+
+    return result
+
+
+async def translate_record(record, client, semaphore):
+
+    loop = asyncio.get_running_loop()
+    record_metrics = metrics.current()
+    try:
+        source_bucket, source_key, file_name = translation_lambda.extract_path(
+            record=record
+        )
+    except Exception as exception:
+        return {
+            "path_extraction_error": str(exception),
+            "record": json.dumps(record, indent=4),
+        }
+
+    try:
+        with record_metrics.stage("read"):
+            df = await loop.run_in_executor(
+                None, metrics.bind(translation_lambda.read_source), source_bucket, source_key
+            )
+    except Exception as exception:
+        return {
+            "data_reading_error": str(exception),
+            "bucket": source_bucket,
+            "key": source_key,
+        }
+    record_metrics.increment("rows", len(df))
+
+    target_languages = translation_lambda.extract_target_languages(record)
+    with record_metrics.stage("translate"):
+        outputs = await translate_dataframe(df, client, semaphore, target_languages)
+    if target_languages:
+        return await loop.run_in_executor(
+            None, metrics.bind(translation_lambda.write_targets), file_name, outputs
+        )
+
+    translated, errors = outputs
+    return await loop.run_in_executor(
+        None, metrics.bind(translation_lambda.write_results), file_name, translated, errors
+    )
+
+
+async def translate_event(event, client=None):
+
+    semaphore = asyncio.Semaphore(TRANSLATION_ASYNC_CONCURRENCY)
+    async with (client or create_client()) as active_client:
+        return await asyncio.gather(
+            *(translate(record, active_client, semaphore) for record in event)
+        )
+
+
+def lambda_handler(event, context):
+
+    translation_output = asyncio.run(translate_event(event))
+    translation_lambda.publish_translation_cache()
+    logger.info(translation_output)
+    return translation_output
@@ -0,0 +1,96 @@
+import json
+
+from storage import Storage
+
+
+class CheckpointTimeout(Exception):
+    """Raised when an invocation stops early to resume in the next one.
+
+    The Lambda error type is the class name, so a Step Functions ``Retry``
+    on ``CheckpointTimeout`` re-invokes with the same record and resumes.
+    """
+
+
+class Checkpoint:
+    """Part files and manifest of one partially translated source file.
+
+    Everything lives under ``uri``, opened through ``storage``:
+    ``manifest.json`` plus ``part-00000.parquet`` for translated rows and
+    ``errors-00000.parquet`` for failed rows of each completed chunk. The
+    manifest is written after the parts it references, so a run killed
+    mid-chunk only repeats that chunk.
+
+    Once the outputs are written, complete() swaps the parts for the result,
+    which load() restores as ``result`` until clear() removes the checkpoint.
+    Other records of the event can then time out without this one being
+    translated again on the retry.
+    """
+
+    def __init__(self, uri, source, storage=None):
+        self.uri = uri.rstrip("/")
+        self.source = source
+        self.storage = storage or Storage()
+        self.offset = 0
+        self.last_id = None
+        self.parts = 0
+        self.error_parts = []
+        self.result = None
+
+    def _path(self, name):
+        return f"{self.uri}/{name}"
+
+    def part_path(self, index):
+        return self._path(f"part-{index:05d}.parquet")
+
+    def error_part_path(self, index):
+        return self._path(f"errors-{index:05d}.parquet")
+
+    def load(self):
+        """Restore the progress recorded for this source, if there is any."""
+        try:
+            with self.storage.open(self._path("manifest.json"), "rb") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return False
+        if manifest.get("source") != self.source:
+            return False
+
+        if "result" in manifest:
+            self.result = manifest["result"]
+            return True
+        self.offset = manifest["offset"]
+        self.last_id = manifest["last_id"]
+        self.parts = manifest["parts"]
+        self.error_parts = manifest["error_parts"]
+        return True
+
+    def save(self):
+        manifest = {
+            "source": self.source,
+            "offset": self.offset,
+            "last_id": self.last_id,
+            "parts": self.parts,
+            "error_parts": self.error_parts,
+        }
+        with self.storage.open(self._path("manifest.json"), "w") as f:
+            json.dump(manifest, f, default=str)
+
+    def complete(self, result):
+        """Record ``result`` for the finished source and remove the part files."""
+        with self.storage.open(self._path("manifest.json"), "w") as f:
+            json.dump({"source": self.source, "result": result}, f, default=str)
+        for index in range(self.parts):
+            self.storage.remove(self.part_path(index))
+        for index in self.error_parts:
+            self.storage.remove(self.error_part_path(index))
+        self.result = result
+
+    def reset(self):
+        self.offset = 0
+        self.last_id = None
+        self.parts = 0
+        self.error_parts = []
+
+    def clear(self):
+        """Remove the manifest and every part file."""
+        self.storage.remove(self.uri, recursive=True)
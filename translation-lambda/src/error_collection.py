@@ -0,0 +1,137 @@
+import pickle
+import tempfile
+from array import array
+from collections import Counter
+
+# Categories listed in a response; the rest only count towards error_count.
+MAX_REPORTED_CATEGORIES = 20
+
+
+class ErrorAccumulator:
+    """Compact record of the rows that failed to translate.
+
+    Only the ID, the row position in ``reviews`` and an interned error
+    category are kept per row; the original texts are looked up in
+    ``reviews`` when the error file is built. Past ``spill_rows`` rows the
+    buffered entries are moved to a temporary file. The first
+    ``sample_limit`` failures are kept in full for the response.
+    """
+
+    def __init__(self, reviews=None, spill_rows=100000, sample_limit=0):
+        self.reviews = reviews
+        self.spill_rows = spill_rows
+        self.sample_limit = sample_limit
+        self.samples = []
+        self._categories = []
+        self._category_codes = {}
+        self._counts = Counter()
+        self._ids = []
+        self._positions = array("q")
+        self._codes = array("q")
+        self._spill_file = None
+        self._spilled = 0
+
+    def __len__(self):
+        return self._spilled + len(self._ids)
+
+    def __iter__(self):
+        return self.records()
+
+    def _text(self, position):
+        if self.reviews is None or position < 0:
+            return None
+        if hasattr(self.reviews, "iloc"):
+            return self.reviews.iloc[position]
+        return self.reviews[position]
+
+    def add(self, position, row_id, message, text=None):
+        """Record a failure; ``text`` is only needed when position is -1."""
+        message = str(message)
+        code = self._category_codes.get(message)
+        if code is None:
+            code = self._category_codes[message] = len(self._categories)
+            self._categories.append(message)
+        self._counts[code] += 1
+        self._ids.append(row_id)
+        self._positions.append(position)
+        self._codes.append(code)
+        if len(self.samples) < self.sample_limit:
+            self.samples.append(
+                {
+                    "ID": row_id,
+                    "original_text": text if position < 0 else self._text(position),
+                    "error_message": message,
+                }
+            )
+        if self.spill_rows and len(self._ids) >= self.spill_rows:
+            self._spill()
+
+    def extend(self, errors):
+        """Count failures given as error dicts or a DataFrame of them.
+
+        Their original texts are only kept in the samples, so this is meant
+        for errors already written elsewhere.
+        """
+        if hasattr(errors, "to_dict"):
+            errors = errors.to_dict("records")
+        for error in errors:
+            self.add(-1, error["ID"], error["error_message"], error.get("original_text"))
+
+    def _spill(self):
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile()
+        pickle.dump((self._ids, self._positions, self._codes), self._spill_file)
+        self._spilled += len(self._ids)
+        self._ids = []
+        self._positions = array("q")
+        self._codes = array("q")
+
+    def _chunks(self):
+        if self._spill_file is not None:
+            self._spill_file.seek(0)
+            while True:
+                try:
+                    yield pickle.load(self._spill_file)
+                except EOFError:
+                    break
+            self._spill_file.seek(0, 2)
+        yield self._ids, self._positions, self._codes
+
+    def records(self):
+        """Yield every failure as an ID/original_text/error_message dict."""
+        for ids, positions, codes in self._chunks():
+            for row_id, position, code in zip(ids, positions, codes):
+                yield {
+                    "ID": row_id,
+                    "original_text": self._text(position),
+                    "error_message": self._categories[code],
+                }
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame(
+            list(self.records()), columns=["ID", "original_text", "error_message"]
+        )
+
+    def categories(self, limit=MAX_REPORTED_CATEGORIES):
+        return {
+            self._categories[code]: count
+            for code, count in self._counts.most_common(limit)
+        }
+
+    def summary(self, error_file):
+        summary = {
+            "error_file": error_file,
+            "error_count": len(self),
+            "error_categories": self.categories(),
+        }
+        if self.sample_limit:
+            summary["error_samples"] = self.samples
+
+        return summary
+
+    def close(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
@@ -0,0 +1,58 @@
+import hashlib
+import json
+
+from storage import Storage
+
+
+def source_version(url, storage=None):
+    """ETag of the object at ``url``, or its size and modification time."""
+    info = (storage or Storage()).info(url)
+    version = info.get("ETag")
+    if version is None:
+        version = f"{info.get('size')}-{info.get('mtime') or info.get('LastModified')}"
+
+    return str(version).strip('"')
+
+
+def fingerprint(source, config, storage=None):
+    """Hash of the source object version and the settings shaping the output."""
+    payload = {
+        "source": source,
+        "version": source_version(source, storage),
+        "config": config,
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+class ProcessedIndex:
+    """Results of sources whose outputs are current, keyed by output name.
+
+    Every entry is a small JSON object under ``uri`` holding the fingerprint
+    the outputs were produced from and the result returned at the time.
+    ``uri`` is usually next to the outputs on S3; a local directory such as
+    /tmp only lasts as long as the warm container.
+    """
+
+    def __init__(self, uri, storage=None):
+        self.uri = uri.rstrip("/")
+        self.storage = storage or Storage()
+
+    def _path(self, name):
+        return f"{self.uri}/{name}.json"
+
+    def lookup(self, name, fingerprint):
+        try:
+            with self.storage.open(self._path(name), "rb") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        if entry.get("fingerprint") != fingerprint:
+            return None
+
+        return entry["result"]
+
+    def record(self, name, fingerprint, result):
+        with self.storage.open(self._path(name), "w") as f:
+            json.dump({"fingerprint": fingerprint, "result": result}, f, default=str)
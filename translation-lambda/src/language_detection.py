@@ -0,0 +1,67 @@
+import importlib
+import re
+
+
+class LanguageDetector:
+    """Interface of the local language detectors used to route rows.
+
+    ``detect`` returns a language code, or None when unsure, in which case the
+    row is left to Amazon Translate's automatic detection.
+    """
+
+    def detect(self, text):
+        raise NotImplementedError
+
+
+class StopwordLanguageDetector(LanguageDetector):
+    """Guesses the language from common function words.
+
+    It only answers when a language has at least ``min_hits`` stopwords and
+    ``margin`` times as many as any other, so short or mixed texts stay with
+    the service's detection.
+    """
+
+    STOPWORDS = {
+        "en": {"the", "and", "is", "are", "was", "this", "that", "with", "for",
+               "not", "it", "of", "very", "my", "you", "have", "but"},
+        "pl": {"nie", "jest", "się", "na", "że", "bardzo", "ale", "jak", "był",
+               "była", "mi", "co", "tak", "już", "po"},
+        "de": {"der", "die", "das", "und", "ist", "nicht", "ich", "sehr", "mit",
+               "ein", "eine", "es", "zu", "aber"},
+        "fr": {"le", "les", "et", "est", "je", "pas", "très", "une", "avec",
+               "pour", "mais", "ce", "des"},
+        "es": {"el", "los", "y", "es", "muy", "una", "con", "para", "pero",
+               "que", "lo", "las"},
+    }
+
+    def __init__(self, min_hits=2, margin=2.0):
+        self.min_hits = min_hits
+        self.margin = margin
+
+    def detect(self, text):
+        if not isinstance(text, str):
+            return None
+        words = re.findall(r"\w+", text.lower())
+        ranked = sorted(
+            (
+                (sum(word in stopwords for word in words), language)
+                for language, stopwords in self.STOPWORDS.items()
+            ),
+            reverse=True,
+        )
+        (best_hits, best), (second_hits, _) = ranked[0], ranked[1]
+        if best_hits >= self.min_hits and best_hits >= self.margin * second_hits:
+            return best
+
+        return None
+
+
+def create_detector(name):
+    """Detector for "stopwords" or a ``module:attribute`` factory path."""
+    if name == "stopwords":
+        return StopwordLanguageDetector()
+    module_name, _, attribute = name.partition(":")
+    if not attribute:
+        raise ValueError(f"Unknown language detector: {name}")
+
+    return getattr(importlib.import_module(module_name), attribute)()
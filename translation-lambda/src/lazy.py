@@ -0,0 +1,53 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """Module proxy that imports the module on first attribute access.
+
+    Attributes are looked up on the real module every time, so patches
+    applied to the module itself stay visible through the proxy.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+class LazyObject:
+    """Proxy that builds its target with ``factory`` on first use.
+
+    The target is created once, under a lock, and then reused for the life of
+    the process, i.e. across warm Lambda invocations.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def __getattr__(self, attribute):
+        return getattr(self._get(), attribute)
+
+    def __repr__(self):
+        state = "created" if self._instance is not None else "not created"
+        return f"<lazy {getattr(self._factory, '__name__', 'object')} ({state})>"
@@ -0,0 +1,118 @@
+import contextvars
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+_sinks = []
+
+_active = contextvars.ContextVar("metrics", default=None)
+
+
+class Metrics:
+    """Stage timings and counters collected for one record."""
+
+    enabled = True
+
+    def __init__(self):
+        self.timings = defaultdict(float)
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.timings[name] += elapsed
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def as_dict(self):
+        return {
+            "timings": {name: round(seconds, 4) for name, seconds in self.timings.items()},
+            "counters": dict(self.counters),
+        }
+
+
+class _NullStage:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullMetrics:
+    """Stand-in used when metrics are disabled; every call is a no-op."""
+
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def increment(self, name, value=1):
+        pass
+
+    def as_dict(self):
+        return None
+
+
+NULL_METRICS = NullMetrics()
+
+
+def current():
+    """Metrics of the record being processed, or NULL_METRICS."""
+    return _active.get() or NULL_METRICS
+
+
+@contextmanager
+def activate(metrics):
+    """Make ``metrics`` the target of current() for the enclosed block.
+
+    The active metrics are a context variable, so records translated
+    concurrently as asyncio tasks each report into their own. Functions run
+    on worker threads are wrapped with bind() to report into the record that
+    started them.
+    """
+    token = _active.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _active.reset(token)
+
+
+def bind(function):
+    """Wrap ``function`` to run with the metrics active in the caller."""
+    active = current()
+
+    def bound(*args, **kwargs):
+        with activate(active):
+            return function(*args, **kwargs)
+
+    return bound
+
+
+def register_sink(sink):
+    """Call ``sink(payload)`` with every emitted metrics payload."""
+    _sinks.append(sink)
+
+
+def unregister_sink(sink):
+    _sinks.remove(sink)
+
+
+def emit(logger, metrics, **labels):
+    payload = dict(labels, **metrics.as_dict())
+    logger.info(json.dumps(payload, default=str))
+    for sink in list(_sinks):
+        sink(payload)
+
+    return payload
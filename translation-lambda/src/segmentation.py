@@ -0,0 +1,58 @@
+import re
+
+# Tried in order: paragraphs, sentences, then words.
+SEGMENT_BOUNDARIES = [r"\n\s*\n", r"(?<=[.!?…])\s+", r"\s+"]
+
+
+def utf8_size(text):
+    return len(text.encode("utf-8"))
+
+
+def split_bytes(text, max_bytes):
+    """Cut text into pieces of at most max_bytes without splitting characters."""
+    encoded = text.encode("utf-8")
+    pieces = []
+    while encoded:
+        cut = min(max_bytes, len(encoded))
+        # Step back over UTF-8 continuation bytes to a character boundary.
+        while cut < len(encoded) and encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        pieces.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+
+    return pieces
+
+
+def split_text(text, max_bytes, level=0):
+    """Split text into ``(segment, separator)`` pairs of at most max_bytes.
+
+    The coarsest boundary that gets every segment under the limit is used and
+    neighbouring pieces are packed together again, so joining every segment
+    with its separator gives back the original text.
+    """
+    if utf8_size(text) <= max_bytes:
+        return [(text, "")]
+    if level == len(SEGMENT_BOUNDARIES):
+        return [(piece, "") for piece in split_bytes(text, max_bytes)]
+
+    parts = re.split(f"({SEGMENT_BOUNDARIES[level]})", text)
+    segments = []
+    current = None
+    pending = ""
+    for index in range(0, len(parts), 2):
+        piece = parts[index]
+        if current is not None and utf8_size(current + pending + piece) <= max_bytes:
+            current = current + pending + piece
+        else:
+            if current is not None:
+                segments.append((current, pending))
+            if utf8_size(piece) > max_bytes:
+                pieces = split_text(piece, max_bytes, level + 1)
+                segments.extend(pieces[:-1])
+                current = pieces[-1][0]
+            else:
+                current = piece
+        pending = parts[index + 1] if index + 1 < len(parts) else ""
+    segments.append((current, pending))
+
+    return segments
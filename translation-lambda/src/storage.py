@@ -0,0 +1,211 @@
+"""Where the lambdas read and write their files.
+
+Both lambdas address files with s3://bucket/key URLs. A storage maps such a
+URL to the location actually used and supplies the fsspec options to open
+it with, so the same code runs against S3, a local directory or memory.
+ingestion-lambda/storage.py is an identical copy, as each image ships its
+own.
+"""
+import io
+import os
+import queue
+import threading
+import uuid
+from contextlib import contextmanager
+
+# "s3" (default), "local" (files under STORAGE_LOCAL_ROOT/<bucket>/<key>) or
+# "memory" (fsspec's in-process memory filesystem).
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND") or "s3"
+
+STORAGE_LOCAL_ROOT = os.environ.get("STORAGE_LOCAL_ROOT") or "/tmp/storage"
+
+# S3 transfer tunables, unset keeps the s3fs defaults. The block size is both
+# the read-ahead buffer and the multipart upload part size (at least 5 MiB).
+STORAGE_BLOCK_SIZE = int(os.environ.get("STORAGE_BLOCK_SIZE") or "0")
+
+# s3fs read cache strategy, e.g. "readahead", "bytes", "blockcache" or "none".
+STORAGE_CACHE_TYPE = os.environ.get("STORAGE_CACHE_TYPE")
+
+# Size of the HTTP connection pool reused by all S3 requests of the process.
+STORAGE_MAX_POOL_CONNECTIONS = int(
+    os.environ.get("STORAGE_MAX_POOL_CONNECTIONS") or "0"
+)
+
+
+def is_local(url):
+    return "://" not in url or url.startswith("file://")
+
+
+class Storage:
+    """Maps s3:// URLs to locations and opens them through fsspec.
+
+    Paths that are not s3:// URLs are used as they are. The lambdas hand
+    ``url(path)`` and ``pandas_options(url)`` to pandas, and use ``open``,
+    ``info``, ``exists``, ``remove``, ``move`` and ``staged`` for everything
+    else.
+    """
+
+    def url(self, path):
+        return path
+
+    def url_for_write(self, path):
+        """Like url(), creating the parent directory of local files."""
+        url = self.url(path)
+        if is_local(url):
+            directory = os.path.dirname(url[len("file://"):] if url.startswith("file://") else url)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        return url
+
+    def storage_options(self, url):
+        return {}
+
+    def pandas_options(self, url):
+        options = self.storage_options(url)
+        return {"storage_options": options} if options else {}
+
+    def open(self, path, mode="rb"):
+        import fsspec
+
+        url = self.url_for_write(path) if mode[0] in "wa" else self.url(path)
+        return fsspec.open(url, mode, **self.storage_options(url))
+
+    def _filesystem(self, path):
+        import fsspec
+
+        url = self.url(path)
+        return fsspec.core.url_to_fs(url, **self.storage_options(url))
+
+    def info(self, path):
+        fs, fs_path = self._filesystem(path)
+        return fs.info(fs_path)
+
+    def exists(self, path):
+        fs, fs_path = self._filesystem(path)
+        return fs.exists(fs_path)
+
+    def remove(self, path, recursive=False):
+        fs, fs_path = self._filesystem(path)
+        if fs.exists(fs_path):
+            fs.rm(fs_path, recursive=recursive)
+
+    def move(self, source, destination):
+        fs, source_path = self._filesystem(source)
+        self.url_for_write(destination)
+        _, destination_path = self._filesystem(destination)
+        fs.mv(source_path, destination_path)
+
+    @contextmanager
+    def staged(self, path):
+        """Yield a temporary path to write ``path`` to.
+
+        The temporary file replaces ``path`` only once the block completes;
+        if it raises, the file is removed and ``path`` is left as it was.
+        """
+        staging = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            yield staging
+        except BaseException:
+            self.remove(staging)
+            raise
+        self.move(staging, path)
+
+
+class S3Storage(Storage):
+    """Amazon S3 through s3fs, with optional transfer tunables."""
+
+    def __init__(self, block_size=0, cache_type=None, max_pool_connections=0):
+        self.options = {}
+        if block_size:
+            self.options["default_block_size"] = block_size
+        if cache_type:
+            self.options["default_cache_type"] = cache_type
+        if max_pool_connections:
+            self.options["config_kwargs"] = {"max_pool_connections": max_pool_connections}
+
+    def storage_options(self, url):
+        return dict(self.options) if url.startswith("s3://") else {}
+
+
+class LocalStorage(Storage):
+    """Keeps s3://bucket/key as ``root/bucket/key`` on the local disk."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def url(self, path):
+        if path.startswith("s3://"):
+            return os.path.join(self.root, path[len("s3://"):])
+        return path
+
+
+class MemoryStorage(Storage):
+    """Keeps s3://bucket/key as memory://bucket/key for the process lifetime."""
+
+    def url(self, path):
+        if path.startswith("s3://"):
+            return "memory://" + path[len("s3://"):]
+        return path
+
+
+class PipelinedWriter(io.RawIOBase):
+    """Write-only file that passes its data to ``target`` on a background thread.
+
+    The producer, e.g. a Parquet writer serializing row groups, keeps going
+    while earlier chunks are written. Only serialization and writing overlap:
+    the single thread writes to ``target`` in order, so an s3fs target still
+    uploads its multipart parts one at a time. At most ``max_pending`` chunks
+    are queued; ``target`` is left open.
+    """
+
+    def __init__(self, target, max_pending=8):
+        super().__init__()
+        self.target = target
+        self._queue = queue.Queue(max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(bytes(data))
+        return len(data)
+
+    def _drain(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                return
+            if self._error is None:
+                try:
+                    self.target.write(data)
+                except Exception as exception:
+                    self._error = exception
+
+    def close(self):
+        if self.closed:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        super().close()
+        if self._error is not None:
+            raise self._error
+
+
+def create_storage(backend=None):
+    backend = backend or STORAGE_BACKEND
+    if backend == "s3":
+        return S3Storage(
+            block_size=STORAGE_BLOCK_SIZE,
+            cache_type=STORAGE_CACHE_TYPE,
+            max_pool_connections=STORAGE_MAX_POOL_CONNECTIONS,
+        )
+    if backend == "local":
+        return LocalStorage(STORAGE_LOCAL_ROOT)
+    if backend == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {backend}")
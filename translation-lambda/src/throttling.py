@@ -0,0 +1,141 @@
+import asyncio
+import random
+import threading
+import time
+
+import metrics
+
+
+def is_throttling_error(exception):
+    error = getattr(exception, "response", None) or {}
+    code = error.get("Error", {}).get("Code")
+    return code == "ThrottlingException" or "ThrottlingException" in str(exception)
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by all translation workers.
+
+    A rate of 0 disables limiting. Each throttle halves the rate (not below
+    ``min_rate``) and every success wins back ``recovery_step`` requests per
+    second until the configured rate is reached again.
+    """
+
+    def __init__(self, rate, burst=None, min_rate=1.0, recovery_step=0.5,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate) if rate else 0.0
+        self.recovery_step = recovery_step
+        self.burst = float(burst or max(1.0, self.rate))
+        self.tokens = self.burst
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        wait = self.reserve()
+        while wait:
+            self._sleep(wait)
+            wait = self.reserve()
+
+    def reserve(self):
+        """Take a token and return 0, or return the seconds until one is due."""
+        if not self.max_rate:
+            return 0
+
+        with self._lock:
+            now = self._clock()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def on_throttle(self):
+        if not self.max_rate:
+            return
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def on_success(self):
+        if not self.max_rate or self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.recovery_step)
+
+
+def backoff_delay(attempt, base=0.1, cap=5.0):
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retry_attempts(response):
+    if not isinstance(response, dict):
+        return 0
+    return (response.get("ResponseMetadata") or {}).get("RetryAttempts") or 0
+
+
+def call_with_throttling(function, bucket, max_retries, sleep=time.sleep, **kwargs):
+    """Call ``function`` under ``bucket``, retrying ThrottlingException.
+
+    These retries come on top of the botocore retries configured through
+    TRANSLATION_BOTO_CLIENT_MAX_ATTEMPTS, so a throttle only raises here once
+    the client has given up on it. Throttles botocore retried away still show
+    up as ``ResponseMetadata.RetryAttempts`` and slow the bucket down too.
+    """
+    attempt = 0
+    while True:
+        bucket.acquire()
+        try:
+            response = function(**kwargs)
+        except Exception as exception:
+            delay = throttle_delay(exception, bucket, attempt, max_retries)
+            if delay is None:
+                raise
+            sleep(delay)
+            attempt += 1
+            continue
+        record_response(response, bucket)
+        return response
+
+
+async def call_with_throttling_async(function, bucket, max_retries, sleep=asyncio.sleep,
+                                     **kwargs):
+    """call_with_throttling for a coroutine ``function``, waiting without blocking."""
+    attempt = 0
+    while True:
+        wait = bucket.reserve()
+        while wait:
+            await sleep(wait)
+            wait = bucket.reserve()
+        try:
+            response = await function(**kwargs)
+        except Exception as exception:
+            delay = throttle_delay(exception, bucket, attempt, max_retries)
+            if delay is None:
+                raise
+            await sleep(delay)
+            attempt += 1
+            continue
+        record_response(response, bucket)
+        return response
+
+
+def throttle_delay(exception, bucket, attempt, max_retries):
+    """Seconds to wait before retrying a failed call, None to give up."""
+    if not is_throttling_error(exception) or attempt >= max_retries:
+        return None
+    bucket.on_throttle()
+    metrics.current().increment("throttles")
+    return backoff_delay(attempt)
+
+
+def record_response(response, bucket):
+    if retry_attempts(response):
+        bucket.on_throttle()
+    else:
+        bucket.on_success()
@@ -0,0 +1,172 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from storage import Storage
+
+
+def cache_key(text, source_language, target_language):
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{digest}:{source_language}:{target_language}"
+
+
+class LRUCache:
+    """In-process cache that evicts least recently used entries by size.
+
+    Entry sizes are approximated by the length of the key and the cached
+    strings, which is close enough to keep a warm Lambda within its memory.
+    """
+
+    ENTRY_OVERHEAD = 100
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry_size(self, key, value):
+        language, translation = value
+        return len(key) + len(language or "") + len(translation or "") + self.ENTRY_OVERHEAD
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        size = self._entry_size(key, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= self._entry_size(key, previous)
+            self._entries[key] = value
+            self.size += size
+            while self.size > self.max_bytes:
+                old_key, old_value = self._entries.popitem(last=False)
+                self.size -= self._entry_size(old_key, old_value)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SqliteStore:
+    """On-disk cache store, optionally mirrored to a URI opened through ``storage``.
+
+    The database is downloaded from ``uri`` when it is not on disk yet.
+    flush() only commits to the local file; publish() uploads it again, once
+    per invocation, so concurrent functions may overwrite each other's
+    additions; that only costs cache hits, never correctness.
+    """
+
+    def __init__(self, path, uri=None, storage=None):
+        self.path = path
+        self.uri = uri
+        self.storage = storage or Storage()
+        if uri and not os.path.exists(path):
+            self._download()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS translations "
+            "(key TEXT PRIMARY KEY, language TEXT, translation TEXT)"
+        )
+        self._pending = []
+        self._unpublished = False
+        self._lock = threading.Lock()
+
+    def _download(self):
+        try:
+            with self.storage.open(self.uri, "rb") as source, open(self.path, "wb") as target:
+                shutil.copyfileobj(source, target)
+        except FileNotFoundError:
+            pass
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT language, translation FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def put(self, key, value):
+        with self._lock:
+            self._pending.append((key,) + tuple(value))
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?)", self._pending
+            )
+            self._connection.commit()
+            self._pending = []
+            self._unpublished = True
+
+    def publish(self):
+        """Upload the database to ``uri`` if entries were flushed since the last upload."""
+        self.flush()
+        with self._lock:
+            if not self.uri or not self._unpublished:
+                return
+            with open(self.path, "rb") as source, self.storage.open(self.uri, "wb") as target:
+                shutil.copyfileobj(source, target)
+            self._unpublished = False
+
+
+class TranslationCache:
+    """Translation cache with an LRU in front of an optional persistent store.
+
+    Values are ``(detected_language, translated_text)`` tuples keyed by the
+    text hash and the language pair.
+    """
+
+    def __init__(self, memory, store=None):
+        self.memory = memory
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.duplicates = 0
+        self._lock = threading.Lock()
+
+    def get(self, text, source_language, target_language):
+        key = cache_key(text, source_language, target_language)
+        value = self.memory.get(key)
+        if value is None and self.store is not None:
+            value = self.store.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, text, source_language, target_language, value):
+        key = cache_key(text, source_language, target_language)
+        self.memory.put(key, value)
+        if self.store is not None:
+            self.store.put(key, value)
+
+    def add_duplicates(self, count):
+        with self._lock:
+            self.duplicates += count
+
+    def flush(self):
+        if self.store is not None:
+            self.store.flush()
+
+    def publish(self):
+        if self.store is not None:
+            self.store.publish()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "duplicates": self.duplicates}
@@ -1,10 +1,22 @@
 import json
 import os
-import boto3
-from botocore.config import Config
-import pandas as pd
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime
 
+import metrics
+from checkpoint import Checkpoint, CheckpointTimeout
+from error_collection import ErrorAccumulator
+from idempotency import ProcessedIndex, fingerprint
+from language_detection import create_detector
+from lazy import LazyModule, LazyObject
+from segmentation import split_text, utf8_size
+from storage import PipelinedWriter, create_storage
+from throttling import TokenBucket, call_with_throttling
+from translation_cache import LRUCache, SqliteStore, TranslationCache
+
 
 import logging
 
@@ -25,6 +37,19 @@ SOURCE_LANGUAGE_CODE = os.environ.get("SOURCE_LANGUAGE_CODE") or "auto"
 
 TARGET_LANGUAGE_CODE = os.environ.get("TARGET_LANGUAGE_CODE") or "en"
 
+# Comma-separated target languages, e.g. "en,de,fr", all translated from a
+# single read into one <file>_<language> output each. An event record can
+# set its own list under "target_languages". Unset keeps the single
+# TARGET_LANGUAGE_CODE output. Multi-language records are translated in
+# memory: TRANSLATION_CHECKPOINT_ROWS, TRANSLATION_STREAM_BATCH_SIZE,
+# TRANSLATION_ARROW and TRANSLATION_DELTA do not apply to them, and a warning
+# is logged when any of those is set as well.
+TARGET_LANGUAGE_CODES = [
+    code.strip()
+    for code in (os.environ.get("TARGET_LANGUAGE_CODES") or "").split(",")
+    if code.strip()
+]
+
 TRANSLATION_BOTO_CLIENT_MAX_ATTEMPTS = int(
     os.environ.get("TRANSLATION_BOTO_CLIENT_MAX_ATTEMPTS") or "10"
 )
@@ -37,20 +62,235 @@ TRANSLATION_BOTO_CLIENT_CONNECT_TIMEOUT = int(
     os.environ.get("TRANSLATION_BOTO_CLIENT_CONNECT_TIMEOUT") or "3"
 )
 
+# Adds per-stage timings and counters to every result and log line.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "").lower() == "true"
+
+# Parquet codec (gzip, snappy, zstd, lz4, brotli or none), also used as the
+# output file suffix, e.g. reviews.parquet.zstd.
+PARQUET_COMPRESSION = os.environ.get("PARQUET_COMPRESSION") or "gzip"
+
+PARQUET_COMPRESSION_LEVEL = os.environ.get("PARQUET_COMPRESSION_LEVEL")
+
+# "true"/"false" to force dictionary encoding on or off, unset keeps pyarrow's default.
+PARQUET_USE_DICTIONARY = os.environ.get("PARQUET_USE_DICTIONARY")
+
+PARQUET_ROW_GROUP_SIZE = int(os.environ.get("PARQUET_ROW_GROUP_SIZE") or "0")
+
+PARQUET_DATA_PAGE_SIZE = int(os.environ.get("PARQUET_DATA_PAGE_SIZE") or "0")
+
+# Writes the translated and error files at the same time, each serialized row
+# group by row group while a background thread writes the finished ones; the
+# S3 multipart parts of one file are still uploaded one after another.
+TRANSLATION_PARALLEL_WRITE = (
+    os.environ.get("TRANSLATION_PARALLEL_WRITE", "").lower() == "true"
+)
+
+# Rows per row group of parallel writes without PARQUET_ROW_GROUP_SIZE; a row
+# group is the unit handed to the upload.
+PIPELINED_ROW_GROUP_SIZE = 65536
+
+# TranslateText accepts at most 10 000 bytes of UTF-8 text per request.
+TRANSLATE_TEXT_MAX_BYTES = 10000
+
+# Packs several short reviews into one TranslateText request when set to a
+# positive byte budget, 0 keeps one request per row. Only rows of a known
+# source language are packed, from SOURCE_LANGUAGE_CODE or language routing:
+# a batch sent as "auto" would be translated and reported as one language,
+# so such rows are still sent one per request.
+TRANSLATION_BATCH_MAX_BYTES = min(
+    int(os.environ.get("TRANSLATION_BATCH_MAX_BYTES") or "0"),
+    TRANSLATE_TEXT_MAX_BYTES,
+)
+
+# Reviews longer than this many UTF-8 bytes are split on paragraph, sentence
+# or word boundaries and the segments translated concurrently; a value below
+# the service limit also splits long but valid reviews to cut their latency.
+TRANSLATION_SEGMENT_MAX_BYTES = min(
+    int(os.environ.get("TRANSLATION_SEGMENT_MAX_BYTES") or TRANSLATE_TEXT_MAX_BYTES),
+    TRANSLATE_TEXT_MAX_BYTES,
+)
+
+# Threads translating the segments of one review.
+TRANSLATION_SEGMENT_WORKERS = int(os.environ.get("TRANSLATION_SEGMENT_WORKERS") or "4")
+
+BATCH_DELIMITER_TOKEN = "|||"
+
+BATCH_DELIMITER = f"\n{BATCH_DELIMITER_TOKEN}\n"
+
+# Number of threads sending TranslateText requests, 1 keeps rows serial.
+TRANSLATION_MAX_WORKERS = int(os.environ.get("TRANSLATION_MAX_WORKERS") or "1")
+
+# Requests per second shared by all workers, halved on every throttle and
+# recovered on successes. 0 leaves rate limiting to botocore's adaptive mode.
+TRANSLATION_RATE_LIMIT = float(os.environ.get("TRANSLATION_RATE_LIMIT") or "0")
+
+# Extra attempts for ThrottlingException once botocore retries are exhausted.
+TRANSLATION_THROTTLE_RETRIES = int(
+    os.environ.get("TRANSLATION_THROTTLE_RETRIES") or "3"
+)
+
+# Works on whole ID/review columns instead of per-row Python objects and
+# returns DataFrames from translate_dataframe.
+TRANSLATION_COLUMNAR = os.environ.get("TRANSLATION_COLUMNAR", "").lower() == "true"
+
+# pyarrow filters pushed down into the source read, as JSON: a list of
+# [column, op, value] predicates that must all hold, or a list of such lists
+# of which one must hold, e.g. [["ID", ">=", 0], ["ID", "<", 100000]].
+TRANSLATION_SOURCE_FILTERS = json.loads(
+    os.environ.get("TRANSLATION_SOURCE_FILTERS") or "null"
+)
+
+# Leaves rows with a missing or empty review out of the read instead of
+# reporting them in the error file.
+TRANSLATION_SKIP_EMPTY_REVIEWS = (
+    os.environ.get("TRANSLATION_SKIP_EMPTY_REVIEWS", "").lower() == "true"
+)
+
+# Target rows per shard planned by plan_handler. Shards are whole row groups,
+# so a single large row group can exceed it.
+TRANSLATION_SHARD_ROWS = int(os.environ.get("TRANSLATION_SHARD_ROWS") or "200000")
+
+# The only source columns translation needs, the others are never read.
+SOURCE_COLUMNS = ["ID", "review"]
+
+# Reads only the ID and review columns as Arrow arrays, deduplicates them
+# with a dictionary encoding and writes Arrow string arrays back, without
+# going through pandas. Takes precedence over the delta mode.
+TRANSLATION_ARROW = os.environ.get("TRANSLATION_ARROW", "").lower() == "true"
+
+# Rows per record batch when streaming the source file, 0 reads it whole.
+TRANSLATION_STREAM_BATCH_SIZE = int(
+    os.environ.get("TRANSLATION_STREAM_BATCH_SIZE") or "0"
+)
+
+# Rows translated between checkpoints, 0 translates every file in one go.
+# Each finished chunk is stored as a part file and recorded in a manifest, so
+# an invocation stopped before the timeout resumes where it left off.
+TRANSLATION_CHECKPOINT_ROWS = int(os.environ.get("TRANSLATION_CHECKPOINT_ROWS") or "0")
+
+# Directory holding one checkpoint per file name, by default _checkpoints/
+# under the destination prefix.
+TRANSLATION_CHECKPOINT_URI = os.environ.get("TRANSLATION_CHECKPOINT_URI")
+
+# No new chunk is started once fewer milliseconds than this remain; it has to
+# cover translating and storing one chunk.
+TRANSLATION_CHECKPOINT_MARGIN_MS = int(
+    os.environ.get("TRANSLATION_CHECKPOINT_MARGIN_MS") or "30000"
+)
+
+# Skips sources whose ETag and output settings match the last successful run
+# and returns that run's result marked as skipped.
+TRANSLATION_SKIP_UNCHANGED = (
+    os.environ.get("TRANSLATION_SKIP_UNCHANGED", "").lower() == "true"
+)
+
+# Directory of the processed index, by default _processed/ under the
+# destination prefix; a local path such as /tmp/processed also works.
+TRANSLATION_PROCESSED_INDEX_URI = os.environ.get("TRANSLATION_PROCESSED_INDEX_URI")
+
+# Reuses translations from the existing destination file for rows whose ID
+# and review are unchanged and only translates the rest. Outputs written in
+# this mode carry a review_hash column used for the comparison next time.
+TRANSLATION_DELTA = os.environ.get("TRANSLATION_DELTA", "").lower() == "true"
+
+# Detects the language of every row locally when SOURCE_LANGUAGE_CODE is
+# "auto": rows already in TARGET_LANGUAGE_CODE are passed through untouched
+# and the others are sent in per-language batches with an explicit source.
+TRANSLATION_LANGUAGE_ROUTING = (
+    os.environ.get("TRANSLATION_LANGUAGE_ROUTING", "").lower() == "true"
+)
+
+# "stopwords" or a "module:attribute" factory of objects with detect(text).
+TRANSLATION_LANGUAGE_DETECTOR = (
+    os.environ.get("TRANSLATION_LANGUAGE_DETECTOR") or "stopwords"
+)
+
+# Translates the records of an event as one work set with shared batching
+# and deduplication, then splits the results into the usual per-file outputs.
+# Meant for many tiny files; records in checkpoint, streaming, delta, Arrow,
+# skip-unchanged or multi-target mode are still translated one by one.
+TRANSLATION_AGGREGATE_RECORDS = (
+    os.environ.get("TRANSLATION_AGGREGATE_RECORDS", "").lower() == "true"
+)
 
-translation_boto_client_config = Config(
-    retries={"max_attempts": TRANSLATION_BOTO_CLIENT_MAX_ATTEMPTS,
-             "mode": "standard"},
-    region_name=REGION,
-    read_timeout=TRANSLATION_BOTO_CLIENT_READ_TIMEOUT,
-    connect_timeout=TRANSLATION_BOTO_CLIENT_CONNECT_TIMEOUT,
+# Failed rows buffered in memory before the error accumulator spills them to
+# a temporary file.
+TRANSLATION_ERROR_SPILL_ROWS = int(
+    os.environ.get("TRANSLATION_ERROR_SPILL_ROWS") or "100000"
 )
 
+# Failed rows included in full in the response next to the error counts and
+# categories, 0 leaves them to the error file.
+TRANSLATION_ERROR_SAMPLES = int(os.environ.get("TRANSLATION_ERROR_SAMPLES") or "0")
 
-boto_translation_client = boto3.client(
-    "translate", config=translation_boto_client_config
+# Memory budget of the in-process translation cache, 0 disables caching.
+TRANSLATION_CACHE_MAX_BYTES = int(
+    os.environ.get("TRANSLATION_CACHE_MAX_BYTES") or "0"
 )
 
+# SQLite file backing the cache across warm invocations, e.g. under /tmp.
+TRANSLATION_CACHE_PATH = os.environ.get("TRANSLATION_CACHE_PATH")
+
+# Optional S3 URI the SQLite file is seeded from and published to at the
+# end of every invocation.
+TRANSLATION_CACHE_URI = os.environ.get("TRANSLATION_CACHE_URI")
+
+
+# pandas, numpy and boto3 dominate the cold start; they are imported, and
+# the client is created, on first use and then kept for warm invocations.
+pd = LazyModule("pandas")
+
+np = LazyModule("numpy")
+
+
+def create_translation_client():
+    import boto3
+    from botocore.config import Config
+
+    # Without TRANSLATION_RATE_LIMIT the token bucket is off, so botocore's
+    # adaptive mode does the client side rate limiting instead.
+    translation_boto_client_config = Config(
+        retries={"max_attempts": TRANSLATION_BOTO_CLIENT_MAX_ATTEMPTS,
+                 "mode": "standard" if TRANSLATION_RATE_LIMIT else "adaptive"},
+        region_name=REGION,
+        read_timeout=TRANSLATION_BOTO_CLIENT_READ_TIMEOUT,
+        connect_timeout=TRANSLATION_BOTO_CLIENT_CONNECT_TIMEOUT,
+        max_pool_connections=max(10, TRANSLATION_MAX_WORKERS),
+    )
+
+    return boto3.client("translate", config=translation_boto_client_config)
+
+
+boto_translation_client = LazyObject(create_translation_client)
+
+translation_rate_limiter = TokenBucket(TRANSLATION_RATE_LIMIT)
+
+# Maps the s3:// URLs below to S3, a local directory or memory, see storage.py.
+storage = create_storage()
+
+
+def build_translation_cache():
+    if not TRANSLATION_CACHE_MAX_BYTES:
+        return None
+
+    store = None
+    if TRANSLATION_CACHE_PATH:
+        store = SqliteStore(
+            TRANSLATION_CACHE_PATH, uri=TRANSLATION_CACHE_URI, storage=storage
+        )
+
+    return TranslationCache(LRUCache(TRANSLATION_CACHE_MAX_BYTES), store)
+
+
+translation_cache = build_translation_cache()
+
+
+def create_language_detector():
+    return create_detector(TRANSLATION_LANGUAGE_DETECTOR)
+
+
+language_detector = LazyObject(create_language_detector)
+
 
 def extract_path(record):
     bucket_name = record["bucket"]
@@ -60,8 +300,165 @@ def extract_path(record):
     return bucket_name, key_name, file_name
 
 
-def translate(record):
+def extract_target_languages(record):
+    """Target languages of the record, or None for the single default target."""
+    languages = (
+        isinstance(record, dict) and record.get("target_languages")
+    ) or TARGET_LANGUAGE_CODES
+    if isinstance(languages, str):
+        languages = [code.strip() for code in languages.split(",") if code.strip()]
+
+    return list(dict.fromkeys(languages)) or None
+
+
+def translate(record, context=None):
+
+    if not METRICS_ENABLED:
+        return translate_record(record, context)
+
+    record_metrics = metrics.Metrics()
+    with metrics.activate(record_metrics):
+        result = translate_record(record, context)
+    metrics.emit(
+        logger,
+        record_metrics,
+        event="translation_metrics",
+        key=record.get("key") if isinstance(record, dict) else None,
+    )
+    result["metrics"] = record_metrics.as_dict()
+
+    return result
+
+
+def translate_aggregated(records, context=None):
+    """Translate the records of an event, aggregating those that allow it.
+
+    Returns one result per record, in order, shaped like translate() ones;
+    the "metrics" and "cache" entries of aggregated records cover the whole
+    aggregated group rather than the record alone.
+    """
+    results = [None] * len(records)
+    aggregated = []
+    for position, record in enumerate(records):
+        if is_aggregatable(record):
+            aggregated.append(position)
+        else:
+            results[position] = translate(record=record, context=context)
+    if not aggregated:
+        return results
+
+    if not METRICS_ENABLED:
+        outputs = translate_records([records[position] for position in aggregated])
+    else:
+        record_metrics = metrics.Metrics()
+        with metrics.activate(record_metrics):
+            outputs = translate_records([records[position] for position in aggregated])
+        metrics.emit(
+            logger,
+            record_metrics,
+            event="translation_metrics",
+            key=None,
+            records=len(aggregated),
+        )
+        for output in outputs:
+            output["metrics"] = record_metrics.as_dict()
+    for position, output in zip(aggregated, outputs):
+        results[position] = output
+
+    return results
+
+
+def is_aggregatable(record):
+    return not (
+        (isinstance(record, dict) and "shard" in record)
+        or TRANSLATION_CHECKPOINT_ROWS
+        or TRANSLATION_STREAM_BATCH_SIZE
+        or TRANSLATION_DELTA
+        or TRANSLATION_ARROW
+        or TRANSLATION_SKIP_UNCHANGED
+        or extract_target_languages(record)
+    )
+
+
+def translate_records(records):
+    """Translate the rows of all records with a single translate_dataframe call.
+
+    The sources are concatenated with their IDs replaced by row positions,
+    which map every outcome back to its record and original ID before the
+    per-file outputs are written.
+    """
+    record_metrics = metrics.current()
+    results = [None] * len(records)
+    frames = []
+    sources = []
+    for position, record in enumerate(records):
+        try:
+            source_bucket, source_key, file_name = extract_path(record=record)
+        except Exception as exception:
+            results[position] = {
+                "path_extraction_error": str(exception),
+                "record": json.dumps(record, indent=4),
+            }
+            continue
+        try:
+            with record_metrics.stage("read"):
+                df = read_source(source_bucket, source_key)
+        except Exception as exception:
+            results[position] = {
+                "data_reading_error": str(exception),
+                "bucket": source_bucket,
+                "key": source_key,
+            }
+            continue
+        frames.append(df[["ID", "review"]])
+        sources.append((position, file_name))
+    if not frames:
+        return results
+
+    combined = pd.concat(frames, ignore_index=True)
+    owners = np.repeat(np.arange(len(frames)), [len(frame) for frame in frames])
+    ids = combined["ID"].to_numpy()
+    combined["ID"] = np.arange(len(combined))
+    record_metrics.increment("rows", len(combined))
+    logger.info(f"Translating {len(combined)} rows of {len(frames)} records together...")
+    cache_stats = translation_cache.stats() if translation_cache else None
+    with record_metrics.stage("translate"):
+        translated, errors = translate_dataframe(combined)
+    cache_counts = None
+    if cache_stats is not None:
+        cache_counts = {
+            name: count - cache_stats[name]
+            for name, count in translation_cache.stats().items()
+        }
+
+    translated = pd.DataFrame(
+        translated, columns=["ID", "original_review_language", "review_translation"]
+    )
+    errors = pd.DataFrame(
+        error_frame(errors), columns=["ID", "original_text", "error_message"]
+    )
+    parts = []
+    for frame in (translated, errors):
+        positions = frame["ID"].to_numpy(dtype=int)
+        frame_owners = owners[positions]
+        frame = frame.assign(ID=ids[positions])
+        parts.append((frame, frame_owners))
+
+    for index, (position, file_name) in enumerate(sources):
+        translated_part, error_part = (
+            frame[frame_owners == index].reset_index(drop=True)
+            for frame, frame_owners in parts
+        )
+        results[position] = write_results(file_name, translated_part, error_part)
+        if cache_counts is not None:
+            results[position]["cache"] = dict(cache_counts)
+
+    return results
+
 
+def translate_record(record, context=None):
+
+    record_metrics = metrics.current()
     logger.info("Extracting file path...")
     try:
         source_bucket, source_key, file_name = extract_path(record=record)
@@ -73,96 +470,1765 @@ def translate(record):
     logger.info(
         f"Working with file {file_name} at path: s3://{source_bucket}/{source_key}"
     )
+    target_languages = extract_target_languages(record)
+
+    if isinstance(record, dict) and "shard" in record:
+        return translate_shard(source_bucket, source_key, file_name, record["shard"])
+
+    if not TRANSLATION_SKIP_UNCHANGED:
+        return translate_source(
+            source_bucket, source_key, file_name, context, target_languages
+        )
+
+    index = processed_index()
+    try:
+        source_fingerprint = translation_fingerprint(
+            source_bucket, source_key, file_name, target_languages
+        )
+        previous_result = index.lookup(file_name, source_fingerprint)
+    except Exception as exception:
+        logger.warning(f"Could not check whether {file_name} is unchanged: {exception}")
+        source_fingerprint, previous_result = None, None
+    if previous_result is not None:
+        logger.info(f"{file_name} is unchanged since it was last translated, skipping")
+        record_metrics.increment("skipped_records")
+        return dict(previous_result, skipped=True)
+
+    result = translate_source(
+        source_bucket, source_key, file_name, context, target_languages
+    )
+    if (
+        source_fingerprint is not None
+        and result.get("writing_status") == "OK"
+        and "writing_error_messages" not in result
+    ):
+        try:
+            index.record(file_name, source_fingerprint, result)
+        except Exception as exception:
+            logger.warning(f"Could not record {file_name} as processed: {exception}")
+
+    return result
+
+
+def processed_index():
+    return ProcessedIndex(
+        TRANSLATION_PROCESSED_INDEX_URI
+        or f"s3://{DESTINATION_BUCKET_NAME}/{DESTINATION_LOCATION_PREFIX}/_processed",
+        storage,
+    )
+
+
+def translation_fingerprint(source_bucket, source_key, file_name, target_languages=None):
+    return fingerprint(
+        f"s3://{source_bucket}/{source_key}",
+        {
+            "source_language": SOURCE_LANGUAGE_CODE,
+            "target_language": target_languages or TARGET_LANGUAGE_CODE,
+            "language_detector": (
+                TRANSLATION_LANGUAGE_DETECTOR if TRANSLATION_LANGUAGE_ROUTING else None
+            ),
+            "filters": source_filters(),
+            "delta": TRANSLATION_DELTA,
+            "destination": destination_path(file_name),
+            "errors": error_path(file_name),
+            "parquet": parquet_write_options(),
+        },
+        storage,
+    )
+
+
+def translate_source(
+    source_bucket, source_key, file_name, context=None, target_languages=None
+):
+
+    record_metrics = metrics.current()
+    if target_languages:
+        ignored = [
+            name
+            for name, value in [
+                ("TRANSLATION_CHECKPOINT_ROWS", TRANSLATION_CHECKPOINT_ROWS),
+                ("TRANSLATION_STREAM_BATCH_SIZE", TRANSLATION_STREAM_BATCH_SIZE),
+                ("TRANSLATION_ARROW", TRANSLATION_ARROW),
+                ("TRANSLATION_DELTA", TRANSLATION_DELTA),
+            ]
+            if value
+        ]
+        if ignored:
+            logger.warning(
+                f"{', '.join(ignored)} not applied to {file_name}: "
+                "target languages are translated in memory"
+            )
+        logger.info(f"Translating into {', '.join(target_languages)}...")
+        return translate_targets(source_bucket, source_key, file_name, target_languages)
+
+    if TRANSLATION_CHECKPOINT_ROWS:
+        logger.info("Translating with checkpoints...")
+        return translate_checkpointed(source_bucket, source_key, file_name, context)
+
+    if TRANSLATION_STREAM_BATCH_SIZE:
+        logger.info("Translating record batches...")
+        return translate_streaming(source_bucket, source_key, file_name)
+
+    if TRANSLATION_ARROW:
+        logger.info("Translating Arrow columns...")
+        return translate_arrow(source_bucket, source_key, file_name)
 
     logger.info(f"Populating dateframe with records...")
     try:
-        df = pd.read_parquet(f"s3://{source_bucket}/{source_key}")
+        with record_metrics.stage("read"):
+            df = read_source(source_bucket, source_key)
     except Exception as exception:
         return {
             "data_reading_error": str(exception),
             "bucket": source_bucket,
             "key": source_key,
         }
-    logger.info(f"Dataframe populated: \n {df[:5]}")
+    logger.info("Dataframe populated: \n %s", df[:5])
+    record_metrics.increment("rows", len(df))
 
     logger.info("Translating dataframe...")
-    translated, errors = translate_dataframe(df)
+    cache_stats = translation_cache.stats() if translation_cache else None
+    delta_counts = None
+    with record_metrics.stage("translate"):
+        if TRANSLATION_DELTA:
+            translated, errors, delta_counts = translate_delta(df, file_name)
+        else:
+            translated, errors = translate_dataframe(df)
 
-    destination_string = f"s3://{DESTINATION_BUCKET_NAME}/{DESTINATION_LOCATION_PREFIX}/{file_name}.parquet.gzip"
-    result = {"bucket": DESTINATION_BUCKET_NAME,
-              "key": DESTINATION_LOCATION_PREFIX}
+    result = write_results(file_name, translated, errors)
+    if delta_counts is not None:
+        result["delta"] = delta_counts
+    if cache_stats is not None:
+        result["cache"] = {
+            name: count - cache_stats[name]
+            for name, count in translation_cache.stats().items()
+        }
+
+    return result
 
-    try:
-        pd.DataFrame(translated).to_parquet(
-            path=destination_string, compression="gzip")
-        result["translation_status"] = "OK"
-    except Exception as exception:
-        result["writing_status"] = "Errors occured"
-        result["writing_error_messages"] = str(exception)
 
+def translate_targets(source_bucket, source_key, file_name, target_languages):
+    """Translate the source once into every target language.
+
+    The source is read and deduplicated once and the requests for all
+    languages share one worker pool; each language is written to its own
+    <file_name>_<language> destination and error files and reported under
+    "languages" in the result.
+    """
+    record_metrics = metrics.current()
     try:
-        if len(errors):
-            error_destination_string = f"s3://{ERROR_BUCKET_NAME}/{ERROR_LOCATION_PREFIX}/{file_name}.parquet.gzip"
-            pd.DataFrame(errors).to_parquet(
-                path=error_destination_string, compression="gzip"
-            )
-            result["translation_status"] = "Errors occured"
-            result["translation_error_messages"] = {
-                "error_file": error_destination_string,
-                "error_messages": errors,
-            }
-        result["writing_status"] = "OK"
+        with record_metrics.stage("read"):
+            df = read_source(source_bucket, source_key)
     except Exception as exception:
-        result["writing_status"] = "Errors occured"
-        result["writing_error_messages"] = str(exception)
+        return {
+            "data_reading_error": str(exception),
+            "bucket": source_bucket,
+            "key": source_key,
+        }
+    record_metrics.increment("rows", len(df))
+
+    with record_metrics.stage("translate"):
+        outputs = translate_dataframe_multi(df, target_languages)
+
+    return write_targets(file_name, outputs)
+
+
+def write_targets(file_name, outputs):
+    """Write {language: (translated, errors)} and combine the results."""
+    languages = {
+        language: write_results(f"{file_name}_{language}", translated, errors)
+        for language, (translated, errors) in outputs.items()
+    }
+    result = {"bucket": DESTINATION_BUCKET_NAME,
+              "key": DESTINATION_LOCATION_PREFIX}
+    for status in ("translation_status", "writing_status"):
+        result[status] = (
+            "OK"
+            if all(output.get(status) == "OK" for output in languages.values())
+            else "Errors occured"
+        )
+    result["languages"] = languages
 
     return result
 
 
-def translate_dataframe(df):
+def read_source(source_bucket, source_key, filters=None):
+    """The ID and review columns of the source, with source_filters() pushed down."""
+    filters = source_filters(filters)
+    return read_parquet(
+        f"s3://{source_bucket}/{source_key}",
+        columns=SOURCE_COLUMNS,
+        **({"filters": filters} if filters else {}),
+    )
 
-    translated = []
-    translation_errors = []
 
-    logger.info("Translating separate rows...")
-    for idx, row in df.iterrows():
+def source_filters(filters=None):
+    """TRANSLATION_SOURCE_FILTERS and filters combined as a disjunction of conjunctions.
+
+    Returns None when every row is read.
+    """
+    conjunctions = [[]]
+    for extra in (TRANSLATION_SOURCE_FILTERS, filters):
+        if extra:
+            conjunctions = [
+                conjunction + other
+                for conjunction in conjunctions
+                for other in disjunctive_filters(extra)
+            ]
+    if TRANSLATION_SKIP_EMPTY_REVIEWS:
+        conjunctions = [
+            conjunction + [("review", "!=", "")] for conjunction in conjunctions
+        ]
+
+    return conjunctions if any(conjunctions) else None
+
+
+def disjunctive_filters(filters):
+    if isinstance(filters[0][0], (list, tuple)):
+        return [[tuple(predicate) for predicate in conjunction] for conjunction in filters]
+
+    return [[tuple(predicate) for predicate in filters]]
+
+
+FILTER_OPERATORS = {
+    "=": lambda column, value: column == value,
+    "==": lambda column, value: column == value,
+    "!=": lambda column, value: column != value,
+    "<": lambda column, value: column < value,
+    "<=": lambda column, value: column <= value,
+    ">": lambda column, value: column > value,
+    ">=": lambda column, value: column >= value,
+    "in": lambda column, value: column.isin(value),
+    "not in": lambda column, value: ~column.isin(value),
+}
+
+
+def filter_frame(df, filters):
+    """Rows of df matching pyarrow-style filters; nulls never match."""
+    if not filters:
+        return df
+    matches = np.zeros(len(df), dtype=bool)
+    for conjunction in filters:
+        match = np.ones(len(df), dtype=bool)
+        for column, op, value in conjunction:
+            match &= (
+                df[column].notna() & FILTER_OPERATORS[op](df[column], value)
+            ).to_numpy(dtype=bool)
+        matches |= match
+
+    return df[matches]
+
+
+def matching_row_groups(metadata, filters):
+    """Indices of the row groups whose statistics do not rule out every conjunction."""
+    if not filters:
+        return None
+    columns = [metadata.schema.column(index).name for index in range(metadata.num_columns)]
+
+    def may_match(row_group, column, op, value):
+        if column not in columns:
+            return True
+        statistics = row_group.column(columns.index(column)).statistics
+        if statistics is None or not statistics.has_min_max:
+            return True
+        low, high = statistics.min, statistics.max
         try:
-            translated.append(translate_row(row))
+            if op in ("=", "=="):
+                return low <= value <= high
+            if op == "<":
+                return low < value
+            if op == "<=":
+                return low <= value
+            if op == ">":
+                return high > value
+            if op == ">=":
+                return high >= value
+            if op == "in":
+                return any(low <= item <= high for item in value)
+        except TypeError:
+            return True
+        return True
 
-        except Exception as translate_exception:
+    return [
+        index
+        for index in range(metadata.num_row_groups)
+        if any(
+            all(
+                may_match(metadata.row_group(index), column, op, value)
+                for column, op, value in conjunction
+            )
+            for conjunction in filters
+        )
+    ]
 
-            translation_errors.append(
-                {
-                    "ID": row["ID"],
-                    "original_text": row["review"],
-                    "error_message": str(translate_exception),
-                }
+
+def destination_path(file_name):
+    return f"s3://{DESTINATION_BUCKET_NAME}/{DESTINATION_LOCATION_PREFIX}/{file_name}.parquet.{PARQUET_COMPRESSION}"
+
+
+def error_path(file_name):
+    return f"s3://{ERROR_BUCKET_NAME}/{ERROR_LOCATION_PREFIX}/{file_name}.parquet.{PARQUET_COMPRESSION}"
+
+
+def parquet_writer_options():
+    options = {"compression": PARQUET_COMPRESSION}
+    if PARQUET_COMPRESSION_LEVEL:
+        options["compression_level"] = int(PARQUET_COMPRESSION_LEVEL)
+    if PARQUET_USE_DICTIONARY:
+        options["use_dictionary"] = PARQUET_USE_DICTIONARY.lower() == "true"
+    if PARQUET_DATA_PAGE_SIZE:
+        options["data_page_size"] = PARQUET_DATA_PAGE_SIZE
+
+    return options
+
+
+def parquet_write_options():
+    options = parquet_writer_options()
+    if PARQUET_ROW_GROUP_SIZE:
+        options["row_group_size"] = PARQUET_ROW_GROUP_SIZE
+
+    return options
+
+
+def open_file(path, mode="rb"):
+    return storage.open(path, mode)
+
+
+def read_parquet(path, **kwargs):
+    url = storage.url(path)
+    return pd.read_parquet(url, **kwargs, **storage.pandas_options(url))
+
+
+def write_parquet(rows, path):
+    url = storage.url_for_write(path)
+    pd.DataFrame(rows).to_parquet(
+        path=url, **storage.pandas_options(url), **parquet_write_options()
+    )
+
+
+def write_parquet_pipelined(rows, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(pd.DataFrame(rows), preserve_index=False)
+    with storage.open(path, "wb") as target, PipelinedWriter(target) as pipe:
+        writer = pq.ParquetWriter(pipe, table.schema, **parquet_writer_options())
+        try:
+            writer.write_table(
+                table, row_group_size=PARQUET_ROW_GROUP_SIZE or PIPELINED_ROW_GROUP_SIZE
             )
+        finally:
+            writer.close()
 
-    return translated, translation_errors
 
+def error_accumulator(reviews=None):
+    return ErrorAccumulator(
+        reviews,
+        spill_rows=TRANSLATION_ERROR_SPILL_ROWS,
+        sample_limit=TRANSLATION_ERROR_SAMPLES,
+    )
+
+
+def error_frame(errors):
+    """Error rows in a form write_parquet accepts."""
+    if isinstance(errors, ErrorAccumulator):
+        return errors.to_frame()
+
+    return errors
+
+
+def error_summary(errors, error_file):
+    """Counts, categories and optional samples of errors for the response."""
+    if is_arrow_table(errors):
+        accumulator = error_accumulator()
+        for batch in errors.to_batches():
+            accumulator.extend(batch_records(batch))
+        errors = accumulator
+    elif not isinstance(errors, ErrorAccumulator):
+        accumulator = error_accumulator()
+        accumulator.extend(errors)
+        errors = accumulator
+
+    return errors.summary(error_file)
+
+
+def read_table(path, columns=None, filters=None):
+    import pyarrow.parquet as pq
+
+    with storage.open(path, "rb") as f:
+        return pq.read_table(
+            f, columns=columns, **({"filters": filters} if filters else {})
+        )
+
+
+def write_table(table, path):
+    import pyarrow.parquet as pq
+
+    with storage.open(path, "wb") as f:
+        pq.write_table(
+            table,
+            f,
+            row_group_size=PARQUET_ROW_GROUP_SIZE or None,
+            **parquet_writer_options(),
+        )
+
+
+def batch_records(batch):
+    """Rows of an Arrow record batch as dicts."""
+    columns = batch.to_pydict()
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
 
-def translate_row(row):
 
+def is_arrow_table(rows):
+    pa = sys.modules.get("pyarrow")
+    return pa is not None and isinstance(rows, pa.Table)
+
+
+def write_output(rows, path, stage):
+    """Write rows to path and return the exception raised, if any."""
     try:
-        response = boto_translation_client.translate_text(
-            Text=row["review"],
-            SourceLanguageCode=SOURCE_LANGUAGE_CODE,
-            TargetLanguageCode=TARGET_LANGUAGE_CODE,
+        with metrics.current().stage(stage):
+            if is_arrow_table(rows):
+                write_table(rows, path)
+            elif TRANSLATION_PARALLEL_WRITE:
+                write_parquet_pipelined(rows, path)
+            else:
+                write_parquet(rows, path)
+    except Exception as exception:
+        return exception
+
+    return None
+
+
+def write_results(file_name, translated, errors, destination=None, error_destination=None):
+
+    destination_string = destination or destination_path(file_name)
+    error_destination_string = error_destination or error_path(file_name)
+    result = {"bucket": DESTINATION_BUCKET_NAME,
+              "key": DESTINATION_LOCATION_PREFIX}
+
+    record_metrics = metrics.current()
+    if TRANSLATION_PARALLEL_WRITE and len(errors):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            translated_write = executor.submit(
+                metrics.bind(write_output), translated, destination_string, "write"
+            )
+            error_write = executor.submit(
+                metrics.bind(write_output), error_frame(errors), error_destination_string,
+                "error_write",
+            )
+        translated_exception = translated_write.result()
+        error_exception = error_write.result()
+    else:
+        translated_exception = write_output(translated, destination_string, "write")
+        error_exception = (
+            write_output(error_frame(errors), error_destination_string, "error_write")
+            if len(errors)
+            else None
         )
 
+    if translated_exception is None:
+        result["translation_status"] = "OK"
+    else:
+        result["writing_status"] = "Errors occured"
+        result["writing_error_messages"] = str(translated_exception)
+
+    if error_exception is None:
+        if len(errors):
+            record_metrics.increment("error_rows", len(errors))
+            result["translation_status"] = "Errors occured"
+            result["translation_error_messages"] = error_summary(
+                errors, error_destination_string
+            )
+        result["writing_status"] = "OK"
+    else:
+        result["writing_status"] = "Errors occured"
+        result["writing_error_messages"] = str(error_exception)
+    if isinstance(errors, ErrorAccumulator):
+        errors.close()
+
+    return result
+
+
+def translate_arrow(source_bucket, source_key, file_name):
+    """Translate the ID and review columns of the source as Arrow arrays."""
+    record_metrics = metrics.current()
+    try:
+        with record_metrics.stage("read"):
+            table = read_table(
+                f"s3://{source_bucket}/{source_key}",
+                columns=SOURCE_COLUMNS,
+                filters=source_filters(),
+            )
+    except Exception as exception:
         return {
-            "ID": row["ID"],
-            "original_review_language": response.get("SourceLanguageCode"),
-            "review_translation": response.get("TranslatedText"),
+            "data_reading_error": str(exception),
+            "bucket": source_bucket,
+            "key": source_key,
         }
+    record_metrics.increment("rows", table.num_rows)
 
-    except Exception as ex:
-        raise Exception(f"{ex}")
+    with record_metrics.stage("translate"):
+        translated, errors = translate_table(table)
+
+    return write_results(file_name, translated, errors)
+
+
+def translate_table(table):
+    """Arrow counterpart of translate_dataframe_columnar.
+
+    The review column is dictionary encoded, so duplicates are folded and
+    blank or missing reviews rejected on the distinct values only, and the
+    outcomes are gathered back per row with ``take``. Returns the translated
+    and error tables.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    ids = table.column("ID")
+    reviews = table.column("review").combine_chunks()
+    translatable = pa.types.is_string(reviews.type) or pa.types.is_large_string(
+        reviews.type
+    )
+    if not translatable:
+        reviews = reviews.cast(pa.string())
+
+    encoded = pc.dictionary_encode(reviews)
+    values = encoded.dictionary.to_pylist()
+    texts_valid = [
+        translatable and isinstance(value, str) and bool(value.strip())
+        for value in values
+    ]
+    texts = [value for value, valid in zip(values, texts_valid) if valid]
+    outcomes = iter(
+        translate_distinct([{"ID": index, "review": text} for index, text in enumerate(texts)])
+    )
+    missing = {"error_message": "Review text is missing or empty"}
+    outcomes = [next(outcomes) if valid else missing for valid in texts_valid]
+
+    row_valid = pc.fill_null(
+        pa.array(texts_valid, pa.bool_()).take(encoded.indices), False
+    )
+    if translation_cache is not None:
+        translation_cache.add_duplicates(
+            (pc.sum(row_valid).as_py() or 0) - len(texts)
+        )
+
+    def gather(name):
+        return pa.array(
+            [outcome.get(name) for outcome in outcomes], pa.string()
+        ).take(encoded.indices)
+
+    messages = pc.if_else(
+        row_valid,
+        gather("error_message"),
+        pa.scalar(missing["error_message"], pa.string()),
+    )
+    failed = pc.is_valid(messages)
+    succeeded = pc.invert(failed)
+
+    translated = pa.table(
+        {
+            "ID": pc.filter(ids, succeeded),
+            "original_review_language": pc.filter(
+                gather("original_review_language"), succeeded
+            ),
+            "review_translation": pc.filter(gather("review_translation"), succeeded),
+        }
+    )
+    translation_errors = pa.table(
+        {
+            "ID": pc.filter(ids, failed),
+            "original_text": pc.filter(reviews, failed),
+            "error_message": pc.filter(messages, failed),
+        }
+    )
+
+    return translated, translation_errors
+
+
+def translate_streaming(source_bucket, source_key, file_name):
+    """Translate the source record batch by record batch.
+
+    Each batch is appended to the destination and error Parquet files as soon
+    as it is translated, so memory does not grow with the input size.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    destination_string = destination_path(file_name)
+    error_destination_string = error_path(file_name)
+    result = {"bucket": DESTINATION_BUCKET_NAME,
+              "key": DESTINATION_LOCATION_PREFIX}
+    errors = error_accumulator()
+    record_metrics = metrics.current()
+
+    with ExitStack() as stack:
+        try:
+            parquet_file = pq.ParquetFile(
+                stack.enter_context(open_file(f"s3://{source_bucket}/{source_key}"))
+            )
+            id_type = parquet_file.schema_arrow.field("ID").type
+        except Exception as exception:
+            return {
+                "data_reading_error": str(exception),
+                "bucket": source_bucket,
+                "key": source_key,
+            }
+
+        translated_schema, error_schema = output_schemas(id_type)
+
+        # Both outputs are written to temporary keys that replace the
+        # destinations only once every batch succeeded.
+        try:
+            with ExitStack() as outputs:
+                writer = pq.ParquetWriter(
+                    outputs.enter_context(
+                        open_file(outputs.enter_context(storage.staged(destination_string)), "wb")
+                    ),
+                    translated_schema,
+                    **parquet_writer_options(),
+                )
+                outputs.callback(writer.close)
+                error_writer = None
+
+                filters = source_filters()
+                row_groups = matching_row_groups(parquet_file.metadata, filters)
+                batches = parquet_file.iter_batches(
+                    batch_size=TRANSLATION_STREAM_BATCH_SIZE,
+                    columns=SOURCE_COLUMNS,
+                    **({"row_groups": row_groups} if row_groups is not None else {}),
+                )
+                while True:
+                    with record_metrics.stage("read"):
+                        batch = next(batches, None)
+                    if batch is None:
+                        break
+                    frame = filter_frame(batch.to_pandas(), filters)
+                    record_metrics.increment("rows", len(frame))
+                    with record_metrics.stage("translate"):
+                        translated, batch_errors = translate_dataframe(frame)
+                    with record_metrics.stage("write"):
+                        writer.write_table(
+                            frame_to_table(translated, translated_schema),
+                            row_group_size=PARQUET_ROW_GROUP_SIZE or None,
+                        )
+                    if not len(batch_errors):
+                        continue
+                    if error_writer is None:
+                        error_writer = pq.ParquetWriter(
+                            outputs.enter_context(
+                                open_file(
+                                    outputs.enter_context(storage.staged(error_destination_string)),
+                                    "wb",
+                                )
+                            ),
+                            error_schema,
+                            **parquet_writer_options(),
+                        )
+                        outputs.callback(error_writer.close)
+                    batch_errors = pd.DataFrame(
+                        error_frame(batch_errors), columns=error_schema.names
+                    )
+                    record_metrics.increment("error_rows", len(batch_errors))
+                    with record_metrics.stage("error_write"):
+                        error_writer.write_table(
+                            frame_to_table(batch_errors, error_schema),
+                            row_group_size=PARQUET_ROW_GROUP_SIZE or None,
+                        )
+                    errors.extend(batch_errors)
+        except Exception as exception:
+            errors.close()
+            result["translation_status"] = "Errors occured"
+            result["writing_status"] = "Errors occured"
+            result["writing_error_messages"] = str(exception)
+
+            return result
+
+    result["translation_status"] = "OK"
+    if len(errors):
+        result["translation_status"] = "Errors occured"
+        result["translation_error_messages"] = errors.summary(error_destination_string)
+    errors.close()
+    result["writing_status"] = "OK"
+
+    return result
+
+
+def checkpoint_uri(file_name):
+    base = (
+        TRANSLATION_CHECKPOINT_URI
+        or f"s3://{DESTINATION_BUCKET_NAME}/{DESTINATION_LOCATION_PREFIX}/_checkpoints"
+    )
+    return f"{base.rstrip('/')}/{file_name}"
+
+
+def out_of_time(context):
+    get_remaining_time = getattr(context, "get_remaining_time_in_millis", None)
+    return (
+        get_remaining_time is not None
+        and get_remaining_time() < TRANSLATION_CHECKPOINT_MARGIN_MS
+    )
+
+
+def json_value(value):
+    return value.item() if hasattr(value, "item") else value
+
+
+def translate_checkpointed(source_bucket, source_key, file_name, context=None):
+    """Translate the source TRANSLATION_CHECKPOINT_ROWS rows at a time.
+
+    Finished chunks are skipped when the same record is translated again.
+    CheckpointTimeout is raised when the invocation is about to time out, and
+    once every chunk is done the parts are compacted into the usual
+    destination and error files. The checkpoint then keeps only the result,
+    returned as is if the record is translated again, until lambda_handler
+    removes it with clear_checkpoints() at the end of the invocation.
+    """
+    record_metrics = metrics.current()
+    try:
+        with record_metrics.stage("read"):
+            df = read_source(source_bucket, source_key)
+    except Exception as exception:
+        return {
+            "data_reading_error": str(exception),
+            "bucket": source_bucket,
+            "key": source_key,
+        }
+    record_metrics.increment("rows", len(df))
+
+    checkpoint = Checkpoint(
+        checkpoint_uri(file_name), f"s3://{source_bucket}/{source_key}", storage
+    )
+    if checkpoint.load():
+        if checkpoint.result is not None:
+            logger.info(f"{file_name} was translated before the invocation was retried")
+            return checkpoint.result
+        if checkpoint.offset > len(df) or (
+            checkpoint.offset
+            and json_value(df["ID"].iloc[checkpoint.offset - 1]) != checkpoint.last_id
+        ):
+            logger.warning(f"Checkpoint of {file_name} does not match the source, starting over")
+            checkpoint.reset()
+        else:
+            logger.info(f"Resuming {file_name} at row {checkpoint.offset}")
+            record_metrics.increment("resumed_rows", checkpoint.offset)
+
+    try:
+        while checkpoint.offset < len(df):
+            if out_of_time(context):
+                raise CheckpointTimeout(
+                    f"Stopped {file_name} at row {checkpoint.offset} of {len(df)}, "
+                    "invoke again with the same record to resume"
+                )
+            chunk = df.iloc[checkpoint.offset:checkpoint.offset + TRANSLATION_CHECKPOINT_ROWS]
+            with record_metrics.stage("translate"):
+                translated, errors = translate_dataframe(chunk)
+            with record_metrics.stage("checkpoint_write"):
+                write_parquet(translated, checkpoint.part_path(checkpoint.parts))
+                if len(errors):
+                    write_parquet(
+                        error_frame(errors), checkpoint.error_part_path(checkpoint.parts)
+                    )
+                    checkpoint.error_parts.append(checkpoint.parts)
+                checkpoint.parts += 1
+                checkpoint.offset += len(chunk)
+                checkpoint.last_id = json_value(chunk["ID"].iloc[-1])
+                checkpoint.save()
+            record_metrics.increment("checkpoint_parts")
+
+        with record_metrics.stage("compact"):
+            translated = (
+                pd.concat(
+                    [read_parquet(checkpoint.part_path(index)) for index in range(checkpoint.parts)],
+                    ignore_index=True,
+                )
+                if checkpoint.parts
+                else []
+            )
+            errors = (
+                pd.concat(
+                    [read_parquet(checkpoint.error_part_path(index)) for index in checkpoint.error_parts],
+                    ignore_index=True,
+                )
+                if checkpoint.error_parts
+                else []
+            )
+    except CheckpointTimeout:
+        raise
+    except Exception as exception:
+        return {
+            "bucket": DESTINATION_BUCKET_NAME,
+            "key": DESTINATION_LOCATION_PREFIX,
+            "writing_status": "Errors occured",
+            "writing_error_messages": str(exception),
+        }
+
+    result = write_results(file_name, translated, errors)
+    if "writing_error_messages" not in result:
+        try:
+            checkpoint.complete(result)
+        except Exception as exception:
+            logger.warning(f"Could not complete the checkpoint of {file_name}: {exception}")
+
+    return result
+
+
+def clear_checkpoints(event):
+    """Remove the completed checkpoints of the event's records.
+
+    Called once the whole event was translated, so that a CheckpointTimeout
+    on a later record does not make the retry translate earlier ones again.
+    """
+    for record in event:
+        try:
+            source_bucket, source_key, file_name = extract_path(record=record)
+        except Exception:
+            continue
+        checkpoint = Checkpoint(
+            checkpoint_uri(file_name), f"s3://{source_bucket}/{source_key}", storage
+        )
+        try:
+            if checkpoint.load() and checkpoint.result is not None:
+                checkpoint.clear()
+        except Exception as exception:
+            logger.warning(f"Could not remove the checkpoint of {file_name}: {exception}")
+
+
+def review_hashes(reviews):
+    return pd.util.hash_pandas_object(reviews, index=False).to_numpy()
+
+
+def read_previous_output(file_name):
+    """Previous destination file with review hashes, or None."""
+    try:
+        previous = read_parquet(destination_path(file_name))
+    except FileNotFoundError:
+        return None
+    except Exception as exception:
+        logger.warning(f"Could not read the previous output of {file_name}: {exception}")
+        return None
+    if "review_hash" not in previous.columns:
+        logger.info(f"Previous output of {file_name} has no review hashes, translating all rows")
+        return None
+
+    return previous
+
+
+def translate_delta(df, file_name):
+    """Translate only the rows that changed since the previous output.
+
+    Rows are matched to the previous destination file on ID and review hash
+    with a single merge; matches keep their stored translation and the other
+    rows go through translate_dataframe. Returns the merged translations in
+    source order, the errors and the reused/translated row counts.
+    """
+    record_metrics = metrics.current()
+    keys = pd.DataFrame(
+        {
+            "ID": df["ID"].to_numpy(),
+            "review_hash": review_hashes(df["review"]),
+            "position": np.arange(len(df)),
+        }
+    )
+    with record_metrics.stage("delta_read"):
+        previous = read_previous_output(file_name)
+    if previous is None:
+        reused = keys.iloc[0:0].assign(
+            original_review_language=None, review_translation=None
+        )
+    else:
+        reused = keys.merge(
+            previous[
+                ["ID", "review_hash", "original_review_language", "review_translation"]
+            ].drop_duplicates(["ID", "review_hash"]),
+            on=["ID", "review_hash"],
+            how="inner",
+        )
+
+    changed = np.ones(len(df), dtype=bool)
+    changed[reused["position"].to_numpy()] = False
+    # The changed rows are translated with their positions as IDs, so that
+    # rows sharing an ID still get the hash of their own review.
+    fresh_translated, errors = translate_dataframe(
+        pd.DataFrame(
+            {"ID": np.flatnonzero(changed), "review": df["review"].to_numpy()[changed]}
+        )
+    )
+
+    fresh = (
+        pd.DataFrame(
+            fresh_translated,
+            columns=["ID", "original_review_language", "review_translation"],
+        )
+        .rename(columns={"ID": "position"})
+        .merge(keys, on="position", how="left")
+    )
+    error_rows = error_frame(errors)
+    if isinstance(errors, ErrorAccumulator):
+        errors.close()
+    errors = error_rows.assign(
+        ID=keys["ID"].to_numpy()[error_rows["ID"].to_numpy(dtype=np.int64)]
+    )
+    translated = (
+        pd.concat([reused, fresh], ignore_index=True)
+        .sort_values("position", kind="stable")
+        .drop(columns="position")
+        .reset_index(drop=True)
+    )[["ID", "original_review_language", "review_translation", "review_hash"]]
+
+    record_metrics.increment("reused_rows", len(reused))
+    delta_counts = {"reused_rows": len(reused), "translated_rows": int(changed.sum())}
+    logger.info(f"Delta translation of {file_name}: {delta_counts}")
+
+    return translated, errors, delta_counts
+
+
+def output_schemas(id_type):
+    """Arrow schemas of the translated and error files for a source ID type."""
+    import pyarrow as pa
+
+    return (
+        pa.schema(
+            [
+                ("ID", id_type),
+                ("original_review_language", pa.string()),
+                ("review_translation", pa.string()),
+            ]
+        ),
+        pa.schema(
+            [("ID", id_type), ("original_text", pa.string()), ("error_message", pa.string())]
+        ),
+    )
+
+
+def frame_to_table(rows, schema):
+    import pyarrow as pa
+
+    return pa.Table.from_pandas(
+        pd.DataFrame(rows, columns=schema.names), schema=schema, preserve_index=False
+    )
+
+
+def translate_dataframe(df):
+
+    if TRANSLATION_COLUMNAR:
+        return translate_dataframe_columnar(df)
+
+    if (
+        TRANSLATION_BATCH_MAX_BYTES
+        or TRANSLATION_MAX_WORKERS > 1
+        or translation_cache is not None
+        or TRANSLATION_LANGUAGE_ROUTING
+    ):
+        return translate_dataframe_batched(df)
+
+    translated = []
+    translation_errors = error_accumulator(df["review"])
+
+    logger.info("Translating separate rows...")
+    for position, (idx, row) in enumerate(df.iterrows()):
+        try:
+            translated.append(translate_row(row))
+
+        except Exception as translate_exception:
+
+            translation_errors.add(position, row["ID"], translate_exception)
+
+    return translated, translation_errors
+
+
+def translate_dataframe_batched(df):
+    """Translate the frame once per distinct review.
+
+    Duplicate reviews are folded before any request is sent, cached
+    translations are reused, and the remaining reviews are sent as batches
+    and/or concurrently before the outcomes are fanned back out to every ID.
+    """
+    rows = [
+        {"ID": row_id, "review": review}
+        for row_id, review in zip(df["ID"], df["review"])
+    ]
+    unique_rows, row_unique_index = deduplicate_rows(rows)
+
+    outcomes = translate_distinct(unique_rows)
+    if translation_cache is not None:
+        translation_cache.add_duplicates(len(rows) - len(unique_rows))
+
+    return fan_out(rows, row_unique_index, outcomes, df["review"])
+
+
+def translate_dataframe_multi(df, target_languages):
+    """Translate the frame into several languages in one pass.
+
+    Like translate_dataframe_batched, with every distinct review scheduled
+    once per target language in a single translate_distinct call, so the
+    languages share its batches, cache and TRANSLATION_MAX_WORKERS.
+    Returns {language: (translated, errors)}.
+    """
+    rows = [
+        {"ID": row_id, "review": review}
+        for row_id, review in zip(df["ID"], df["review"])
+    ]
+    unique_rows, row_unique_index = deduplicate_rows(rows)
+
+    outcomes = translate_distinct(target_rows(unique_rows, target_languages))
+    if translation_cache is not None:
+        translation_cache.add_duplicates(
+            len(target_languages) * (len(rows) - len(unique_rows))
+        )
+
+    return fan_out_targets(rows, row_unique_index, outcomes, df["review"], target_languages)
+
+
+def target_rows(unique_rows, target_languages):
+    """The distinct rows once per target language, IDs still being positions."""
+    count = len(unique_rows)
+    return [
+        dict(row, ID=offset * count + row["ID"], target_language=language)
+        for offset, language in enumerate(target_languages)
+        for row in unique_rows
+    ]
+
+
+def fan_out_targets(rows, row_unique_index, outcomes, reviews, target_languages):
+    """fan_out for the outcomes of target_rows(), as {language: (translated, errors)}."""
+    count = len(outcomes) // len(target_languages)
+    return {
+        language: fan_out(
+            rows, row_unique_index, outcomes[offset * count:(offset + 1) * count], reviews
+        )
+        for offset, language in enumerate(target_languages)
+    }
+
+
+def deduplicate_rows(rows):
+    """Fold rows with equal reviews.
+
+    Returns the distinct rows, whose IDs are their positions, and the index
+    of every input row's distinct row.
+    """
+    unique_rows = []
+    unique_index = {}
+    row_unique_index = []
+    for row in rows:
+        review = row["review"]
+        if isinstance(review, str) and review in unique_index:
+            row_unique_index.append(unique_index[review])
+            continue
+        index = len(unique_rows)
+        if isinstance(review, str):
+            unique_index[review] = index
+        unique_rows.append({"ID": index, "review": review})
+        row_unique_index.append(index)
+
+    return unique_rows, row_unique_index
+
+
+def fan_out(rows, row_unique_index, outcomes, reviews):
+    """Copy the outcome of every distinct row back to the rows sharing it."""
+    translated = []
+    translation_errors = error_accumulator(reviews)
+    for position, (row, index) in enumerate(zip(rows, row_unique_index)):
+        outcome = outcomes[index]
+        if "error_message" in outcome:
+            translation_errors.add(position, row["ID"], outcome["error_message"])
+        else:
+            translated.append(dict(outcome, ID=row["ID"]))
+
+    return translated, translation_errors
+
+
+def translate_dataframe_columnar(df):
+    """Column-oriented translate_dataframe returning DataFrames.
+
+    Missing and blank reviews are rejected and duplicates folded with
+    vectorised pandas operations; only the distinct texts are turned into
+    Python rows for the requests, and both outputs are assembled from arrays.
+    """
+    ids = df["ID"].to_numpy()
+    reviews = df["review"]
+    valid = (
+        reviews.str.strip().str.len().gt(0).fillna(False).to_numpy(dtype=bool)
+        if reviews.dtype == object or pd.api.types.is_string_dtype(reviews)
+        else np.zeros(len(df), dtype=bool)
+    )
+
+    codes, texts = pd.factorize(reviews[valid])
+    outcomes = translate_distinct(
+        [{"ID": index, "review": text} for index, text in enumerate(texts)]
+    )
+    if translation_cache is not None:
+        translation_cache.add_duplicates(int(valid.sum()) - len(texts))
+
+    languages = np.array(
+        [outcome.get("original_review_language") for outcome in outcomes], dtype=object
+    )
+    translations = np.array(
+        [outcome.get("review_translation") for outcome in outcomes], dtype=object
+    )
+    messages = np.array(
+        [outcome.get("error_message") for outcome in outcomes], dtype=object
+    )
+
+    valid_positions = np.flatnonzero(valid)
+    failed = pd.notna(messages[codes]) if len(codes) else np.zeros(0, dtype=bool)
+    succeeded = ~failed
+
+    translated = pd.DataFrame(
+        {
+            "ID": ids[valid_positions[succeeded]],
+            "original_review_language": languages[codes[succeeded]],
+            "review_translation": translations[codes[succeeded]],
+        }
+    )
+
+    error_positions = np.concatenate([np.flatnonzero(~valid), valid_positions[failed]])
+    error_messages = np.concatenate(
+        [
+            np.full((~valid).sum(), "Review text is missing or empty", dtype=object),
+            messages[codes[failed]],
+        ]
+    )
+    order = np.argsort(error_positions, kind="stable")
+    translation_errors = pd.DataFrame(
+        {
+            "ID": ids[error_positions[order]],
+            "original_text": reviews.to_numpy()[error_positions[order]],
+            "error_message": error_messages[order],
+        }
+    )
+
+    return translated, translation_errors
+
+
+def translate_distinct(unique_rows):
+    """Translate rows whose IDs are their positions in unique_rows.
+
+    Returns one outcome per row, either a translation or an error dict,
+    consulting and filling the translation cache on the way.
+    """
+    outcomes, pending = lookup_distinct(unique_rows)
+
+    logger.info(
+        f"Translating {len(pending)} distinct rows with {TRANSLATION_MAX_WORKERS} workers..."
+    )
+    for batch_translated, batch_errors in map_in_order(
+        translate_batch_or_rows, distinct_batches(pending), TRANSLATION_MAX_WORKERS
+    ):
+        store_outcomes(unique_rows, outcomes, batch_translated, batch_errors)
+
+    if translation_cache is not None:
+        translation_cache.flush()
+
+    return outcomes
+
+
+def lookup_distinct(unique_rows):
+    """Outcomes known before any request is sent, and the rows left to translate.
+
+    Cached translations and, with language routing, rows already in their
+    target language are resolved here; the other outcomes stay None.
+    """
+    outcomes = [None] * len(unique_rows)
+    pending = []
+    for unique_row in unique_rows:
+        cached = None
+        if translation_cache is not None and isinstance(unique_row["review"], str):
+            cached = translation_cache.get(
+                unique_row["review"],
+                SOURCE_LANGUAGE_CODE,
+                unique_row.get("target_language") or TARGET_LANGUAGE_CODE,
+            )
+        if cached is None:
+            pending.append(unique_row)
+        else:
+            outcomes[unique_row["ID"]] = {
+                "ID": unique_row["ID"],
+                "original_review_language": cached[0],
+                "review_translation": cached[1],
+            }
+
+    if TRANSLATION_LANGUAGE_ROUTING and SOURCE_LANGUAGE_CODE == "auto":
+        pending = route_by_language(pending, outcomes)
+
+    return outcomes, pending
+
+
+def distinct_batches(pending):
+    """The request units for the rows left by lookup_distinct().
+
+    Rows whose source language would be "auto" are never batched together.
+    """
+    if not TRANSLATION_BATCH_MAX_BYTES:
+        return ([row] for row in pending)
+
+    return (
+        batch
+        for group in group_by_language(pending)
+        for batch in (
+            build_batches(group, TRANSLATION_BATCH_MAX_BYTES)
+            if (group[0].get("source_language") or SOURCE_LANGUAGE_CODE) != "auto"
+            else ([row] for row in group)
+        )
+    )
+
+
+def store_outcomes(unique_rows, outcomes, translated, errors):
+    """Record the outcomes of one unit and cache its translations."""
+    for outcome in translated + errors:
+        outcomes[outcome["ID"]] = outcome
+    if translation_cache is not None:
+        for outcome in translated:
+            unique_row = unique_rows[outcome["ID"]]
+            translation_cache.put(
+                unique_row["review"],
+                SOURCE_LANGUAGE_CODE,
+                unique_row.get("target_language") or TARGET_LANGUAGE_CODE,
+                (outcome["original_review_language"], outcome["review_translation"]),
+            )
+
+
+def route_by_language(rows, outcomes):
+    """Detect the language of rows before they are sent for translation.
+
+    Rows already in the target language get their outcome straight away;
+    the returned rows to translate carry a "source_language" when the
+    detector recognised theirs.
+    """
+    record_metrics = metrics.current()
+    pending = []
+    detected = {}
+    with record_metrics.stage("language_detection"):
+        for row in rows:
+            review = row["review"]
+            if isinstance(review, str) and review in detected:
+                language = detected[review]
+            else:
+                language = language_detector.detect(review)
+                if isinstance(review, str):
+                    detected[review] = language
+            if language == (row.get("target_language") or TARGET_LANGUAGE_CODE):
+                outcomes[row["ID"]] = {
+                    "ID": row["ID"],
+                    "original_review_language": language,
+                    "review_translation": row["review"],
+                }
+                continue
+            if language is not None:
+                row = dict(row, source_language=language)
+            pending.append(row)
+    record_metrics.increment("passthrough_rows", len(rows) - len(pending))
+
+    return pending
+
+
+def group_by_language(rows):
+    """Split rows into lists sharing source and target languages, keeping their order."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(
+            (row.get("source_language"), row.get("target_language")), []
+        ).append(row)
+
+    return list(groups.values())
+
+
+def map_in_order(function, items, max_workers):
+    """Yield function(item) for every item, in input order.
+
+    With more than one worker the items are submitted to a thread pool while
+    keeping a bounded number of them in flight.
+    """
+    if max_workers <= 1:
+        for item in items:
+            yield function(item)
+        return
+
+    function = metrics.bind(function)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def translate_batch_or_rows(batch):
+
+    if len(batch) > 1:
+        try:
+            return translate_batch(batch), []
+        except Exception as batch_exception:
+            logger.warning(
+                f"Batch of {len(batch)} rows failed, translating rows separately: {batch_exception}"
+            )
+
+    return translate_rows(batch)
+
+
+def translate_rows(rows):
+
+    translated = []
+    translation_errors = []
+
+    for row in rows:
+        try:
+            translated.append(translate_row(row))
+        except Exception as translate_exception:
+            translation_errors.append(translation_error(row, translate_exception))
+
+    return translated, translation_errors
+
+
+def translation_error(row, exception):
+    return {
+        "ID": row["ID"],
+        "original_text": row["review"],
+        "error_message": str(exception),
+    }
+
+
+def is_batchable(review, max_bytes):
+    return (
+        isinstance(review, str)
+        and review.strip() != ""
+        and BATCH_DELIMITER_TOKEN not in review
+        and len(review.encode("utf-8")) + len(BATCH_DELIMITER) <= max_bytes
+    )
+
+
+def build_batches(rows, max_bytes):
+    """Group consecutive rows into batches whose joined text fits max_bytes.
+
+    Rows that cannot be joined safely (non-text, empty, too long or
+    containing the delimiter) are emitted as single-row batches so that they
+    keep their per-row error behaviour.
+    """
+    delimiter_size = len(BATCH_DELIMITER.encode("utf-8"))
+    batch = []
+    batch_size = 0
+
+    for row in rows:
+        if not is_batchable(row["review"], max_bytes):
+            if batch:
+                yield batch
+                batch, batch_size = [], 0
+            yield [row]
+            continue
+
+        row_size = len(row["review"].encode("utf-8"))
+        if batch and batch_size + delimiter_size + row_size > max_bytes:
+            yield batch
+            batch, batch_size = [], 0
+
+        batch_size += row_size + (delimiter_size if batch else 0)
+        batch.append(row)
+
+    if batch:
+        yield batch
+
+
+def translate_batch(batch):
+
+    response = request_translation(**batch_request(batch))
+
+    return batch_outcomes(batch, response)
+
+
+def translation_request(text, source_language=None, target_language=None):
+    """TranslateText arguments, defaulting to the configured languages."""
+    return {
+        "Text": text,
+        "SourceLanguageCode": source_language or SOURCE_LANGUAGE_CODE,
+        "TargetLanguageCode": target_language or TARGET_LANGUAGE_CODE,
+    }
+
+
+def translation_outcome(row, language, translation):
+    return {
+        "ID": row["ID"],
+        "original_review_language": language,
+        "review_translation": translation,
+    }
+
+
+def batch_request(batch):
+    return translation_request(
+        BATCH_DELIMITER.join(row["review"] for row in batch),
+        batch[0].get("source_language"),
+        batch[0].get("target_language"),
+    )
+
+
+def batch_outcomes(batch, response):
+    translations = split_batch_translation(response.get("TranslatedText"), len(batch))
+
+    return [
+        translation_outcome(row, response.get("SourceLanguageCode"), translation)
+        for row, translation in zip(batch, translations)
+    ]
+
+
+def row_request(row):
+    return translation_request(
+        row["review"], row.get("source_language"), row.get("target_language")
+    )
+
+
+def row_outcome(row, response):
+    return translation_outcome(
+        row, response.get("SourceLanguageCode"), response.get("TranslatedText")
+    )
+
+
+def needs_segmentation(review):
+    return isinstance(review, str) and utf8_size(review) > TRANSLATION_SEGMENT_MAX_BYTES
+
+
+def split_batch_translation(text, expected_count):
+    parts = [part.strip() for part in (text or "").split(BATCH_DELIMITER_TOKEN)]
+    if len(parts) != expected_count or not all(parts):
+        raise Exception(
+            f"Batch translation split into {len(parts)} parts, expected {expected_count}"
+        )
+
+    return parts
+
+
+def translate_row(row):
+
+    try:
+        if needs_segmentation(row["review"]):
+            language, translation = translate_segmented(
+                row["review"], row.get("source_language"), row.get("target_language")
+            )
+
+            return translation_outcome(row, language, translation)
+
+        return row_outcome(row, request_translation(**row_request(row)))
+
+    except Exception as ex:
+        raise Exception(f"{ex}")
+
+
+def translate_segmented(text, source_language=None, target_language=None):
+    """Translate an oversized text segment by segment.
+
+    With automatic language detection the first segment is translated alone
+    and its detected language is used for the remaining segments, which are
+    then sent concurrently, so the whole review reports one language.
+    Returns the language and the reassembled translation.
+    """
+    segments = text_segments(text)
+
+    def translate_segment(segment, source_language):
+        if not segment.strip():
+            return segment, None
+        response = request_translation(
+            **translation_request(segment, source_language, target_language)
+        )
+        return response.get("TranslatedText"), response.get("SourceLanguageCode")
+
+    language = source_language or SOURCE_LANGUAGE_CODE
+    translations = []
+    remaining = segments
+    if language == "auto":
+        first = first_segment(segments)
+        for segment, _ in segments[:first + 1]:
+            translation, detected = translate_segment(segment, language)
+            translations.append(translation)
+        language = detected
+        remaining = segments[first + 1:]
+
+    translations.extend(
+        translation
+        for translation, _ in map_in_order(
+            lambda segment: translate_segment(segment[0], language),
+            remaining,
+            TRANSLATION_SEGMENT_WORKERS,
+        )
+    )
+
+    return language, join_segments(translations, segments)
+
+
+def text_segments(text):
+    segments = split_text(text, TRANSLATION_SEGMENT_MAX_BYTES)
+    metrics.current().increment("segmented_reviews")
+    metrics.current().increment("segments", len(segments))
+
+    return segments
+
+
+def first_segment(segments):
+    """Index of the segment whose translation detects the source language."""
+    return next(
+        (index for index, (segment, _) in enumerate(segments) if segment.strip()),
+        len(segments) - 1,
+    )
+
+
+def join_segments(translations, segments):
+    return "".join(
+        translation + separator
+        for translation, (_, separator) in zip(translations, segments)
+    )
+
+
+def request_translation(**kwargs):
+
+    record_metrics = metrics.current()
+    try:
+        response = call_with_throttling(
+            boto_translation_client.translate_text,
+            translation_rate_limiter,
+            TRANSLATION_THROTTLE_RETRIES,
+            **kwargs,
+        )
+    except Exception as exception:
+        if record_metrics.enabled:
+            count_request(record_metrics, kwargs, getattr(exception, "response", None))
+            record_metrics.increment("failed_translate_calls")
+        raise
+
+    if record_metrics.enabled:
+        count_request(record_metrics, kwargs, response)
+
+    return response
+
+
+def count_request(record_metrics, request, response):
+    record_metrics.increment("translate_calls")
+    if isinstance(request.get("Text"), str):
+        record_metrics.increment("request_bytes", len(request["Text"].encode("utf-8")))
+    retries = ((response or {}).get("ResponseMetadata") or {}).get("RetryAttempts")
+    if retries:
+        record_metrics.increment("retries", retries)
+
+
+def shard_uri(file_name):
+    return f"s3://{DESTINATION_BUCKET_NAME}/{DESTINATION_LOCATION_PREFIX}/_shards/{file_name}"
+
+
+def shard_part_path(file_name, index):
+    return f"{shard_uri(file_name)}/part-{index:05d}.parquet"
+
+
+def shard_error_path(file_name, index):
+    return f"{shard_uri(file_name)}/errors-{index:05d}.parquet"
+
+
+def plan_shards(record):
+    """Split the source of a record into shards of consecutive row groups.
+
+    Only the Parquet footer is read. Returns the record with its file_name
+    and a "shards" list of records for lambda_handler, each carrying a
+    "shard" descriptor with its index, the shard count and its row groups.
+    """
+    import pyarrow.parquet as pq
+
+    source_bucket, source_key, file_name = extract_path(record=record)
+    with open_file(f"s3://{source_bucket}/{source_key}") as f:
+        metadata = pq.ParquetFile(f).metadata
+
+    ranges = []
+    start = rows = 0
+    for index in range(metadata.num_row_groups):
+        rows += metadata.row_group(index).num_rows
+        if rows >= TRANSLATION_SHARD_ROWS or index == metadata.num_row_groups - 1:
+            ranges.append((start, index + 1, rows))
+            start, rows = index + 1, 0
+    ranges = ranges or [(0, 0, 0)]
+
+    return dict(
+        record,
+        file_name=file_name,
+        shards=[
+            dict(
+                record,
+                shard={
+                    "index": index,
+                    "count": len(ranges),
+                    "row_groups": [start, end],
+                    "rows": rows,
+                },
+            )
+            for index, (start, end, rows) in enumerate(ranges)
+        ],
+    )
+
+
+def translate_shard(source_bucket, source_key, file_name, shard):
+    """Translate the row groups of one shard into its part files."""
+    import pyarrow.parquet as pq
+
+    record_metrics = metrics.current()
+    start, end = shard["row_groups"]
+    try:
+        with record_metrics.stage("read"), open_file(f"s3://{source_bucket}/{source_key}") as f:
+            parquet_file = pq.ParquetFile(f)
+            translated_schema, error_schema = output_schemas(
+                parquet_file.schema_arrow.field("ID").type
+            )
+            df = (
+                parquet_file.read_row_groups(list(range(start, end)), columns=SOURCE_COLUMNS)
+                if end > start
+                else parquet_file.schema_arrow.empty_table().select(SOURCE_COLUMNS)
+            ).to_pandas()
+    except Exception as exception:
+        return {
+            "data_reading_error": str(exception),
+            "bucket": source_bucket,
+            "key": source_key,
+            "shard": shard,
+        }
+    df = filter_frame(df, source_filters())
+    record_metrics.increment("rows", len(df))
+    logger.info(f"Translating shard {shard['index'] + 1} of {shard['count']} of {file_name}...")
+
+    with record_metrics.stage("translate"):
+        translated, errors = translate_dataframe(df)
+    if not len(errors):
+        # An error part left by an earlier run of this shard would be merged.
+        storage.remove(shard_error_path(file_name, shard["index"]))
+
+    result = write_results(
+        file_name,
+        frame_to_table(translated, translated_schema),
+        frame_to_table(error_frame(errors), error_schema),
+        shard_part_path(file_name, shard["index"]),
+        shard_error_path(file_name, shard["index"]),
+    )
+    result["shard"] = shard
+
+    return result
+
+
+def concatenate_parts(paths, destination, accumulator=None):
+    """Append the row groups of every part file to one Parquet file.
+
+    The parts are written to a staging file that replaces ``destination``
+    only after the last one was appended.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with storage.staged(destination) as staging, open_file(staging, "wb") as output:
+        writer = None
+        try:
+            for path in paths:
+                with open_file(path) as f:
+                    part = pq.ParquetFile(f)
+                    if writer is None:
+                        writer = pq.ParquetWriter(
+                            output, part.schema_arrow, **parquet_writer_options()
+                        )
+                    for batch in part.iter_batches():
+                        writer.write_table(
+                            pa.Table.from_batches([batch]),
+                            row_group_size=PARQUET_ROW_GROUP_SIZE or None,
+                        )
+                        if accumulator is not None:
+                            accumulator.extend(batch_records(batch))
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+def merge_shards(plan):
+    """Combine the part files of a plan into the usual destination and error files."""
+    file_name = plan["file_name"]
+    count = len(plan["shards"])
+    result = {"bucket": DESTINATION_BUCKET_NAME,
+              "key": DESTINATION_LOCATION_PREFIX}
+    errors = error_accumulator()
+    error_destination_string = error_path(file_name)
+    try:
+        with metrics.current().stage("merge"):
+            parts = [shard_part_path(file_name, index) for index in range(count)]
+            missing = [path for path in parts if not storage.exists(path)]
+            if missing:
+                raise FileNotFoundError(f"Missing shard parts: {', '.join(missing)}")
+            concatenate_parts(parts, destination_path(file_name))
+            error_parts = [
+                shard_error_path(file_name, index)
+                for index in range(count)
+                if storage.exists(shard_error_path(file_name, index))
+            ]
+            if error_parts:
+                concatenate_parts(error_parts, error_destination_string, errors)
+    except Exception as exception:
+        errors.close()
+        result["translation_status"] = "Errors occured"
+        result["writing_status"] = "Errors occured"
+        result["writing_error_messages"] = str(exception)
+
+        return result
+
+    storage.remove(shard_uri(file_name), recursive=True)
+    result["translation_status"] = "OK"
+    if len(errors):
+        result["translation_status"] = "Errors occured"
+        result["translation_error_messages"] = errors.summary(error_destination_string)
+    errors.close()
+    result["writing_status"] = "OK"
+
+    return result
+
+
+def plan_handler(event, context):
+    """Step Functions entry point returning the shard plan of every record.
+
+    A Map state invokes lambda_handler with [shard] for each entry of a
+    plan's "shards", and merge_handler then receives the plans.
+    """
+    plans = []
+    for record in event:
+        try:
+            plans.append(plan_shards(record))
+        except Exception as exception:
+            plans.append(
+                {
+                    "planning_error": str(exception),
+                    "record": json.dumps(record, indent=4),
+                }
+            )
+    logger.info(plans)
+    return plans
+
+
+def merge_handler(event, context):
+
+    merge_output = [
+        merge_shards(plan) if "shards" in plan else plan for plan in event
+    ]
+    logger.info(merge_output)
+    return merge_output
 
 
 def lambda_handler(event, context):
 
-    translation_output = [translate(record=record) for record in event]
+    if TRANSLATION_AGGREGATE_RECORDS:
+        translation_output = translate_aggregated(event, context)
+    else:
+        translation_output = [
+            translate(record=record, context=context) for record in event
+        ]
+    if TRANSLATION_CHECKPOINT_ROWS:
+        clear_checkpoints(event)
+    publish_translation_cache()
     logger.info(translation_output)
     return translation_output
+
+
+def publish_translation_cache():
+    """Upload the persistent cache once per invocation rather than per flush."""
+    if translation_cache is None:
+        return
+    try:
+        translation_cache.publish()
+    except Exception as exception:
+        logger.warning(f"Translation cache was not published: {exception}")
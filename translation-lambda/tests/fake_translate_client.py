@@ -0,0 +1,46 @@
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+
+class FakeTranslateClient:
+    """Offline stand-in for the boto3 ``translate`` client.
+
+    Every call sleeps ``latency`` seconds to mimic the service round trip and
+    a ``throttle_ratio`` share of calls fails with ThrottlingException, which
+    is enough to benchmark the translation engine without AWS access.
+    """
+
+    def __init__(self, latency=0.0, source_language="pl", throttle_ratio=0.0, seed=0):
+        self.latency = latency
+        self.source_language = source_language
+        self.throttle_ratio = throttle_ratio
+        self.calls = 0
+        self.throttles = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def translate_text(self, Text, SourceLanguageCode, TargetLanguageCode, **kwargs):
+        with self._lock:
+            self.calls += 1
+            throttled = self._random.random() < self.throttle_ratio
+            if throttled:
+                self.throttles += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            raise ClientError(
+                {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}},
+                "TranslateText",
+            )
+
+        if SourceLanguageCode == "auto":
+            SourceLanguageCode = self.source_language
+        return {
+            "TranslatedText": Text.upper(),
+            "SourceLanguageCode": SourceLanguageCode,
+            "TargetLanguageCode": TargetLanguageCode,
+        }
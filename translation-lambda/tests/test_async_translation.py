@@ -0,0 +1,177 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import pandas as pd
+from botocore.exceptions import ClientError
+
+import async_translation
+from async_translation import StubAsyncTranslateClient
+
+
+class CountingClient(StubAsyncTranslateClient):
+    def __init__(self):
+        super().__init__(latency=0.01)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def translate_text(self, Text, SourceLanguageCode, TargetLanguageCode):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await super().translate_text(Text, SourceLanguageCode, TargetLanguageCode)
+        finally:
+            self.in_flight -= 1
+
+
+class TestAsyncTranslation(unittest.TestCase):
+    @mock.patch("async_translation.TRANSLATION_ASYNC_CONCURRENCY", 3)
+    @mock.patch(
+        "translation_lambda.write_results",
+        side_effect=lambda file_name, translated, errors: {
+            "file_name": file_name,
+            "translated": translated,
+            "errors": errors,
+        },
+    )
+    @mock.patch(
+        "translation_lambda.read_source",
+        side_effect=lambda bucket, key: pd.DataFrame(
+            {"ID": [0, 1, 2, 3], "review": ["a", "b", "c", "d"]}
+        ),
+    )
+    def test_lambda_handler_processes_records_concurrently(self, read_source, write_results):
+        # GIVEN:
+        event = [
+            {"bucket": "bucket", "key": "data/first.parquet.gzip"},
+            {"bucket": "bucket", "key": "data/second.parquet.gzip"},
+            {"key": "data/broken.parquet.gzip"},
+        ]
+        client = CountingClient()
+        # WHEN:
+        response = asyncio.run(async_translation.translate_event(event, client=client))
+        # THEN:
+        self.assertEqual([result.get("file_name") for result in response[:2]], ["first", "second"])
+        self.assertListEqual(
+            [row["review_translation"] for row in response[0]["translated"]],
+            ["A", "B", "C", "D"],
+        )
+        self.assertIn("path_extraction_error", response[2])
+        self.assertEqual(client.calls, 8)
+        self.assertEqual(client.max_in_flight, 3)
+
+    @mock.patch("translation_lambda.METRICS_ENABLED", True)
+    @mock.patch(
+        "translation_lambda.write_results",
+        side_effect=lambda file_name, translated, errors: {"file_name": file_name},
+    )
+    @mock.patch(
+        "translation_lambda.read_source",
+        side_effect=lambda bucket, key: pd.DataFrame(
+            {"ID": [0, 1], "review": ["a", "b"]}
+            if "first" in key
+            else {"ID": [0, 1, 2, 3], "review": ["c", "d", "e", "f"]}
+        ),
+    )
+    def test_translate_event_reports_metrics_per_record(self, read_source, write_results):
+        # GIVEN:
+        event = [
+            {"bucket": "bucket", "key": "data/first.parquet.gzip"},
+            {"bucket": "bucket", "key": "data/second.parquet.gzip"},
+        ]
+        # WHEN:
+        response = asyncio.run(
+            async_translation.translate_event(event, client=CountingClient())
+        )
+        # THEN:
+        self.assertListEqual(
+            [result["metrics"]["counters"]["rows"] for result in response], [2, 4]
+        )
+        self.assertListEqual(
+            [result["metrics"]["counters"]["translate_calls"] for result in response], [2, 4]
+        )
+        self.assertTrue(
+            {"read", "translate"} <= set(response[0]["metrics"]["timings"])
+        )
+
+    def test_translate_dataframe_collects_errors(self):
+        # GIVEN:
+        df = pd.DataFrame({"ID": [0, 1], "review": ["a", None]})
+        client = StubAsyncTranslateClient()
+        # WHEN:
+
+        async def run():
+            return await async_translation.translate_dataframe(
+                df, client, asyncio.Semaphore(2)
+            )
+
+        translated, errors = asyncio.run(run())
+        # THEN:
+        self.assertListEqual([row["ID"] for row in translated], [0])
+        self.assertListEqual([error["ID"] for error in errors], [1])
+
+    @mock.patch("translation_lambda.TRANSLATION_SEGMENT_MAX_BYTES", 12)
+    def test_translate_dataframe_segments_long_reviews(self):
+        # GIVEN:
+        df = pd.DataFrame({"ID": [0], "review": ["pierwsze zdanie. drugie zdanie."]})
+        client = StubAsyncTranslateClient()
+        # WHEN:
+        translated, errors = asyncio.run(
+            async_translation.translate_dataframe(df, client, asyncio.Semaphore(2))
+        )
+        # THEN:
+        self.assertListEqual(
+            [row["review_translation"] for row in translated],
+            ["PIERWSZE ZDANIE. DRUGIE ZDANIE."],
+        )
+        self.assertEqual(len(errors), 0)
+        self.assertGreater(client.calls, 1)
+
+    @mock.patch(
+        "translation_lambda.write_targets",
+        side_effect=lambda file_name, outputs: {"file_name": file_name, "outputs": outputs},
+    )
+    @mock.patch(
+        "translation_lambda.read_source",
+        side_effect=lambda bucket, key: pd.DataFrame({"ID": [0, 1], "review": ["a", "a"]}),
+    )
+    def test_translate_event_uses_record_target_languages(self, read_source, write_targets):
+        # GIVEN:
+        event = [{"bucket": "bucket", "key": "data/first.parquet.gzip",
+                  "target_languages": ["en", "de"]}]
+        client = StubAsyncTranslateClient()
+        # WHEN:
+        response = asyncio.run(async_translation.translate_event(event, client=client))
+        # THEN:
+        outputs = response[0]["outputs"]
+        self.assertListEqual(list(outputs), ["en", "de"])
+        self.assertListEqual([row["ID"] for row in outputs["de"][0]], [0, 1])
+        self.assertEqual(client.calls, 2)
+
+    @mock.patch("throttling.backoff_delay", return_value=0)
+    def test_translate_dataframe_retries_throttled_requests(self, backoff_delay):
+        # GIVEN:
+        class ThrottledOnceClient(StubAsyncTranslateClient):
+            async def translate_text(self, Text, SourceLanguageCode, TargetLanguageCode):
+                if not self.calls:
+                    self.calls += 1
+                    raise ClientError(
+                        {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}},
+                        "TranslateText",
+                    )
+                return await super().translate_text(Text, SourceLanguageCode, TargetLanguageCode)
+
+        df = pd.DataFrame({"ID": [0], "review": ["a"]})
+        client = ThrottledOnceClient()
+        # WHEN:
+        translated, errors = asyncio.run(
+            async_translation.translate_dataframe(df, client, asyncio.Semaphore(2))
+        )
+        # THEN:
+        self.assertListEqual([row["review_translation"] for row in translated], ["A"])
+        self.assertEqual(len(errors), 0)
+        self.assertEqual(client.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
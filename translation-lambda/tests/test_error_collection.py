@@ -0,0 +1,56 @@
+import unittest
+
+import pandas as pd
+
+from error_collection import ErrorAccumulator
+
+
+class TestErrorCollection(unittest.TestCase):
+    def test_accumulator_spills_and_rebuilds_error_rows(self):
+        # GIVEN:
+        reviews = pd.Series([f"opinia {i}" for i in range(10)], index=range(100, 110))
+        errors = ErrorAccumulator(reviews, spill_rows=3)
+        # WHEN:
+        for position in range(0, 10, 2):
+            errors.add(position, position, "Throttled" if position % 4 else "Too long")
+        frame = errors.to_frame()
+        errors.add(9, 9, "Throttled")
+        # THEN:
+        self.assertEqual(len(errors), 6)
+        self.assertListEqual(frame["ID"].tolist(), [0, 2, 4, 6, 8])
+        self.assertListEqual(
+            frame["original_text"].tolist(),
+            ["opinia 0", "opinia 2", "opinia 4", "opinia 6", "opinia 8"],
+        )
+        self.assertListEqual([error["ID"] for error in errors], [0, 2, 4, 6, 8, 9])
+        self.assertDictEqual(errors.categories(), {"Too long": 3, "Throttled": 3})
+        errors.close()
+
+    def test_summary_includes_samples_only_when_enabled(self):
+        # GIVEN:
+        errors = ErrorAccumulator(["a", "b", "c"])
+        sampled = ErrorAccumulator(["a", "b", "c"], sample_limit=1)
+        # WHEN:
+        for accumulator in (errors, sampled):
+            accumulator.add(1, 11, ValueError("Test"))
+            accumulator.add(2, 12, ValueError("Test"))
+        # THEN:
+        self.assertDictEqual(
+            errors.summary("errors.parquet"),
+            {"error_file": "errors.parquet", "error_count": 2, "error_categories": {"Test": 2}},
+        )
+        self.assertListEqual(
+            sampled.summary("errors.parquet")["error_samples"],
+            [{"ID": 11, "original_text": "b", "error_message": "Test"}],
+        )
+
+    def test_extend_counts_existing_error_rows(self):
+        # GIVEN:
+        errors = ErrorAccumulator(sample_limit=5)
+        # WHEN:
+        errors.extend(
+            pd.DataFrame({"ID": [1, 2], "original_text": ["x", "y"], "error_message": ["A", "B"]})
+        )
+        # THEN:
+        self.assertEqual(len(errors), 2)
+        self.assertListEqual([sample["original_text"] for sample in errors.samples], ["x", "y"])
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from idempotency import ProcessedIndex, fingerprint, source_version
+
+
+class TestIdempotency(unittest.TestCase):
+    def test_fingerprint_changes_with_content_and_config(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # GIVEN:
+            source = os.path.join(directory, "reviews.parquet")
+            with open(source, "wb") as f:
+                f.write(b"first")
+            first = fingerprint(source, {"target_language": "en"})
+            # WHEN:
+            with open(source, "wb") as f:
+                f.write(b"second version")
+            # THEN:
+            self.assertEqual(source_version(source).split("-")[0], "14")
+            self.assertNotEqual(fingerprint(source, {"target_language": "en"}), first)
+            self.assertNotEqual(
+                fingerprint(source, {"target_language": "de"}),
+                fingerprint(source, {"target_language": "en"}),
+            )
+
+    def test_processed_index_returns_result_of_matching_fingerprint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # GIVEN:
+            index = ProcessedIndex(os.path.join(directory, "processed"))
+            # WHEN:
+            index.record("reviews", "abc", {"translation_status": "OK"})
+            # THEN:
+            self.assertDictEqual(index.lookup("reviews", "abc"), {"translation_status": "OK"})
+            self.assertIsNone(index.lookup("reviews", "def"))
+            self.assertIsNone(index.lookup("other", "abc"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,9 @@
 from typing import Dict
+import os
+import tempfile
 import unittest
 import json
+import pyarrow.parquet as pq
 from parameterized import parameterized
 from unittest import mock
 
@@ -15,6 +18,9 @@ site.addsitedir("terraform/solution/lambda_translation/translation-lambda/tests"
 print(sys.path)
 
 import translation_lambda
+from tests.fake_translate_client import FakeTranslateClient
+from storage import LocalStorage
+from translation_cache import LRUCache, TranslationCache
 
 
 class TestLambdaFunction(unittest.TestCase):
@@ -146,10 +152,11 @@ class TestLambdaFunction(unittest.TestCase):
         iterrows = mock.Mock(return_value=iterrows_outputs)
         translation_lambda.translate_row = mock.Mock(side_effect=translate_row_outputs)
         df.iterrows = iterrows
+        df.__getitem__.return_value = translation_lambda.pd.Series(["cześć", "pa"])
         # WHEN:
         translated, translation_errors = translation_lambda.translate_dataframe(df)
         self.assertListEqual(translated, translated_list_result)
-        self.assertListEqual(translation_errors, translation_error_list_result)
+        self.assertListEqual(list(translation_errors), translation_error_list_result)
 
     @parameterized.expand(
         [
@@ -172,9 +179,8 @@ class TestLambdaFunction(unittest.TestCase):
                     "translation_status": "Errors occured",
                     "translation_error_messages": {
                         "error_file": "s3://error_bucket/error_key/file_name.parquet.gzip",
-                        "error_messages": [
-                            {"ID": 0, "original_text": "cześć", "error_message": "Test"}
-                        ],
+                        "error_count": 1,
+                        "error_categories": {"Test": 1},
                     },
                     "writing_status": "OK",
                 },
@@ -250,7 +256,7 @@ class TestLambdaFunction(unittest.TestCase):
             record="Some event string"
         )
         translation_lambda.pd.read_parquet.assert_called_once_with(
-            "s3://source_bucket/source_key"
+            "s3://source_bucket/source_key", columns=["ID", "review"]
         )
         translation_lambda.pd.DataFrame.to_parquet.assert_has_calls(
             expected_calls, any_order=True
@@ -299,7 +305,7 @@ class TestLambdaFunction(unittest.TestCase):
                 }
             ],
         )
-        translation_lambda.translate.assert_called_with(record=event[0])
+        translation_lambda.translate.assert_called_with(record=event[0], context=context)
 
     def test_lambda_handler_error_in_event(self):
         # GIVEN:
@@ -354,7 +360,7 @@ class TestLambdaFunction(unittest.TestCase):
         response = translation_lambda.lambda_handler(event=event, context=context)
         # THEN:
         translation_lambda.pd.read_parquet.assert_called_once_with(
-            f"s3://{bucket_name}/{key_name}"
+            f"s3://{bucket_name}/{key_name}", columns=["ID", "review"]
         )
 
         calls = [
@@ -378,9 +384,8 @@ class TestLambdaFunction(unittest.TestCase):
                     "translation_status": "Errors occured",
                     "translation_error_messages": {
                         "error_file": "s3://error_bucket/error_key/review_data.parquet.gzip",
-                        "error_messages": [
-                            {"ID": 0, "original_text": "cześć", "error_message": "Test"}
-                        ],
+                        "error_count": 1,
+                        "error_categories": {"Test": 1},
                     },
                     "writing_status": "OK",
                 }
@@ -388,5 +393,827 @@ class TestLambdaFunction(unittest.TestCase):
         )
 
 
+    def test_build_batches_respects_byte_limit(self):
+        # GIVEN:
+        rows = [
+            {"ID": 0, "review": "a" * 10},
+            {"ID": 1, "review": "b" * 10},
+            {"ID": 2, "review": "c" * 10},
+            {"ID": 3, "review": None},
+            {"ID": 4, "review": "d ||| e"},
+            {"ID": 5, "review": "f" * 10},
+        ]
+        # WHEN:
+        batches = list(translation_lambda.build_batches(rows, 30))
+        # THEN:
+        self.assertListEqual(
+            [[row["ID"] for row in batch] for batch in batches],
+            [[0, 1], [2], [3], [4], [5]],
+        )
+
+    @mock.patch("translation_lambda.TRANSLATION_BATCH_MAX_BYTES", 1000)
+    @mock.patch("translation_lambda.SOURCE_LANGUAGE_CODE", "pl")
+    @mock.patch("translation_lambda.boto_translation_client.translate_text")
+    def test_translate_dataframe_batched(self, translate_text):
+        # GIVEN:
+        df = translation_lambda.pd.DataFrame(
+            {"ID": [0, 1, 2], "review": ["cześć", "pa", None]}
+        )
+        translate_text.side_effect = [
+            {"SourceLanguageCode": "pl", "TranslatedText": "hello\n|||\nbye"},
+            Exception("Test"),
+        ]
+        # WHEN:
+        translated, translation_errors = translation_lambda.translate_dataframe(df)
+        # THEN:
+        self.assertEqual(translate_text.call_count, 2)
+        translate_text.assert_any_call(
+            Text="cześć\n|||\npa",
+            SourceLanguageCode=translation_lambda.SOURCE_LANGUAGE_CODE,
+            TargetLanguageCode=translation_lambda.TARGET_LANGUAGE_CODE,
+        )
+        self.assertListEqual(
+            translated,
+            [
+                {"ID": 0, "original_review_language": "pl", "review_translation": "hello"},
+                {"ID": 1, "original_review_language": "pl", "review_translation": "bye"},
+            ],
+        )
+        self.assertListEqual(
+            [error["ID"] for error in translation_errors], [2]
+        )
+
+    @mock.patch("translation_lambda.TRANSLATION_BATCH_MAX_BYTES", 1000)
+    @mock.patch("translation_lambda.SOURCE_LANGUAGE_CODE", "auto")
+    @mock.patch("translation_lambda.boto_translation_client.translate_text")
+    def test_translate_dataframe_auto_source_language_not_batched(self, translate_text):
+        # GIVEN:
+        df = translation_lambda.pd.DataFrame({"ID": [0, 1], "review": ["cześć", "hallo"]})
+        translate_text.side_effect = [
+            {"SourceLanguageCode": "pl", "TranslatedText": "hello"},
+            {"SourceLanguageCode": "de", "TranslatedText": "hello"},
+        ]
+        # WHEN:
+        translated, translation_errors = translation_lambda.translate_dataframe(df)
+        # THEN:
+        self.assertListEqual(
+            [call.kwargs["Text"] for call in translate_text.call_args_list], ["cześć", "hallo"]
+        )
+        self.assertListEqual(
+            [row["original_review_language"] for row in translated], ["pl", "de"]
+        )
+        self.assertListEqual(list(translation_errors), [])
+
+    @mock.patch("translation_lambda.TRANSLATION_BATCH_MAX_BYTES", 1000)
+    @mock.patch("translation_lambda.SOURCE_LANGUAGE_CODE", "pl")
+    @mock.patch("translation_lambda.boto_translation_client.translate_text")
+    def test_translate_dataframe_batched_split_fallback(self, translate_text):
+        # GIVEN:
+        df = translation_lambda.pd.DataFrame({"ID": [0, 1], "review": ["cześć", "pa"]})
+        translate_text.side_effect = [
+            {"SourceLanguageCode": "pl", "TranslatedText": "hello bye"},
+            {"SourceLanguageCode": "pl", "TranslatedText": "hello"},
+            Exception("Test"),
+        ]
+        # WHEN:
+        translated, translation_errors = translation_lambda.translate_dataframe(df)
+        # THEN:
+        self.assertEqual(translate_text.call_count, 3)
+        self.assertListEqual(
+            translated,
+            [{"ID": 0, "original_review_language": "pl", "review_translation": "hello"}],
+        )
+        self.assertListEqual(
+            list(translation_errors),
+            [{"ID": 1, "original_text": "pa", "error_message": "Test"}],
+        )
+
+
+    @mock.patch("translation_lambda.TRANSLATION_MAX_WORKERS", 4)
+    def test_translate_dataframe_concurrent_keeps_row_order(self):
+        # GIVEN:
+        df = translation_lambda.pd.DataFrame(
+            {"ID": list(range(20)), "review": [f"opinia {i}" for i in range(20)]}
+        )
+        client = FakeTranslateClient(latency=0.01)
+        # WHEN:
+        with mock.patch("translation_lambda.boto_translation_client", client):
+            translated, translation_errors = translation_lambda.translate_dataframe(df)
+        # THEN:
+        self.assertEqual(client.calls, 20)
+        self.assertListEqual([row["ID"] for row in translated], list(range(20)))
+        self.assertEqual(translated[3]["review_translation"], "OPINIA 3")
+        self.assertEqual(len(translation_errors), 0)
+
+
+    def test_translate_dataframe_deduplicates_and_caches(self):
+        # GIVEN:
+        df = translation_lambda.pd.DataFrame(
+            {"ID": [0, 1, 2, 3], "review": ["cześć", "pa", "cześć", None]}
+        )
+        client = FakeTranslateClient()
+        cache = TranslationCache(LRUCache(10000))
+        cache.put("pa", "auto", "en", ("pl", "bye"))
+        # WHEN:
+        with mock.patch("translation_lambda.boto_translation_client", client), \
+                mock.patch("translation_lambda.translation_cache", cache), \
+                mock.patch("translation_lambda.SOURCE_LANGUAGE_CODE", "auto"), \
+                mock.patch("translation_lambda.TARGET_LANGUAGE_CODE", "en"):
+            translated, translation_errors = translation_lambda.translate_dataframe(df)
+        # THEN:
+        self.assertEqual(client.calls, 2)
+        self.assertListEqual(
+            translated,
+            [
+                {"ID": 0, "original_review_language": "pl", "review_translation": "CZEŚĆ"},
+                {"ID": 1, "original_review_language": "pl", "review_translation": "bye"},
+                {"ID": 2, "original_review_language": "pl", "review_translation": "CZEŚĆ"},
+            ],
+        )
+        self.assertListEqual([error["ID"] for error in translation_errors], [3])
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "duplicates": 1})
+
+
+    @mock.patch("translation_lambda.TRANSLATION_COLUMNAR", True)
+    def test_translate_dataframe_columnar(self):
+        # GIVEN:
+        df = translation_lambda.pd.DataFrame(
+            {"ID": [0, 1, 2, 3, 4], "review": ["cześć", None, "pa", " ", "cześć"]}
+        )
+        client = FakeTranslateClient()
+        # WHEN:
+        with mock.patch("translation_lambda.boto_translation_client", client):
+            translated, translation_errors = translation_lambda.translate_dataframe(df)
+        # THEN:
+        self.assertEqual(client.calls, 2)
+        self.assertListEqual(
+            translated.to_dict("records"),
+            [
+                {"ID": 0, "original_review_language": "pl", "review_translation": "CZEŚĆ"},
+                {"ID": 2, "original_review_language": "pl", "review_translation": "PA"},
+                {"ID": 4, "original_review_language": "pl", "review_translation": "CZEŚĆ"},
+            ],
+        )
+        self.assertListEqual(translation_errors["ID"].tolist(), [1, 3])
+
+
+    @mock.patch("translation_lambda.TRANSLATION_CHECKPOINT_ROWS", 2)
+    @mock.patch("translation_lambda.TRANSLATION_CHECKPOINT_MARGIN_MS", 5000)
+    @mock.patch("translation_lambda.DESTINATION_BUCKET_NAME", "destination_bucket")
+    @mock.patch("translation_lambda.DESTINATION_LOCATION_PREFIX", "destination_key")
+    @mock.patch("translation_lambda.ERROR_BUCKET_NAME", "error_bucket")
+    @mock.patch("translation_lambda.ERROR_LOCATION_PREFIX", "error_key")
+    def test_translate_checkpointed_resumes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # GIVEN:
+            source = translation_lambda.pd.DataFrame(
+                {"ID": [0, 1, 2, 3, 4], "review": ["a", "b", None, "d", "e"]}
+            )
+            record = {"bucket": "source_bucket", "key": "data/reviews.parquet.gzip"}
+            checkpoints = os.path.join(directory, "checkpoints")
+            os.makedirs(os.path.join(checkpoints, "reviews"))
+            client = FakeTranslateClient()
+            context = mock.Mock()
+            context.get_remaining_time_in_millis.side_effect = [60000, 60000, 1000]
+            # WHEN:
+            with mock.patch("translation_lambda.read_source", return_value=source), \
+                    mock.patch("translation_lambda.TRANSLATION_CHECKPOINT_URI", checkpoints), \
+                    mock.patch("translation_lambda.destination_path",
+                               lambda name: os.path.join(directory, "translated.parquet")), \
+                    mock.patch("translation_lambda.error_path",
+                               lambda name: os.path.join(directory, "errors.parquet")), \
+                    mock.patch("translation_lambda.boto_translation_client", client):
+                with self.assertRaises(translation_lambda.CheckpointTimeout):
+                    translation_lambda.translate(record, context)
+                calls_before_timeout = client.calls
+                context.get_remaining_time_in_millis.side_effect = None
+                context.get_remaining_time_in_millis.return_value = 60000
+                response = translation_lambda.lambda_handler([record], context)[0]
+            # THEN:
+            self.assertEqual(calls_before_timeout, 4)
+            self.assertEqual(client.calls, 5)
+            translated = translation_lambda.pd.read_parquet(
+                os.path.join(directory, "translated.parquet")
+            )
+            errors = translation_lambda.pd.read_parquet(
+                os.path.join(directory, "errors.parquet")
+            )
+            self.assertListEqual(translated["ID"].tolist(), [0, 1, 3, 4])
+            self.assertListEqual(errors["ID"].tolist(), [2])
+            self.assertEqual(response["translation_status"], "Errors occured")
+            self.assertEqual(response["writing_status"], "OK")
+            self.assertFalse(os.path.exists(os.path.join(checkpoints, "reviews")))
+
+
+    @mock.patch("translation_lambda.TRANSLATION_SKIP_UNCHANGED", True)
+    @mock.patch("translation_lambda.pd.DataFrame.to_parquet")
+    @mock.patch("translation_lambda.DESTINATION_BUCKET_NAME", "destination_bucket")
+    @mock.patch("translation_lambda.DESTINATION_LOCATION_PREFIX", "destination_key")
+    def test_translate_skips_unchanged_source(self, to_parquet):
+        with tempfile.TemporaryDirectory() as directory:
+            # GIVEN:
+            source = translation_lambda.pd.DataFrame({"ID": [0], "review": ["a"]})
+            record = {"bucket": "source_bucket", "key": "data/reviews.parquet.gzip"}
+            client = FakeTranslateClient()
+            with mock.patch("translation_lambda.read_source", return_value=source) as read_source, \
+                    mock.patch("translation_lambda.TRANSLATION_PROCESSED_INDEX_URI", directory), \
+                    mock.patch("translation_lambda.boto_translation_client", client), \
+                    mock.patch("idempotency.source_version", return_value="etag-1") as source_version:
+                # WHEN:
+                first = translation_lambda.translate(record)
+                second = translation_lambda.translate(record)
+                source_version.return_value = "etag-2"
+                third = translation_lambda.translate(record)
+            # THEN:
+            self.assertNotIn("skipped", first)
+            self.assertDictEqual(second, dict(first, skipped=True))
+            self.assertNotIn("skipped", third)
+            self.assertEqual(read_source.call_count, 2)
+            self.assertEqual(client.calls, 2)
+
+    @mock.patch("translation_lambda.TRANSLATION_SKIP_UNCHANGED", True)
+    @mock.patch("translation_lambda.pd.DataFrame.to_parquet")
+    @mock.patch("translation_lambda.DESTINATION_BUCKET_NAME", "destination_bucket")
+    @mock.patch("translation_lambda.DESTINATION_LOCATION_PREFIX", "destination_key")
+    def test_translate_retranslates_when_filters_change(self, to_parquet):
+        with tempfile.TemporaryDirectory() as directory:
+            # GIVEN:
+            source = translation_lambda.pd.DataFrame({"ID": [0], "review": ["a"]})
+            record = {"bucket": "source_bucket", "key": "data/reviews.parquet.gzip"}
+            with mock.patch("translation_lambda.read_source", return_value=source) as read_source, \
+                    mock.patch("translation_lambda.TRANSLATION_PROCESSED_INDEX_URI", directory), \
+                    mock.patch("translation_lambda.boto_translation_client", FakeTranslateClient()), \
+                    mock.patch("idempotency.source_version", return_value="etag-1"):
+                first = translation_lambda.translate(record)
+                # WHEN:
+                with mock.patch("translation_lambda.TRANSLATION_SKIP_EMPTY_REVIEWS", True):
+                    second = translation_lambda.translate(record)
+                with mock.patch("translation_lambda.TRANSLATION_DELTA", True):
+                    third = translation_lambda.translate(record)
+            # THEN:
+            self.assertNotIn("skipped", first)
+            self.assertNotIn("skipped", second)
+            self.assertNotIn("skipped", third)
+            self.assertEqual(read_source.call_count, 3)
+
+
+    @mock.patch("translation_lambda.TRANSLATION_DELTA", True)
+    def test_translate_delta_reuses_unchanged_rows(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # GIVEN:
+            first_source = translation_lambda.pd.DataFrame(
+                {"ID": [0, 1, 2], "review": ["a", "b", "c"]}
+            )
+            second_source = translation_lambda.pd.DataFrame(
+                {"ID": [0, 1, 2, 3], "review": ["a", "bb", "c", "d"]}
+            )
+            record = {"bucket": "source_bucket", "key": "data/reviews.parquet.gzip"}
+            destination = os.path.join(directory, "translated.parquet")
+            client = FakeTranslateClient()
+            with mock.patch("translation_lambda.destination_path", lambda name: destination), \
+                    mock.patch("translation_lambda.error_path",
+                               lambda name: os.path.join(directory, "errors.parquet")), \
+                    mock.patch("translation_lambda.boto_translation_client", client):
+                with mock.patch("translation_lambda.read_source", return_value=first_source):
+                    first = translation_lambda.translate(record)
+                # WHEN:
+                with mock.patch("translation_lambda.read_source", return_value=second_source):
+                    second = translation_lambda.translate(record)
+            # THEN:
+            self.assertDictEqual(first["delta"], {"reused_rows": 0, "translated_rows": 3})
+            self.assertDictEqual(second["delta"], {"reused_rows": 2, "translated_rows": 2})
+            self.assertEqual(client.calls, 5)
+            translated = translation_lambda.pd.read_parquet(destination)
+            self.assertListEqual(translated["ID"].tolist(), [0, 1, 2, 3])
+            self.assertListEqual(
+                translated["review_translation"].tolist(), ["A", "BB", "C", "D"]
+            )
+
+    @mock.patch("translation_lambda.TRANSLATION_DELTA", True)
+    def test_translate_delta_hashes_rows_sharing_an_id(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # GIVEN:
+            source = translation_lambda.pd.DataFrame(
+                {"ID": [1, 1, 2, 3], "review": ["a", "b", "c", None]}
+            )
+            record = {"bucket": "source_bucket", "key": "data/reviews.parquet.gzip"}
+            destination = os.path.join(directory, "translated.parquet")
+            errors = os.path.join(directory, "errors.parquet")
+            client = FakeTranslateClient()
+            with mock.patch("translation_lambda.destination_path", lambda name: destination), \
+                    mock.patch("translation_lambda.error_path", lambda name: errors), \
+                    mock.patch("translation_lambda.boto_translation_client", client), \
+                    mock.patch("translation_lambda.read_source", return_value=source):
+                first = translation_lambda.translate(record)
+                # WHEN:
+                second = translation_lambda.translate(record)
+            # THEN:
+            self.assertDictEqual(first["delta"], {"reused_rows": 0, "translated_rows": 4})
+            self.assertDictEqual(second["delta"], {"reused_rows": 3, "translated_rows": 1})
+            translated = translation_lambda.pd.read_parquet(destination)
+            self.assertListEqual(translated["review_translation"].tolist(), ["A", "B", "C"])
+            self.assertListEqual(
+                translated["review_hash"].tolist(),
+                translation_lambda.review_hashes(source["review"][:3]).tolist(),
+            )
+            self.assertListEqual(translation_lambda.pd.read_parquet(errors)["ID"].tolist(), [3])
+
+
+    @mock.patch("translation_lambda.TRANSLATION_SEGMENT_MAX_BYTES", 30)
+    def test_translate_row_segments_oversized_review(self):
+        # GIVEN:
+        row = {"ID": 0, "review": "Pierwsze zdanie recenzji. Drugie zdanie recenzji.\n\nTrzecie."}
+        client = FakeTranslateClient(source_language="pl")
+        # WHEN:
+        with mock.patch("translation_lambda.boto_translation_client", client):
+            response = translation_lambda.translate_row(row)
+        # THEN:
+        self.assertDictEqual(
+            response,
+            {
+                "ID": 0,
+                "original_review_language": "pl",
+                "review_translation": "PIERWSZE ZDANIE RECENZJI. DRUGIE ZDANIE RECENZJI.\n\nTRZECIE.",
+            },
+        )
+        self.assertEqual(client.calls, 3)
+
+
+    @mock.patch("translation_lambda.TRANSLATION_LANGUAGE_ROUTING", True)
+    @mock.patch("translation_lambda.TRANSLATION_BATCH_MAX_BYTES", 1000)
+    @mock.patch("translation_lambda.SOURCE_LANGUAGE_CODE", "auto")
+    @mock.patch("translation_lambda.TARGET_LANGUAGE_CODE", "en")
+    def test_translate_dataframe_routes_by_language(self):
+        # GIVEN:
+        df = translation_lambda.pd.DataFrame(
+            {"ID": [0, 1, 2, 3, 4], "review": ["hello", "cześć", "hallo", "???", "dzień dobry"]}
+        )
+        languages = {"hello": "en", "cześć": "pl", "hallo": "de", "dzień dobry": "pl"}
+        detector = mock.Mock()
+        detector.detect.side_effect = languages.get
+        client = FakeTranslateClient(source_language="es")
+        translate_text = mock.Mock(side_effect=client.translate_text)
+        # WHEN:
+        with mock.patch("translation_lambda.language_detector", detector), \
+                mock.patch("translation_lambda.boto_translation_client.translate_text", translate_text):
+            translated, errors = translation_lambda.translate_dataframe(df)
+        # THEN:
+        self.assertListEqual(
+            [call.kwargs["SourceLanguageCode"] for call in translate_text.call_args_list],
+            ["pl", "de", "auto"],
+        )
+        self.assertListEqual(
+            translated,
+            [
+                {"ID": 0, "original_review_language": "en", "review_translation": "hello"},
+                {"ID": 1, "original_review_language": "pl", "review_translation": "CZEŚĆ"},
+                {"ID": 2, "original_review_language": "de", "review_translation": "HALLO"},
+                {"ID": 3, "original_review_language": "es", "review_translation": "???"},
+                {"ID": 4, "original_review_language": "pl", "review_translation": "DZIEŃ DOBRY"},
+            ],
+        )
+        self.assertEqual(len(errors), 0)
+
+
+    @mock.patch("translation_lambda.TRANSLATION_STREAM_BATCH_SIZE", 2)
+    @mock.patch("translation_lambda.TRANSLATION_DELTA", True)
+    @mock.patch("translation_lambda.translate_streaming")
+    @mock.patch("translation_lambda.translate_targets", return_value={"languages": {}})
+    def test_target_languages_warn_about_ignored_modes(self, translate_targets, translate_streaming):
+        # GIVEN:
+        record = {
+            "bucket": "source_bucket",
+            "key": "data/reviews.parquet.gzip",
+            "target_languages": ["de", "fr"],
+        }
+        # WHEN:
+        with self.assertLogs(translation_lambda.logger, "WARNING") as logs:
+            response = translation_lambda.translate(record)
+        # THEN:
+        self.assertDictEqual(response, {"languages": {}})
+        translate_streaming.assert_not_called()
+        self.assertIn(
+            "TRANSLATION_STREAM_BATCH_SIZE, TRANSLATION_DELTA not applied to reviews",
+            logs.output[0],
+        )
+
+    @mock.patch("translation_lambda.TRANSLATION_SOURCE_FILTERS", [["ID", ">=", 1]])
+    @mock.patch("translation_lambda.TRANSLATION_SKIP_EMPTY_REVIEWS", True)
+    def test_source_filters(self):
+        # WHEN:
+        filters = translation_lambda.source_filters([[["ID", "<", 3]], [["ID", ">", 7]]])
+        # THEN:
+        self.assertListEqual(
+            filters,
+            [
+                [("ID", ">=", 1), ("ID", "<", 3), ("review", "!=", "")],
+                [("ID", ">=", 1), ("ID", ">", 7), ("review", "!=", "")],
+            ],
+        )
+
+    def test_matching_row_groups(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # GIVEN:
+            path = os.path.join(directory, "reviews.parquet")
+            translation_lambda.pd.DataFrame(
+                {"ID": list(range(6)), "review": list("abcdef")}
+            ).to_parquet(path, row_group_size=2)
+            metadata = pq.ParquetFile(path).metadata
+            # WHEN:
+            row_groups = translation_lambda.matching_row_groups(
+                metadata, [[("ID", ">=", 2), ("ID", "<", 4)], [("ID", "==", 5)]]
+            )
+            # THEN:
+            self.assertListEqual(row_groups, [1, 2])
+
+
+    @mock.patch("translation_lambda.TRANSLATION_PARALLEL_WRITE", True)
+    def test_write_results_parallel_error_write_fails(self):
+        # GIVEN:
+        def write_parquet_pipelined(rows, path):
+            if "error" in path:
+                raise Exception("Test")
+
+        errors = [{"ID": 1, "original_text": None, "error_message": "Test"}]
+        # WHEN:
+        with mock.patch("translation_lambda.write_parquet_pipelined", write_parquet_pipelined), \
+                mock.patch("translation_lambda.ERROR_BUCKET_NAME", "error_bucket"):
+            response = translation_lambda.write_results("reviews", [{"ID": 0}], errors)
+        # THEN:
+        self.assertEqual(response["translation_status"], "OK")
+        self.assertEqual(response["writing_status"], "Errors occured")
+        self.assertEqual(response["writing_error_messages"], "Test")
+
+
+    @mock.patch("translation_lambda.PARQUET_COMPRESSION", "zstd")
+    @mock.patch("translation_lambda.PARQUET_COMPRESSION_LEVEL", "3")
+    @mock.patch("translation_lambda.PARQUET_USE_DICTIONARY", "false")
+    @mock.patch("translation_lambda.PARQUET_ROW_GROUP_SIZE", 1000)
+    @mock.patch("translation_lambda.DESTINATION_BUCKET_NAME", "destination_bucket")
+    @mock.patch("translation_lambda.DESTINATION_LOCATION_PREFIX", "destination_key")
+    def test_parquet_write_options(self):
+        self.assertDictEqual(
+            translation_lambda.parquet_write_options(),
+            {
+                "compression": "zstd",
+                "compression_level": 3,
+                "use_dictionary": False,
+                "row_group_size": 1000,
+            },
+        )
+        self.assertEqual(
+            translation_lambda.destination_path("file_name"),
+            "s3://destination_bucket/destination_key/file_name.parquet.zstd",
+        )
+
+
+    @parameterized.expand([["serial", 1], ["threads", 4]])
+    @mock.patch("translation_lambda.METRICS_ENABLED", True)
+    @mock.patch("translation_lambda.pd.DataFrame.to_parquet")
+    @mock.patch(
+        "translation_lambda.pd.read_parquet",
+        return_value=translation_lambda.pd.DataFrame(
+            {"ID": [0, 1], "review": ["cześć", "pa"]}
+        ),
+    )
+    def test_translate_metrics(self, name, max_workers, read_parquet, to_parquet):
+        # GIVEN:
+        record = {"bucket": "source_bucket", "key": "data/reviews.parquet.gzip"}
+        sink = mock.Mock()
+        translation_lambda.metrics.register_sink(sink)
+        self.addCleanup(translation_lambda.metrics.unregister_sink, sink)
+        # WHEN:
+        with mock.patch("translation_lambda.boto_translation_client", FakeTranslateClient()), \
+                mock.patch("translation_lambda.TRANSLATION_MAX_WORKERS", max_workers):
+            response = translation_lambda.translate(record)
+        # THEN:
+        self.assertDictEqual(
+            response["metrics"]["counters"],
+            {"rows": 2, "translate_calls": 2, "request_bytes": 9},
+        )
+        self.assertEqual(
+            set(response["metrics"]["timings"]), {"read", "translate", "write"}
+        )
+        sink.assert_called_once()
+        self.assertEqual(sink.call_args[0][0]["key"], "data/reviews.parquet.gzip")
+
+    def test_null_metrics_outside_translate(self):
+        self.assertIs(translation_lambda.metrics.current(), translation_lambda.metrics.NULL_METRICS)
+        self.assertIsNone(translation_lambda.metrics.current().as_dict())
+
+
+class TestLocalStorageTranslation(unittest.TestCase):
+    """End-to-end translations against a LocalStorage in a temporary directory."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.client = FakeTranslateClient()
+        for name, value in [
+            ("DESTINATION_BUCKET_NAME", "destination_bucket"),
+            ("DESTINATION_LOCATION_PREFIX", "destination_key"),
+            ("ERROR_BUCKET_NAME", "error_bucket"),
+            ("ERROR_LOCATION_PREFIX", "error_key"),
+            ("storage", LocalStorage(self.directory)),
+            ("boto_translation_client", self.client),
+        ]:
+            patcher = mock.patch.object(translation_lambda, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_source(self, data, file_name="reviews", **kwargs):
+        """Write data as a source Parquet file and return its record."""
+        key = f"data/{file_name}.parquet.gzip"
+        path = os.path.join(self.directory, "source_bucket", key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        translation_lambda.pd.DataFrame(data).to_parquet(path, **kwargs)
+        return {"bucket": "source_bucket", "key": key}
+
+    def output_path(self, file_name="reviews", errors=False):
+        location = "error_bucket/error_key" if errors else "destination_bucket/destination_key"
+        return os.path.join(self.directory, location, f"{file_name}.parquet.gzip")
+
+    def read_output(self, file_name="reviews", errors=False):
+        return translation_lambda.pd.read_parquet(self.output_path(file_name, errors))
+
+    @mock.patch("translation_lambda.TRANSLATION_STREAM_BATCH_SIZE", 2)
+    def test_translate_streaming(self):
+        # GIVEN:
+        record = self.write_source({"ID": [0, 1, 2, 3, 4], "review": ["a", "b", None, "d", "e"]})
+        # WHEN:
+        response = translation_lambda.translate(record)
+        # THEN:
+        translated = self.read_output()
+        self.assertListEqual(translated["ID"].tolist(), [0, 1, 3, 4])
+        self.assertListEqual(translated["review_translation"].tolist(), ["A", "B", "D", "E"])
+        self.assertListEqual(self.read_output(errors=True)["ID"].tolist(), [2])
+        self.assertEqual(response["translation_status"], "Errors occured")
+        self.assertEqual(response["writing_status"], "OK")
+        self.assertEqual(
+            response["translation_error_messages"]["error_file"],
+            "s3://error_bucket/error_key/reviews.parquet.gzip",
+        )
+
+    @mock.patch("translation_lambda.TRANSLATION_STREAM_BATCH_SIZE", 2)
+    def test_translate_streaming_failure_keeps_previous_output(self):
+        # GIVEN:
+        record = self.write_source({"ID": [0, 1, 2, 3], "review": ["a", "b", "c", "d"]})
+        os.makedirs(os.path.dirname(self.output_path()))
+        with open(self.output_path(), "wb") as f:
+            f.write(b"previous output")
+        translate_dataframe = mock.Mock(side_effect=[([], []), Exception("Translate is down")])
+        # WHEN:
+        with mock.patch("translation_lambda.translate_dataframe", translate_dataframe):
+            response = translation_lambda.translate(record)
+        # THEN:
+        self.assertEqual(response["translation_status"], "Errors occured")
+        self.assertEqual(response["writing_status"], "Errors occured")
+        self.assertEqual(response["writing_error_messages"], "Translate is down")
+        self.assertListEqual(
+            os.listdir(os.path.dirname(self.output_path())), ["reviews.parquet.gzip"]
+        )
+        with open(self.output_path(), "rb") as f:
+            self.assertEqual(f.read(), b"previous output")
+
+    @mock.patch("translation_lambda.TRANSLATION_BATCH_MAX_BYTES", 1000)
+    @mock.patch("translation_lambda.SOURCE_LANGUAGE_CODE", "pl")
+    def test_translate_multiple_target_languages(self):
+        # GIVEN:
+        record = dict(
+            self.write_source({"ID": [0, 1, 2, 3], "review": ["a", "b", "a", None]}),
+            target_languages=["de", "fr"],
+        )
+        translate_text = mock.Mock(side_effect=self.client.translate_text)
+        # WHEN:
+        with mock.patch.object(self.client, "translate_text", translate_text):
+            response = translation_lambda.translate(record)
+        # THEN:
+        self.assertListEqual(
+            sorted(
+                (call.kwargs["TargetLanguageCode"], call.kwargs["Text"])
+                for call in translate_text.call_args_list
+                if isinstance(call.kwargs["Text"], str)
+            ),
+            [("de", "a\n|||\nb"), ("fr", "a\n|||\nb")],
+        )
+        for language in ("de", "fr"):
+            translated = self.read_output(f"reviews_{language}")
+            self.assertListEqual(translated["ID"].tolist(), [0, 1, 2])
+            self.assertListEqual(translated["review_translation"].tolist(), ["A", "B", "A"])
+            self.assertEqual(
+                response["languages"][language]["translation_error_messages"]["error_file"],
+                f"s3://error_bucket/error_key/reviews_{language}.parquet.gzip",
+            )
+        self.assertEqual(response["translation_status"], "Errors occured")
+        self.assertEqual(response["writing_status"], "OK")
+
+    @parameterized.expand([["in_memory", 0], ["streaming", 2]])
+    @mock.patch("translation_lambda.TRANSLATION_SOURCE_FILTERS", [["ID", "<", 4]])
+    @mock.patch("translation_lambda.TRANSLATION_SKIP_EMPTY_REVIEWS", True)
+    def test_translate_pushes_down_filters(self, name, stream_batch_size):
+        # GIVEN:
+        record = self.write_source(
+            {
+                "ID": [0, 1, 2, 3, 4, 5],
+                "review": ["a", "", None, "d", "e", "f"],
+                "metadata": ["x"] * 6,
+            },
+            row_group_size=2,
+        )
+        # WHEN:
+        with mock.patch("translation_lambda.TRANSLATION_STREAM_BATCH_SIZE", stream_batch_size):
+            response = translation_lambda.translate(record)
+        # THEN:
+        translated = self.read_output()
+        self.assertListEqual(translated["ID"].tolist(), [0, 3])
+        self.assertListEqual(translated["review_translation"].tolist(), ["A", "D"])
+        self.assertEqual(response["translation_status"], "OK")
+
+    @mock.patch("translation_lambda.TRANSLATION_CHECKPOINT_ROWS", 2)
+    @mock.patch("translation_lambda.TRANSLATION_CHECKPOINT_MARGIN_MS", 5000)
+    def test_checkpoint_timeout_keeps_earlier_records_of_the_event(self):
+        # GIVEN:
+        event = [
+            self.write_source({"ID": [0, 1], "review": ["a", "b"]}, file_name="first"),
+            self.write_source({"ID": [0, 1], "review": ["c", "d"]}, file_name="second"),
+        ]
+        context = mock.Mock()
+        context.get_remaining_time_in_millis.side_effect = [60000, 1000]
+        with self.assertRaises(translation_lambda.CheckpointTimeout):
+            translation_lambda.lambda_handler(event, context)
+        calls_before_timeout = self.client.calls
+        # WHEN:
+        context.get_remaining_time_in_millis.side_effect = None
+        context.get_remaining_time_in_millis.return_value = 60000
+        response = translation_lambda.lambda_handler(event, context)
+        # THEN:
+        self.assertEqual(calls_before_timeout, 2)
+        self.assertEqual(self.client.calls, 4)
+        self.assertListEqual(
+            [result["translation_status"] for result in response], ["OK", "OK"]
+        )
+        self.assertListEqual(self.read_output("first")["review_translation"].tolist(), ["A", "B"])
+        self.assertListEqual(self.read_output("second")["review_translation"].tolist(), ["C", "D"])
+        self.assertFalse(
+            os.path.exists(
+                os.path.join(self.directory, "destination_bucket/destination_key/_checkpoints/first")
+            )
+        )
+
+    @mock.patch("translation_lambda.TRANSLATION_SHARD_ROWS", 3)
+    def test_sharded_translation(self):
+        # GIVEN:
+        event = [
+            self.write_source(
+                {"ID": [0, 1, 2, 3, 4, 5], "review": ["a", "b", None, "d", "e", None]},
+                row_group_size=2,
+            )
+        ]
+        # WHEN:
+        plans = translation_lambda.plan_handler(event, None)
+        shard_results = [
+            translation_lambda.lambda_handler([shard], None)[0]
+            for shard in reversed(plans[0]["shards"])
+        ]
+        response = translation_lambda.merge_handler(plans, None)
+        # THEN:
+        self.assertListEqual(
+            [shard["shard"]["row_groups"] for shard in plans[0]["shards"]],
+            [[0, 2], [2, 3]],
+        )
+        self.assertListEqual(
+            [result["writing_status"] for result in shard_results], ["OK", "OK"]
+        )
+        translated = self.read_output()
+        self.assertListEqual(translated["ID"].tolist(), [0, 1, 3, 4])
+        self.assertListEqual(translated["review_translation"].tolist(), ["A", "B", "D", "E"])
+        self.assertListEqual(self.read_output(errors=True)["ID"].tolist(), [2, 5])
+        self.assertEqual(response[0]["translation_error_messages"]["error_count"], 2)
+        self.assertFalse(
+            os.path.exists(
+                os.path.join(self.directory, "destination_bucket/destination_key/_shards/reviews")
+            )
+        )
+
+    @mock.patch("translation_lambda.TRANSLATION_SHARD_ROWS", 3)
+    def test_merge_with_missing_part_keeps_previous_output(self):
+        # GIVEN:
+        event = [
+            self.write_source(
+                {"ID": [0, 1, 2, 3, 4, 5], "review": ["a", "b", "c", "d", "e", "f"]},
+                row_group_size=2,
+            )
+        ]
+        translation_lambda.translate(event[0])
+        plans = translation_lambda.plan_handler(event, None)
+        translation_lambda.lambda_handler([plans[0]["shards"][0]], None)
+        # WHEN:
+        response = translation_lambda.merge_handler(plans, None)
+        # THEN:
+        self.assertEqual(response[0]["translation_status"], "Errors occured")
+        self.assertEqual(response[0]["writing_status"], "Errors occured")
+        self.assertIn("Missing shard parts", response[0]["writing_error_messages"])
+        self.assertListEqual(self.read_output()["ID"].tolist(), [0, 1, 2, 3, 4, 5])
+
+    @mock.patch("translation_lambda.TRANSLATION_ARROW", True)
+    def test_translate_arrow(self):
+        # GIVEN:
+        record = self.write_source(
+            {
+                "ID": [0, 1, 2, 3, 4],
+                "review": ["a", "b", None, "a", " "],
+                "rating": [5, 4, 3, 2, 1],
+            }
+        )
+        # WHEN:
+        response = translation_lambda.translate(record)
+        # THEN:
+        translated = self.read_output()
+        self.assertEqual(self.client.calls, 2)
+        self.assertListEqual(translated["ID"].tolist(), [0, 1, 3])
+        self.assertListEqual(translated["review_translation"].tolist(), ["A", "B", "A"])
+        self.assertListEqual(self.read_output(errors=True)["ID"].tolist(), [2, 4])
+        self.assertEqual(response["translation_status"], "Errors occured")
+        self.assertDictEqual(
+            response["translation_error_messages"]["error_categories"],
+            {"Review text is missing or empty": 2},
+        )
+
+    @mock.patch("translation_lambda.TRANSLATION_AGGREGATE_RECORDS", True)
+    @mock.patch("translation_lambda.TRANSLATION_BATCH_MAX_BYTES", 1000)
+    @mock.patch("translation_lambda.SOURCE_LANGUAGE_CODE", "pl")
+    def test_lambda_handler_aggregates_records(self):
+        # GIVEN:
+        event = [
+            self.write_source({"ID": [10, 11], "review": ["a", "b"]}, "first"),
+            {"bucket": "source_bucket", "key": "data/missing.parquet.gzip"},
+            self.write_source({"ID": [10, 20, 21], "review": ["b", "c", None]}, "second"),
+        ]
+        translate_text = mock.Mock(side_effect=self.client.translate_text)
+        # WHEN:
+        with mock.patch.object(self.client, "translate_text", translate_text):
+            response = translation_lambda.lambda_handler(event, None)
+        # THEN:
+        translate_text.assert_any_call(
+            Text="a\n|||\nb\n|||\nc",
+            SourceLanguageCode=translation_lambda.SOURCE_LANGUAGE_CODE,
+            TargetLanguageCode=translation_lambda.TARGET_LANGUAGE_CODE,
+        )
+        self.assertEqual(translate_text.call_count, 2)
+        first = self.read_output("first")
+        second = self.read_output("second")
+        self.assertListEqual(first["ID"].tolist(), [10, 11])
+        self.assertListEqual(first["review_translation"].tolist(), ["A", "B"])
+        self.assertListEqual(second["ID"].tolist(), [10, 20])
+        self.assertListEqual(second["review_translation"].tolist(), ["B", "C"])
+        self.assertListEqual(self.read_output("second", errors=True)["ID"].tolist(), [21])
+        self.assertEqual(response[0]["translation_status"], "OK")
+        self.assertIn("data_reading_error", response[1])
+        self.assertEqual(response[2]["translation_error_messages"]["error_count"], 1)
+
+    @mock.patch("translation_lambda.TRANSLATION_AGGREGATE_RECORDS", True)
+    @mock.patch("translation_lambda.METRICS_ENABLED", True)
+    def test_aggregated_results_carry_metrics_and_cache_counts(self):
+        # GIVEN:
+        event = [
+            self.write_source({"ID": [0, 1], "review": ["a", "b"]}, "first"),
+            self.write_source({"ID": [0], "review": ["a"]}, "second"),
+        ]
+        cache = TranslationCache(LRUCache(10000))
+        # WHEN:
+        with mock.patch("translation_lambda.translation_cache", cache):
+            response = translation_lambda.lambda_handler(event, None)
+        # THEN:
+        for result in response:
+            self.assertEqual(result["metrics"]["counters"]["rows"], 3)
+            self.assertDictEqual(result["cache"], {"hits": 0, "misses": 2, "duplicates": 1})
+
+    @mock.patch("translation_lambda.TRANSLATION_ARROW", True)
+    def test_arrow_records_are_not_aggregated(self):
+        self.assertFalse(
+            translation_lambda.is_aggregatable({"bucket": "source_bucket", "key": "data/a.parquet"})
+        )
+
+    @mock.patch("translation_lambda.TRANSLATION_PARALLEL_WRITE", True)
+    @mock.patch("translation_lambda.PARQUET_ROW_GROUP_SIZE", 2)
+    def test_write_results_parallel(self):
+        # GIVEN:
+        translated = [
+            {"ID": index, "original_review_language": "pl", "review_translation": "HI"}
+            for index in range(5)
+        ]
+        errors = [{"ID": 5, "original_text": None, "error_message": "Test"}]
+        # WHEN:
+        response = translation_lambda.write_results("reviews", translated, errors)
+        # THEN:
+        output = pq.ParquetFile(self.output_path())
+        self.assertEqual(output.metadata.num_row_groups, 3)
+        self.assertListEqual(output.read().column("ID").to_pylist(), [0, 1, 2, 3, 4])
+        self.assertListEqual(self.read_output(errors=True)["ID"].tolist(), [5])
+        self.assertEqual(response["translation_status"], "Errors occured")
+        self.assertEqual(response["writing_status"], "OK")
+
+
 if __name__ == "__main__":
     unittest.main()
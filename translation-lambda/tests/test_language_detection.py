@@ -0,0 +1,32 @@
+import unittest
+
+from parameterized import parameterized
+
+from language_detection import StopwordLanguageDetector, create_detector
+
+
+class TestLanguageDetection(unittest.TestCase):
+    @parameterized.expand(
+        [
+            ("english", "This is a very good product and it works", "en"),
+            ("polish", "Produkt nie jest zły, ale był bardzo drogi", "pl"),
+            ("german", "Das ist nicht gut und ich bin sehr traurig", "de"),
+            ("too_short", "Super!", None),
+            ("not_text", None, None),
+        ]
+    )
+    def test_stopword_detector(self, name, text, expected_language):
+        self.assertEqual(StopwordLanguageDetector().detect(text), expected_language)
+
+    def test_create_detector(self):
+        self.assertIsInstance(create_detector("stopwords"), StopwordLanguageDetector)
+        self.assertIsInstance(
+            create_detector("language_detection:StopwordLanguageDetector"),
+            StopwordLanguageDetector,
+        )
+        with self.assertRaises(ValueError):
+            create_detector("unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
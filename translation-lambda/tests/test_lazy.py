@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from lazy import LazyModule, LazyObject
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+
+
+class TestLazy(unittest.TestCase):
+    def test_lazy_module_imports_on_first_use(self):
+        # GIVEN:
+        module = LazyModule("json")
+        # WHEN:
+        result = module.dumps([1])
+        # THEN:
+        self.assertEqual(result, "[1]")
+
+    def test_lazy_module_sees_patches_of_the_real_module(self):
+        # GIVEN:
+        module = LazyModule("json")
+        # WHEN:
+        with mock.patch("json.dumps", return_value="patched"):
+            result = module.dumps([1])
+        # THEN:
+        self.assertEqual(result, "patched")
+        self.assertEqual(module.dumps([1]), "[1]")
+
+    def test_lazy_object_is_created_once(self):
+        # GIVEN:
+        factory = mock.Mock(return_value=mock.Mock(value=42))
+        lazy = LazyObject(factory)
+        # WHEN:
+        values = [lazy.value, lazy.value]
+        # THEN:
+        self.assertEqual(values, [42, 42])
+        factory.assert_called_once_with()
+
+    def test_import_does_not_load_heavy_modules(self):
+        # GIVEN:
+        code = (
+            "import sys, translation_lambda; "
+            "print(sorted({'pandas', 'numpy', 'boto3'} & set(sys.modules)))"
+        )
+        # WHEN:
+        output = subprocess.check_output(
+            [sys.executable, "-c", code],
+            env=dict(os.environ, PYTHONPATH=SOURCE_DIR),
+            text=True,
+        )
+        # THEN:
+        self.assertEqual(output.strip(), "[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from parameterized import parameterized
+
+from segmentation import split_bytes, split_text, utf8_size
+
+
+class TestSegmentation(unittest.TestCase):
+    @parameterized.expand(
+        [
+            ("paragraphs", "Pierwszy akapit.\n\nDrugi akapit.\n\nTrzeci akapit.", 20),
+            ("sentences", "Jedno zdanie. Drugie zdanie! Trzecie zdanie? Czwarte.", 30),
+            ("words", "słowo " * 40, 25),
+            ("characters", "ż" * 50, 7),
+        ]
+    )
+    def test_split_text_round_trips_within_limit(self, name, text, max_bytes):
+        # WHEN:
+        segments = split_text(text, max_bytes)
+        # THEN:
+        self.assertEqual("".join(segment + separator for segment, separator in segments), text)
+        self.assertTrue(all(utf8_size(segment) <= max_bytes for segment, _ in segments))
+        self.assertGreater(len(segments), 1)
+
+    def test_split_text_prefers_coarse_boundaries(self):
+        # GIVEN:
+        text = "Ala ma kota. Kot ma Alę.\n\nDrugi akapit."
+        # WHEN:
+        segments = split_text(text, 30)
+        # THEN:
+        self.assertListEqual(
+            segments, [("Ala ma kota. Kot ma Alę.", "\n\n"), ("Drugi akapit.", "")]
+        )
+
+    def test_split_bytes_keeps_characters_whole(self):
+        self.assertListEqual(split_bytes("żółw", 3), ["ż", "ó", "łw"])
+
+
+if __name__ == "__main__":
+    unittest.main()
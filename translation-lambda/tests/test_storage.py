@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+import uuid
+from unittest import mock
+
+from storage import (
+    LocalStorage,
+    MemoryStorage,
+    PipelinedWriter,
+    S3Storage,
+    create_storage,
+)
+
+
+class TestStorage(unittest.TestCase):
+    def test_local_storage_maps_s3_urls_under_root(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # GIVEN:
+            storage = LocalStorage(directory)
+            # WHEN:
+            with storage.open("s3://bucket/prefix/file.json", "w") as f:
+                f.write("{}")
+            # THEN:
+            self.assertTrue(os.path.exists(os.path.join(directory, "bucket/prefix/file.json")))
+            self.assertTrue(storage.exists("s3://bucket/prefix/file.json"))
+            self.assertEqual(storage.info("s3://bucket/prefix/file.json")["size"], 2)
+            storage.remove("s3://bucket/prefix", recursive=True)
+            self.assertFalse(storage.exists("s3://bucket/prefix/file.json"))
+
+    def test_memory_storage_round_trip(self):
+        # GIVEN:
+        storage = MemoryStorage()
+        path = f"s3://bucket/{uuid.uuid4()}/data.bin"
+        # WHEN:
+        with storage.open(path, "wb") as f:
+            f.write(b"data")
+        # THEN:
+        self.assertEqual(storage.url(path), "memory://" + path[len("s3://"):])
+        with storage.open(path) as f:
+            self.assertEqual(f.read(), b"data")
+
+    def test_s3_storage_options_apply_to_s3_urls_only(self):
+        # GIVEN:
+        storage = S3Storage(block_size=8 * 2 ** 20, max_pool_connections=50)
+        # THEN:
+        self.assertDictEqual(
+            storage.pandas_options("s3://bucket/key"),
+            {
+                "storage_options": {
+                    "default_block_size": 8 * 2 ** 20,
+                    "config_kwargs": {"max_pool_connections": 50},
+                }
+            },
+        )
+        self.assertDictEqual(storage.pandas_options("/tmp/key"), {})
+        self.assertDictEqual(S3Storage().pandas_options("s3://bucket/key"), {})
+
+    def test_pipelined_writer_passes_chunks_in_order(self):
+        # GIVEN:
+        storage = MemoryStorage()
+        path = f"s3://bucket/{uuid.uuid4()}/data.bin"
+        # WHEN:
+        with storage.open(path, "wb") as target, PipelinedWriter(target, max_pending=2) as pipe:
+            for index in range(100):
+                pipe.write(b"%03d" % index)
+        # THEN:
+        with storage.open(path) as f:
+            self.assertEqual(f.read(), b"".join(b"%03d" % index for index in range(100)))
+
+    def test_pipelined_writer_raises_target_errors(self):
+        # GIVEN:
+        target = mock.Mock()
+        target.write.side_effect = OSError("Test")
+        pipe = PipelinedWriter(target)
+        # WHEN:
+        pipe.write(b"data")
+        # THEN:
+        with self.assertRaises(OSError):
+            pipe.close()
+
+    def test_create_storage(self):
+        self.assertIsInstance(create_storage("s3"), S3Storage)
+        self.assertIsInstance(create_storage("memory"), MemoryStorage)
+        with self.assertRaises(ValueError):
+            create_storage("ftp")
+
+
+if __name__ == "__main__":
+    unittest.main()
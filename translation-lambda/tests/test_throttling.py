@@ -0,0 +1,168 @@
+import json
+import os
+import unittest
+from unittest import mock
+
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+
+import translation_lambda
+from throttling import TokenBucket, call_with_throttling, is_throttling_error
+
+
+def throttling_error():
+    return ClientError(
+        {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}},
+        "TranslateText",
+    )
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestThrottling(unittest.TestCase):
+    def test_is_throttling_error(self):
+        self.assertTrue(is_throttling_error(throttling_error()))
+        self.assertTrue(is_throttling_error(Exception(str(throttling_error()))))
+        self.assertFalse(is_throttling_error(Exception("Test")))
+
+    def test_token_bucket_limits_rate(self):
+        # GIVEN:
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=1, clock=clock, sleep=clock.sleep)
+        # WHEN:
+        for _ in range(5):
+            bucket.acquire()
+        # THEN:
+        self.assertAlmostEqual(clock.now, 2.0)
+
+    def test_token_bucket_adapts_to_throttling(self):
+        # GIVEN:
+        bucket = TokenBucket(rate=8, min_rate=1, recovery_step=1)
+        # WHEN:
+        bucket.on_throttle()
+        bucket.on_throttle()
+        bucket.on_throttle()
+        bucket.on_throttle()
+        # THEN:
+        self.assertEqual(bucket.rate, 1)
+        bucket.on_success()
+        self.assertEqual(bucket.rate, 2)
+
+    def test_call_with_throttling_retries_throttles_only(self):
+        # GIVEN:
+        bucket = TokenBucket(rate=0)
+        function = mock.Mock(side_effect=[throttling_error(), {"TranslatedText": "hello"}])
+        # WHEN:
+        response = call_with_throttling(function, bucket, 3, sleep=mock.Mock(), Text="cześć")
+        # THEN:
+        self.assertEqual(response, {"TranslatedText": "hello"})
+        self.assertEqual(function.call_count, 2)
+
+        function = mock.Mock(side_effect=Exception("Test"))
+        with self.assertRaises(Exception):
+            call_with_throttling(function, bucket, 3, sleep=mock.Mock(), Text="cześć")
+        self.assertEqual(function.call_count, 1)
+
+    def test_call_with_throttling_slows_down_on_retried_responses(self):
+        # GIVEN:
+        bucket = TokenBucket(rate=8)
+        function = mock.Mock(return_value={"ResponseMetadata": {"RetryAttempts": 2}})
+        # WHEN:
+        call_with_throttling(function, bucket, 3, sleep=mock.Mock(), Text="cześć")
+        # THEN:
+        self.assertEqual(bucket.rate, 4)
+        self.assertEqual(function.call_count, 1)
+
+
+class ThrottlingTranslate:
+    """Answers the first ``throttles`` HTTP requests with ThrottlingException."""
+
+    def __init__(self, throttles):
+        self.throttles = throttles
+        self.requests = 0
+
+    def __call__(self, request, **kwargs):
+        self.requests += 1
+        if self.requests <= self.throttles:
+            status, body = 400, {"__type": "ThrottlingException", "message": "Rate exceeded"}
+        else:
+            status, body = 200, {
+                "TranslatedText": "hello",
+                "SourceLanguageCode": "pl",
+                "TargetLanguageCode": "en",
+            }
+        return AWSResponse(request.url, status, {}, FakeRaw(json.dumps(body).encode()))
+
+
+class FakeRaw:
+    def __init__(self, content):
+        self.content = content
+
+    def stream(self, **kwargs):
+        yield self.content
+
+
+@mock.patch.dict(
+    os.environ, {"AWS_ACCESS_KEY_ID": "test", "AWS_SECRET_ACCESS_KEY": "test"}
+)
+@mock.patch("botocore.endpoint.time.sleep", mock.Mock())
+class TestBotocoreRetries(unittest.TestCase):
+    def translate(self, throttles, max_attempts, rate):
+        with mock.patch.object(translation_lambda, "TRANSLATION_BOTO_CLIENT_MAX_ATTEMPTS", max_attempts), \
+                mock.patch.object(translation_lambda, "TRANSLATION_RATE_LIMIT", rate):
+            client = translation_lambda.create_translation_client()
+        server = ThrottlingTranslate(throttles)
+        client.meta.events.register("before-send.translate.TranslateText", server)
+        bucket = TokenBucket(rate)
+        response = call_with_throttling(
+            client.translate_text, bucket, 3, sleep=mock.Mock(),
+            Text="cześć", SourceLanguageCode="pl", TargetLanguageCode="en",
+        )
+        return response, bucket, server
+
+    def test_throttles_retried_by_botocore_slow_the_bucket_down(self):
+        # GIVEN:
+        throttles, max_attempts = 2, 3
+        # WHEN:
+        response, bucket, server = self.translate(throttles, max_attempts, rate=8)
+        # THEN:
+        self.assertEqual(response["TranslatedText"], "hello")
+        self.assertEqual(response["ResponseMetadata"]["RetryAttempts"], 2)
+        self.assertEqual(server.requests, 3)
+        self.assertEqual(bucket.rate, 4)
+
+    def test_throttles_past_max_attempts_are_retried_by_the_bucket(self):
+        # GIVEN: max_attempts counts the retries after the first request
+        throttles, max_attempts = 4, 3
+        # WHEN:
+        response, bucket, server = self.translate(throttles, max_attempts, rate=8)
+        # THEN:
+        self.assertEqual(response["TranslatedText"], "hello")
+        self.assertEqual(response["ResponseMetadata"]["RetryAttempts"], 0)
+        self.assertEqual(server.requests, 5)
+        self.assertEqual(bucket.rate, 4.5)
+
+    def test_adaptive_mode_without_rate_limit(self):
+        # GIVEN:
+        rate = 0
+        # WHEN:
+        with mock.patch.object(translation_lambda, "TRANSLATION_BOTO_CLIENT_MAX_ATTEMPTS", 4), \
+                mock.patch.object(translation_lambda, "TRANSLATION_RATE_LIMIT", rate):
+            client = translation_lambda.create_translation_client()
+        # THEN:
+        self.assertDictEqual(
+            client.meta.config.retries, {"total_max_attempts": 5, "mode": "adaptive"}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from storage import LocalStorage
+from translation_cache import LRUCache, SqliteStore, TranslationCache, cache_key
+
+
+class TestTranslationCache(unittest.TestCase):
+    def test_cache_key_depends_on_languages(self):
+        self.assertNotEqual(cache_key("cześć", "auto", "en"), cache_key("cześć", "auto", "de"))
+        self.assertEqual(cache_key("cześć", "auto", "en"), cache_key("cześć", "auto", "en"))
+
+    def test_lru_cache_evicts_least_recently_used(self):
+        # GIVEN:
+        cache = LRUCache(max_bytes=2 * (64 + 100 + 7))
+        # WHEN:
+        cache.put("a" * 64, ("pl", "hello"))
+        cache.put("b" * 64, ("pl", "hello"))
+        cache.get("a" * 64)
+        cache.put("c" * 64, ("pl", "hello"))
+        # THEN:
+        self.assertEqual(len(cache), 2)
+        self.assertIsNotNone(cache.get("a" * 64))
+        self.assertIsNone(cache.get("b" * 64))
+
+    def test_sqlite_store_persists_flushed_entries(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # GIVEN:
+            path = os.path.join(directory, "cache.sqlite")
+            store = SqliteStore(path)
+            store.put("key", ("pl", "hello"))
+            self.assertIsNone(store.get("key"))
+            # WHEN:
+            store.flush()
+            # THEN:
+            self.assertEqual(SqliteStore(path).get("key"), ("pl", "hello"))
+
+    def test_sqlite_store_uploads_on_publish_only(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # GIVEN:
+            storage = LocalStorage(directory)
+            store = SqliteStore(
+                os.path.join(directory, "cache.sqlite"), "s3://bucket/cache.sqlite", storage
+            )
+            # WHEN:
+            with mock.patch.object(storage, "open", wraps=storage.open) as open_uri:
+                for index in range(3):
+                    store.put(f"key {index}", ("pl", "hello"))
+                    store.flush()
+                store.publish()
+                store.publish()
+            # THEN:
+            open_uri.assert_called_once_with("s3://bucket/cache.sqlite", "wb")
+            published = SqliteStore(
+                os.path.join(directory, "published.sqlite"), "s3://bucket/cache.sqlite", storage
+            )
+            self.assertEqual(published.get("key 2"), ("pl", "hello"))
+
+    def test_translation_cache_counts_hits_and_misses(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # GIVEN:
+            store = SqliteStore(os.path.join(directory, "cache.sqlite"))
+            cache = TranslationCache(LRUCache(10000), store)
+            # WHEN:
+            self.assertIsNone(cache.get("cześć", "auto", "en"))
+            cache.put("cześć", "auto", "en", ("pl", "hello"))
+            cache.flush()
+            warm_cache = TranslationCache(LRUCache(10000), store)
+            # THEN:
+            self.assertEqual(cache.get("cześć", "auto", "en"), ("pl", "hello"))
+            self.assertEqual(warm_cache.get("cześć", "auto", "en"), ("pl", "hello"))
+            self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "duplicates": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()